@@ -5,18 +5,38 @@ A web-based media server for managing, formatting, and playing movies and TV sho
 """
 
 import os
+
+# Real OS threads by default: scanning, hashing and sqlite calls block, and under eventlet's
+# monkey patching they would run on (and stall) the single hub. Opt into eventlet explicitly,
+# patching the stdlib before anything else imports it.
+SOCKETIO_ASYNC_MODE = os.environ.get('SOCKETIO_ASYNC_MODE', 'threading')
+if SOCKETIO_ASYNC_MODE == 'eventlet':
+    try:
+        import eventlet
+        eventlet.monkey_patch()
+    except ImportError:
+        SOCKETIO_ASYNC_MODE = 'threading'
+
 import sys
 import json
 import logging
+from logging.handlers import QueueHandler, QueueListener
+import queue
+import atexit
 import argparse
 from pathlib import Path
-from flask import Flask, render_template, request, jsonify, send_file, redirect, url_for
+from flask import Flask, render_template, request, jsonify, send_file, redirect, url_for, Response, make_response
 from flask_socketio import SocketIO, emit
 import sqlite3
 import hashlib
+import re
+import gzip
+from functools import lru_cache, wraps
 import mimetypes
-from datetime import datetime
+from urllib.parse import quote
+from datetime import datetime, timezone
 import threading
+from concurrent.futures import ThreadPoolExecutor
 import time
 import subprocess
 import shutil
@@ -28,6 +48,17 @@ from src.services.search_service import SearchService
 from src.services.auth_service import AuthService, require_auth, require_admin
 from src.services.pwa_service import PWAService
 from src.services.transcoding_service import TranscodingService
+from src.services.cache_service import TTLCache
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
 # Import cache service with error handling
 try:
     from src.services.cache_service import cache_service, cached, cache_invalidate, CacheKeys
@@ -45,36 +76,62 @@ except Exception as e:
     class CacheKeys:
         MEDIA_LIST = "media_list"
         SEARCH_RESULTS = "search_results"
-from src.services.monitoring_service import performance_monitor, monitor_performance, track_active_requests
-from src.services.database_service import database_service
+from src.services.monitoring_service import performance_monitor, monitor_performance, track_active_requests, prometheus_metrics_response
+from src.services.database_service import database_service, get_connection_pool
 from src.services.api_docs_service import api_docs_service
 from src.services.ui_components_service import ui_components_service
 from src.services.social_service import social_service
 from src.services.player_service import player_service
-from src.services.external_services_service import ExternalServicesService
+from src.services.external_services_service import ExternalServicesService, SUPPORTED_SERVICES
 from src.services.smart_home_service import SmartHomeService
 from src.services.automation_service import AutomationService
-
-# Configure logging
+from src.services.job_service import job_service
+from src.utils.filename_parsing import parse_year
+from src.utils.pagination import decode_cursor, next_cursor
+from src.utils.validation import Field, PayloadError, validate_payload
+from src.utils.json_provider import ORJSON_AVAILABLE, ORJSONProvider, dumps as json_dumps, dumps_bytes, loads as json_loads
+
+# Configure logging: request threads only enqueue records, a listener thread does the file/console I/O
+LOG_FORMATTER = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+LOG_HANDLERS = [logging.FileHandler('watch.log'), logging.StreamHandler()]
+for log_handler in LOG_HANDLERS:
+    log_handler.setFormatter(LOG_FORMATTER)
+LOG_QUEUE = queue.Queue(-1)
+LOG_LISTENER = QueueListener(LOG_QUEUE, *LOG_HANDLERS)
 logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('watch.log'),
-        logging.StreamHandler()
-    ]
+    level=getattr(logging, os.environ.get('LOG_LEVEL', 'INFO').upper(), logging.INFO),
+    handlers=[QueueHandler(LOG_QUEUE)]
 )
+LOG_LISTENER.start()
+atexit.register(LOG_LISTENER.stop)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'watch-media-server-secret-key'
-socketio = SocketIO(app, cors_allowed_origins="*")
+# Let an X-Sendfile proxy (Apache mod_xsendfile, lighttpd) deliver send_file bodies; enable only behind one
+app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE', 'false').lower() == 'true'
+if ORJSON_AVAILABLE:
+    app.json = ORJSONProvider(app)
+# Share Socket.IO events across worker processes through Redis when configured
+SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE') or None
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode=SOCKETIO_ASYNC_MODE,
+                    message_queue=SOCKETIO_MESSAGE_QUEUE)
 
 # Global variables
 MEDIA_LIBRARY_PATH = os.environ.get('MEDIA_LIBRARY_PATH', '/media')
 DATABASE_PATH = os.environ.get('DATABASE_PATH', 'watch.db')
 SCAN_IN_PROGRESS = False
 MEDIA_FILES = []
+SCAN_BATCH_SIZE = int(os.environ.get('SCAN_BATCH_SIZE', '500'))
+BULK_METADATA_WORKERS = 10
+SETTINGS_CACHE_TTL = float(os.environ.get('SETTINGS_CACHE_TTL', '5'))
+FFPROBE_TIMEOUT = int(os.environ.get('FFPROBE_TIMEOUT', '10'))
+SCAN_PROGRESS_EVERY = 100
+SCAN_PROGRESS_INTERVAL = 0.25
+SCAN_WORKERS = int(os.environ.get('SCAN_WORKERS', str(min(32, (os.cpu_count() or 1) * 2))))
+# Internal nginx location that serves ACCEL_REDIRECT_ROOT; unset to stream through Flask
+ACCEL_REDIRECT_PREFIX = os.environ.get('ACCEL_REDIRECT_PREFIX') or None
+ACCEL_REDIRECT_ROOT = os.environ.get('ACCEL_REDIRECT_ROOT', MEDIA_LIBRARY_PATH)
 
 # Initialize technical services
 # Ensure database directory exists and has proper permissions
@@ -91,17 +148,319 @@ VERSION = "1.3.0"
 BUILD_DATE = "2025-09-14"
 BUILD_TIME = "21:45:00"
 
+# Shared pool of tuned SQLite connections for request handlers
+db_pool = get_connection_pool(DATABASE_PATH)
+
 auth_service = AuthService(DATABASE_PATH)
 pwa_service = PWAService()
+transcoding_service = TranscodingService(DATABASE_PATH)
+tmdb_service = TMDBService()
+
+# Quality presets are fixed at startup, so validate against a frozen set
+VALID_QUALITIES = frozenset(transcoding_service.quality_presets)
 app.performance_monitor = performance_monitor
 
+# Precomputed response helpers
+STATIC_CACHE_CONTROL = 'public, max-age=3600, immutable'
+# Payloads are built at import, so their content dates from process start (whole seconds, as in HTTP dates)
+STATIC_PAYLOAD_BUILT_AT = datetime.now(timezone.utc).replace(microsecond=0)
+
+def build_static_payload(body, mimetype):
+    """Precompute body bytes, gzip and brotli copies and an ETag for an effectively static response"""
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    return {
+        'body': body,
+        'gzip': gzip.compress(body, 9),
+        'br': brotli.compress(body, quality=11) if BROTLI_AVAILABLE else None,
+        'etag': hashlib.sha256(body).hexdigest()[:16],
+        'last_modified': STATIC_PAYLOAD_BUILT_AT,
+        'mimetype': mimetype
+    }
+
+def is_static_payload_fresh(payload):
+    """True when the client's validators match the payload; If-None-Match takes precedence"""
+    if request.if_none_match:
+        return request.if_none_match.contains(payload['etag'])
+    if_modified_since = request.if_modified_since
+    return if_modified_since is not None and if_modified_since >= payload['last_modified']
+
+def static_payload_response(payload):
+    """Serve a precomputed payload, honouring If-None-Match, If-Modified-Since and Accept-Encoding (br, then gzip)"""
+    if is_static_payload_fresh(payload):
+        response = Response(status=304)
+    elif payload['br'] and 'br' in request.accept_encodings:
+        response = Response(payload['br'], mimetype=payload['mimetype'])
+        response.headers['Content-Encoding'] = 'br'
+    elif 'gzip' in request.accept_encodings:
+        response = Response(payload['gzip'], mimetype=payload['mimetype'])
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = Response(payload['body'], mimetype=payload['mimetype'])
+    
+    response.set_etag(payload['etag'])
+    response.last_modified = payload['last_modified']
+    response.headers['Cache-Control'] = STATIC_CACHE_CONTROL
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+def constant_json(payload, status=200):
+    """Serialize a constant JSON body once and return a factory for fresh responses"""
+    body = dumps_bytes(payload)
+    def build_response():
+        return Response(body, status=status, mimetype='application/json')
+    return build_response
+
+def conditional_get(f):
+    """Tag successful GET responses with a weak ETag and answer 304 when the client already has it"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        response = make_response(f(*args, **kwargs))
+        if request.method == 'GET' and response.status_code == 200:
+            response.headers['Cache-Control'] = 'private, max-age=10'
+            response.add_etag(weak=True)
+            response.make_conditional(request)
+        return response
+    
+    return decorated_function
+
+def is_first_range_request():
+    """True for a plain GET or a Range request starting at byte 0, i.e. the start of a playback"""
+    byte_range = request.range
+    return byte_range is None or not byte_range.ranges or byte_range.ranges[0][0] == 0
+
+def accel_redirect_uri(file_path):
+    """Map a file under ACCEL_REDIRECT_ROOT to its internal nginx URI, or None when it lies outside"""
+    root = os.path.realpath(ACCEL_REDIRECT_ROOT)
+    real_path = os.path.realpath(file_path)
+    if os.path.commonpath([root, real_path]) != root:
+        return None
+    relative = os.path.relpath(real_path, root).replace(os.sep, '/')
+    return ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + quote(relative)
+
+def file_stat(file_path):
+    """Stat a media file once up front, returning None when it is missing or unreadable"""
+    try:
+        return os.stat(file_path)
+    except OSError:
+        return None
+
+def stream_file(file_path, mimetype=None, stat=None):
+    """Send a media file with Range, ETag and Last-Modified support so seeks are served as 206s"""
+    mimetype = mimetype or mimetypes.guess_type(file_path)[0] or 'video/mp4'
+    if ACCEL_REDIRECT_PREFIX:
+        uri = accel_redirect_uri(file_path)
+        if uri:
+            # nginx delivers the bytes (ranges included) with sendfile; the worker is freed immediately
+            response = make_response('')
+            response.headers['X-Accel-Redirect'] = uri
+            response.headers['Content-Type'] = mimetype
+            return response
+    return send_file(
+        file_path,
+        as_attachment=False,
+        mimetype=mimetype,
+        conditional=True,
+        etag=True,
+        last_modified=(stat or os.stat(file_path)).st_mtime
+    )
+
+SQLITE_SUPPORTS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+# (user_id, media_id) pairs whose play was recorded recently; absorbs repeated stream opens
+RECENT_PLAYS = TTLCache(ttl=int(os.environ.get('PLAY_DEBOUNCE_SECONDS', '30')), maxsize=4096)
+
+def record_play_async(user_id, media_id):
+    """Record a play in the background, at most once per user and media within the debounce window"""
+    key = (user_id, media_id)
+    if RECENT_PLAYS.get(key):
+        return
+    RECENT_PLAYS.set(key, True)
+    job_service.dispatch('record_play', auth_service.record_play, user_id, media_id)
+
+def decode_genres(rows):
+    """Decode each row's stored genres JSON in place, using an empty list when it is malformed"""
+    for row in rows:
+        genres = row.get('genres')
+        if genres and isinstance(genres, str):
+            try:
+                row['genres'] = json_loads(genres)
+            except ValueError:
+                row['genres'] = []
+    return rows
+
+def sql_placeholders(values):
+    """Build the '?, ?, ...' placeholder list for an IN clause"""
+    return ', '.join('?' * len(values))
+
+def parse_media_ids(media_ids, errors, error_message="Media ID {} not found"):
+    """Coerce requested IDs to ints, recording unusable ones in errors"""
+    ids = []
+    for media_id in media_ids:
+        try:
+            ids.append(int(media_id))
+        except (TypeError, ValueError):
+            errors.append(error_message.format(media_id))
+    return ids
+
+# Library-derived JSON responses, cleared whenever the library or settings change
+LIBRARY_CACHE_TTL = int(os.environ.get('LIBRARY_CACHE_TTL', '60'))
+LIBRARY_RESPONSE_CACHE = TTLCache(ttl=LIBRARY_CACHE_TTL, maxsize=512)
+
+# media id -> file path, so the Range requests of one stream skip the lookup query
+MEDIA_PATH_CACHE_TTL = int(os.environ.get('MEDIA_PATH_CACHE_TTL', '300'))
+MEDIA_PATH_CACHE = TTLCache(ttl=MEDIA_PATH_CACHE_TTL, maxsize=4096)
+
+def invalidate_library_cache():
+    """Drop cached library responses and file paths after media rows or settings change"""
+    LIBRARY_RESPONSE_CACHE.clear()
+    MEDIA_PATH_CACHE.clear()
+
+def get_media_file_path(media_id):
+    """Get a media file's path by id, or None if there is no such row"""
+    file_path = MEDIA_PATH_CACHE.get(media_id)
+    if file_path is None:
+        conn = db_pool.connect()
+        cursor = conn.cursor()
+        cursor.execute('SELECT file_path FROM media_files WHERE id = ?', (media_id,))
+        result = cursor.fetchone()
+        conn.close()
+        if not result:
+            return None
+        file_path = result[0]
+        MEDIA_PATH_CACHE.set(media_id, file_path)
+    return file_path
+
+EMPTY_JSON_BODIES = (b'[]', b'{}')
+
+def library_cached(f):
+    """Cache a read-only JSON view's body per query string and serve it with a strong ETag"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        key = (f.__name__, request.query_string, tuple(sorted(kwargs.items())))
+        payload = LIBRARY_RESPONSE_CACHE.get(key)
+        if payload is None:
+            response = make_response(f(*args, **kwargs))
+            if response.status_code != 200 or not response.is_json:
+                return response
+            body = response.get_data()
+            # The search service answers failures (e.g. "database is locked" mid-scan) with an empty
+            # [] or {} and a 200; don't pin a possibly transient failure for LIBRARY_CACHE_TTL
+            if body.strip() in EMPTY_JSON_BODIES:
+                return response
+            payload = {'body': body, 'etag': hashlib.sha256(body).hexdigest()[:16]}
+            LIBRARY_RESPONSE_CACHE.set(key, payload)
+        
+        # A matching If-None-Match is answered without touching the body
+        if request.if_none_match.contains(payload['etag']):
+            response = Response(status=304)
+        else:
+            response = Response(payload['body'], mimetype='application/json')
+        response.set_etag(payload['etag'])
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    
+    return decorated_function
+
+def get_payload(schema):
+    """Validate the request's JSON body against a schema, raising PayloadError"""
+    return validate_payload(request.get_json(silent=True), schema)
+
+HASH_CHUNK_SIZE = 1 << 20
+
+# Stored in PRAGMA user_version once init_database has run; bump it whenever init_database or
+# migrate_database change so existing databases pick the change up on the next start
+SCHEMA_VERSION = 4
+
+# Built once so every flush reuses the same prepared statement on a pooled connection
+MEDIA_COLUMNS = ('file_path', 'file_name', 'file_size', 'file_hash', 'file_mtime', 'media_type', 'title', 'year',
+                 'season', 'episode', 'duration', 'resolution', 'codec', 'metadata', 'category')
+# Trigger body that rebuilds a media row's media_genres entries from its genres JSON
+MEDIA_GENRES_SYNC_SQL = """
+    DELETE FROM media_genres WHERE media_id = NEW.id;
+    INSERT OR IGNORE INTO media_genres (genre, media_id)
+    SELECT value, NEW.id FROM json_each(CASE WHEN json_valid(NEW.genres) THEN NEW.genres ELSE '[]' END)
+    WHERE type = 'text';
+"""
+
+INSERT_MEDIA_SQL = (f"INSERT OR REPLACE INTO media_files ({', '.join(MEDIA_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(MEDIA_COLUMNS))})")
+
+# File name parsing patterns, compiled once for the scanner
+TV_EPISODE_PATTERN = re.compile(r'[Ss](\d{1,2})[._ -]?[Ee](\d{1,3})')
+TV_KEYWORD_PATTERN = re.compile(r'season|episode', re.IGNORECASE)
+QUALITY_PATTERNS = tuple(re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'\.\d{3,4}p',  # Remove resolution like .1080p
+    r'\.\d{3,4}k',  # Remove resolution like .4k
+    r'\.HDRip',     # Remove quality indicators
+    r'\.BRRip',
+    r'\.WEBRip',
+    r'\.BluRay',
+    r'\.DVDRip',
+    r'\.x264',
+    r'\.x265',
+    r'\.H264',
+    r'\.H265',
+))
+FILENAME_NOISE_PATTERNS = tuple(re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'\[.*?\]',  # Remove brackets and content
+    r'\(.*?\)',  # Remove parentheses and content
+    r'_\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}_\d+',  # Remove timestamp patterns like _2025-05-20_14-44-59_784
+    r'_\d{4}-\d{2}-\d{2}',  # Remove date patterns like _2025-05-20
+    r'_\d{2}-\d{2}-\d{2}',  # Remove date patterns like _05-20-2025
+    r'_\d{4}',   # Remove year patterns like _2023
+    r'^\d+_',    # Remove numbers at the beginning
+    r'_\d+$',    # Remove trailing numbers
+    r'[Ss]\d{2}[Ee]\d{2}',  # Remove season/episode patterns
+    r'[Ss]\d{1}[Ee]\d{1}',  # Remove season/episode patterns
+)) + QUALITY_PATTERNS
+FOLDER_SEPARATOR_PATTERN = re.compile(r'[._]')
+FILENAME_SEPARATOR_PATTERN = re.compile(r'[._-]')
+TRAILING_EXTENSION_PATTERN = re.compile(r'\s+(mkv|mp4|avi|mov|wmv|flv|webm)$', re.IGNORECASE)
+WHITESPACE_PATTERN = re.compile(r'\s+')
+RECORDING_TIMESTAMP_PATTERN = re.compile(r'(\d{4}-\d{2}-\d{2})_(\d{2}-\d{2}-\d{2})')
+WORD_PATTERN = re.compile(r'[a-zA-Z]+')
+
+def new_file_hash():
+    """Create the hash object used to fingerprint media files"""
+    return hashlib.blake2b(digest_size=16)
+
+def iter_files(root):
+    """Yield a DirEntry for every file under root, depth-first, without following directory symlinks"""
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    else:
+                        yield entry
+        except OSError as e:
+            logger.warning(f"Skipping unreadable directory {directory}: {e}")
+
+def media_extensions(supported_formats):
+    """Normalise a list of formats into a set of dotted, lower-case extensions"""
+    return frozenset('.' + fmt.strip().lower() for fmt in supported_formats if fmt.strip())
+
+def iter_media_files(root, exts):
+    """Yield a DirEntry for every file under root whose dotted extension is in exts"""
+    for entry in iter_files(root):
+        name = entry.name
+        if name[name.rfind('.'):].lower() in exts:
+            yield entry
+
 class MediaManager:
     def __init__(self):
         # Read DATABASE_PATH from environment at instantiation time
         self.db_path = os.environ.get('DATABASE_PATH', 'watch.db')
         print(f"MediaManager __init__ called with db_path: {self.db_path}")
         print(f"Environment DATABASE_PATH: {os.environ.get('DATABASE_PATH', 'NOT_SET')}")
+        self.pool = get_connection_pool(self.db_path)
+        self.settings_lock = threading.Lock()
         self.init_database()
+        self.load_settings()
     
     def init_database(self):
         """Initialize the SQLite database with required tables"""
@@ -115,9 +474,16 @@ class MediaManager:
             os.makedirs(db_dir, exist_ok=True)
             print(f"Created database directory: {db_dir}")
         
-        conn = sqlite3.connect(self.db_path)
+        conn = self.pool.connect()
         cursor = conn.cursor()
         
+        # Already initialized and migrated by this or another worker
+        cursor.execute('PRAGMA user_version')
+        if cursor.fetchone()[0] >= SCHEMA_VERSION:
+            conn.close()
+            logger.info(f"Database schema is current (version {SCHEMA_VERSION})")
+            return
+        
         # Media files table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS media_files (
@@ -180,13 +546,55 @@ class MediaManager:
                 VALUES (?, ?)
             ''', (key, value))
         
+        # Indexes for library listing, sorting and continue-watching queries
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_media_type_added ON media_files(media_type, added_date DESC)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_media_added ON media_files(added_date DESC)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_media_last_played ON media_files(last_played DESC) WHERE last_played IS NOT NULL')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_media_title ON media_files(title COLLATE NOCASE)')
+        
+        # One row per (genre, media) kept in sync with media_files.genres, so genre filters hit an index
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS media_genres (
+                genre TEXT NOT NULL,
+                media_id INTEGER NOT NULL,
+                PRIMARY KEY (genre, media_id)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_media_genres_media ON media_genres(media_id)')
+        cursor.execute(f'CREATE TRIGGER IF NOT EXISTS media_genres_insert AFTER INSERT ON media_files BEGIN {MEDIA_GENRES_SYNC_SQL} END')
+        cursor.execute(f'CREATE TRIGGER IF NOT EXISTS media_genres_update AFTER UPDATE OF genres ON media_files BEGIN {MEDIA_GENRES_SYNC_SQL} END')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS media_genres_delete AFTER DELETE ON media_files BEGIN
+                DELETE FROM media_genres WHERE media_id = OLD.id;
+            END
+        ''')
+        cursor.execute('''
+            INSERT OR IGNORE INTO media_genres (genre, media_id)
+            SELECT g.value, m.id FROM media_files m,
+                json_each(CASE WHEN json_valid(m.genres) THEN m.genres ELSE '[]' END) g
+            WHERE g.type = 'text'
+        ''')
+        
+        cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
         conn.commit()
         conn.close()
         logger.info("Database initialized successfully")
     
+    def analyze_database(self):
+        """Refresh query planner statistics after the library changes"""
+        try:
+            conn = self.pool.connect()
+            # INSERT OR REPLACE deletes without firing delete triggers; drop genre rows it orphaned
+            conn.execute('DELETE FROM media_genres WHERE media_id NOT IN (SELECT id FROM media_files)')
+            conn.execute('ANALYZE')
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error analyzing database: {e}")
+    
     def migrate_database(self):
         """Migrate database schema for new features"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.pool.connect()
         cursor = conn.cursor()
         
         # Get current columns
@@ -244,7 +652,7 @@ class MediaManager:
     
     def cleanup_duplicates(self):
         """Remove duplicate entries from the database"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.pool.connect()
         cursor = conn.cursor()
         
         # Find duplicates based on file_path
@@ -275,25 +683,37 @@ class MediaManager:
         conn.commit()
         conn.close()
     
-    def get_setting(self, key, default=None):
-        """Get a setting value from the database"""
-        conn = sqlite3.connect(self.db_path)
+    def load_settings(self):
+        """Load all library settings into memory"""
+        conn = self.pool.connect()
         cursor = conn.cursor()
-        cursor.execute('SELECT setting_value FROM library_settings WHERE setting_key = ?', (key,))
-        result = cursor.fetchone()
+        cursor.execute('SELECT setting_key, setting_value FROM library_settings')
+        settings = {row[0]: row[1] for row in cursor}
         conn.close()
-        return result[0] if result else default
+        with self.settings_lock:
+            self.settings = settings
+            self.settings_loaded_at = time.monotonic()
+    
+    def get_setting(self, key, default=None):
+        """Get a setting value from the in-memory settings, reloading them once they are SETTINGS_CACHE_TTL old"""
+        # Other workers may have written settings; the short TTL bounds how long this one serves stale values
+        if time.monotonic() - self.settings_loaded_at > SETTINGS_CACHE_TTL:
+            self.load_settings()
+        return self.settings.get(key, default)
     
     def set_setting(self, key, value):
-        """Set a setting value in the database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT OR REPLACE INTO library_settings (setting_key, setting_value)
-            VALUES (?, ?)
-        ''', (key, value))
-        conn.commit()
-        conn.close()
+        """Set a setting value in the database and the in-memory settings"""
+        with self.settings_lock:
+            conn = self.pool.connect()
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT OR REPLACE INTO library_settings (setting_key, setting_value)
+                VALUES (?, ?)
+            ''', (key, value))
+            conn.commit()
+            conn.close()
+            self.settings = {**self.settings, key: value}
+        invalidate_library_cache()
     
     def scan_media_library(self, incremental=True):
         """Scan the media library for new files"""
@@ -304,6 +724,7 @@ class MediaManager:
         SCAN_IN_PROGRESS = True
         library_path = self.get_setting('library_path', MEDIA_LIBRARY_PATH)
         supported_formats = self.get_setting('supported_formats', 'mp4,avi,mkv,mov,wmv,flv,webm').split(',')
+        exts = media_extensions(supported_formats)
         
         scan_type = "incremental" if incremental else "full"
         logger.info(f"Starting {scan_type} media library scan in: {library_path}")
@@ -312,37 +733,48 @@ class MediaManager:
             new_files = 0
             modified_files = 0
             skipped_files = 0
+            pending = []
+            known = self.get_known_files() if incremental else None
             
             # Define the specific media folders to scan
             media_folders = ['Movies', 'TV Shows', 'Kids', 'Classic Movies', 'Holiday Movies', 'Music Videos']
             
-            # Scan only the specific media folders
-            for folder in media_folders:
-                folder_path = os.path.join(library_path, folder)
-                if os.path.exists(folder_path):
-                    logger.info(f"Scanning folder: {folder_path}")
-                    for root, dirs, files in os.walk(folder_path):
-                        for file in files:
-                            if any(file.lower().endswith(f'.{fmt}') for fmt in supported_formats):
-                                file_path = os.path.join(root, file)
+            # Scan only the specific media folders, hashing and probing each batch in parallel
+            with ThreadPoolExecutor(max_workers=SCAN_WORKERS, thread_name_prefix='scan') as executor:
+                for folder in media_folders:
+                    folder_path = os.path.join(library_path, folder)
+                    if os.path.exists(folder_path):
+                        logger.info(f"Scanning folder: {folder_path}")
+                        for entry in iter_media_files(folder_path, exts):
+                            file_path = entry.path
+                            file = entry.name
+                            
+                            if incremental:
+                                # Check if file is new or modified
+                                is_new_or_modified, status = self.is_file_new_or_modified(file_path, entry, known)
                                 
-                                if incremental:
-                                    # Check if file is new or modified
-                                    is_new_or_modified, status = self.is_file_new_or_modified(file_path)
-                                    
-                                    if is_new_or_modified:
-                                        self.add_media_file(file_path)
-                                        if status == "new":
-                                            new_files += 1
-                                        elif status == "modified":
-                                            modified_files += 1
-                                        logger.info(f"Processed {status} file: {file}")
-                                    else:
-                                        skipped_files += 1
+                                if is_new_or_modified:
+                                    pending.append(entry)
+                                    if status == "new":
+                                        new_files += 1
+                                    elif status == "modified":
+                                        modified_files += 1
+                                    logger.info(f"Processing {status} file: {file}")
                                 else:
-                                    # Full scan - process all files
-                                    self.add_media_file(file_path)
-                                    new_files += 1
+                                    skipped_files += 1
+                            else:
+                                # Full scan - process all files
+                                pending.append(entry)
+                                new_files += 1
+                            
+                            if len(pending) >= SCAN_BATCH_SIZE:
+                                self.flush_rows(self.build_rows(pending, executor))
+                                pending = []
+                
+                self.flush_rows(self.build_rows(pending, executor))
+            
+            if new_files or modified_files:
+                self.analyze_database()
             
             if incremental:
                 logger.info(f"Incremental scan completed: {new_files} new, {modified_files} modified, {skipped_files} unchanged")
@@ -357,8 +789,19 @@ class MediaManager:
     
     def add_media_file(self, file_path):
         """Add a media file to the database"""
+        row = self.build_row(file_path)
+        if row:
+            self.flush_rows([row])
+    
+    def build_row(self, entry):
+        """Build the media_files row for a scanned DirEntry (or plain path) without touching the database"""
+        if isinstance(entry, os.DirEntry):
+            file_path, file_name = entry.path, entry.name
+        else:
+            file_path, file_name = entry, os.path.basename(entry)
         try:
-            file_stat = os.stat(file_path)
+            # DirEntry caches its stat result, so the scan loop's stat is reused here
+            file_stat = entry.stat() if isinstance(entry, os.DirEntry) else os.stat(file_path)
             file_size = file_stat.st_size
             file_mtime = file_stat.st_mtime
             
@@ -368,17 +811,9 @@ class MediaManager:
             # Extract metadata
             metadata = self.extract_metadata(file_path)
             
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT OR REPLACE INTO media_files 
-                (file_path, file_name, file_size, file_hash, file_mtime, media_type, title, year, 
-                 season, episode, duration, resolution, codec, metadata, category)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
+            return (
                 file_path,
-                os.path.basename(file_path),
+                file_name,
                 file_size,
                 file_hash,
                 file_mtime,
@@ -390,34 +825,74 @@ class MediaManager:
                 metadata.get('duration'),
                 metadata.get('resolution'),
                 metadata.get('codec'),
-                json.dumps(metadata),
+                json_dumps(metadata),
                 metadata.get('category', 'unknown')
-            ))
+            )
             
-            conn.commit()
-            conn.close()
+        except Exception as e:
+            logger.error(f"Error reading media file {file_path}: {e}")
+            return None
+    
+    def build_rows(self, entries, executor):
+        """Build rows for a batch of files concurrently, dropping files that could not be read"""
+        return [row for row in executor.map(self.build_row, entries) if row]
+    
+    def flush_rows(self, rows):
+        """Write a batch of media_files rows in a single transaction"""
+        if not rows:
+            return
+        conn = self.pool.connect()
+        try:
+            try:
+                with conn:
+                    conn.executemany(INSERT_MEDIA_SQL, rows)
+            except (sqlite3.Error, ValueError) as e:
+                # One bad row fails the whole executemany; retry individually so only that file is skipped
+                logger.warning(f"Batch insert of {len(rows)} media files failed ({e}); retrying row by row")
+                with conn:
+                    for row in rows:
+                        try:
+                            conn.execute(INSERT_MEDIA_SQL, row)
+                        except (sqlite3.Error, ValueError) as row_error:
+                            logger.error(f"Error adding media file {row[0]!r}: {row_error}")
+            invalidate_library_cache()
             
         except Exception as e:
-            logger.error(f"Error adding media file {file_path}: {e}")
+            logger.error(f"Error adding {len(rows)} media files: {e}")
+        finally:
+            conn.close()
+    
+    def get_known_files(self):
+        """Load {file_path: (file_size, file_mtime)} for every file already in the library"""
+        conn = self.pool.connect()
+        cursor = conn.cursor()
+        cursor.execute('SELECT file_path, file_size, file_mtime FROM media_files')
+        known = {row[0]: (row[1], row[2]) for row in cursor}
+        conn.close()
+        return known
     
-    def is_file_new_or_modified(self, file_path):
+    def is_file_new_or_modified(self, file_path, entry=None, known=None):
         """Check if a file is new or has been modified since last scan"""
         try:
-            file_stat = os.stat(file_path)
+            file_stat = entry.stat() if entry is not None else os.stat(file_path)
             file_size = file_stat.st_size
             file_mtime = file_stat.st_mtime
             
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Check if file exists in database
-            cursor.execute('''
-                SELECT file_size, file_mtime FROM media_files 
-                WHERE file_path = ?
-            ''', (file_path,))
-            
-            result = cursor.fetchone()
-            conn.close()
+            if known is not None:
+                # Scans preload the library so each check is a dict lookup
+                result = known.get(file_path)
+            else:
+                conn = self.pool.connect()
+                cursor = conn.cursor()
+                
+                # Check if file exists in database
+                cursor.execute('''
+                    SELECT file_size, file_mtime FROM media_files 
+                    WHERE file_path = ?
+                ''', (file_path,))
+                
+                result = cursor.fetchone()
+                conn.close()
             
             if result is None:
                 # File not in database - it's new
@@ -438,13 +913,16 @@ class MediaManager:
             return True, "error"
     
     def calculate_file_hash(self, file_path):
-        """Calculate MD5 hash of file"""
-        hash_md5 = hashlib.md5()
+        """Calculate a 128-bit BLAKE2b fingerprint of file"""
         try:
             with open(file_path, "rb") as f:
-                for chunk in iter(lambda: f.read(4096), b""):
-                    hash_md5.update(chunk)
-            return hash_md5.hexdigest()
+                # Plain reads, not mmap: a file that shrinks while mapped (downloads, DVR recordings) raises SIGBUS
+                if hasattr(hashlib, 'file_digest'):
+                    return hashlib.file_digest(f, new_file_hash).hexdigest()
+                file_hash = new_file_hash()
+                for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                    file_hash.update(chunk)
+                return file_hash.hexdigest()
         except Exception as e:
             logger.error(f"Error calculating hash for {file_path}: {e}")
             return ""
@@ -486,16 +964,53 @@ class MediaManager:
                     metadata['type'] = 'music_video'
                 else:
                     metadata['type'] = 'movie'
-
-            # Use ffprobe to get media information
+            
+            # Extract title from filename or metadata
+            filename = os.path.basename(file_path)
+            base_name = os.path.splitext(filename)[0]
+            
+            # Try to clean up the filename to get a better title
+            title = self.clean_filename_for_title(base_name, file_path)
+            metadata['title'] = title
+            
+            year = parse_year(base_name)
+            if year:
+                metadata['year'] = year
+            
+            # Override type detection based on filename patterns if not set by folder
+            if metadata['type'] == 'unknown':
+                episode_match = TV_EPISODE_PATTERN.search(filename)
+                if episode_match:
+                    metadata['type'] = 'tv_show'
+                    metadata['season'] = int(episode_match.group(1))
+                    metadata['episode'] = int(episode_match.group(2))
+                elif TV_KEYWORD_PATTERN.search(filename):
+                    metadata['type'] = 'tv_show'
+                else:
+                    metadata['type'] = 'movie'
+                
+        except Exception as e:
+            logger.error(f"Error parsing file name for {file_path}: {e}")
+            # Fallback metadata
+            filename = os.path.basename(file_path)
+            metadata['title'] = self.clean_filename_for_title(os.path.splitext(filename)[0])
+            metadata['type'] = 'movie'
+        
+        # Add placeholder artwork URLs (can be enhanced with TMDB integration later)
+        metadata['poster_url'] = f"/api/placeholder/poster/{metadata['type']}"
+        metadata['backdrop_url'] = f"/api/placeholder/backdrop/{metadata['type']}"
+        
+        try:
+            # Use ffprobe to get stream information; a failure only loses codec/resolution/duration
             cmd = [
                 'ffprobe', '-v', 'quiet', '-print_format', 'json',
                 '-show_format', '-show_streams', file_path
             ]
             
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+            result = subprocess.run(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                    stderr=subprocess.DEVNULL, timeout=FFPROBE_TIMEOUT)
             if result.returncode == 0:
-                probe_data = json.loads(result.stdout)
+                probe_data = json_loads(result.stdout)
                 
                 # Extract video stream info
                 for stream in probe_data.get('streams', []):
@@ -513,83 +1028,35 @@ class MediaManager:
                 if duration:
                     metadata['duration'] = int(float(duration))
                 
-                # Extract title from filename or metadata
-                filename = os.path.basename(file_path)
-                base_name = os.path.splitext(filename)[0]
-                
-                # Try to clean up the filename to get a better title
-                title = self.clean_filename_for_title(base_name, file_path)
-                metadata['title'] = title
-                
-                # Override type detection based on filename patterns if not set by folder
-                if metadata['type'] == 'unknown':
-                    if any(keyword in filename.lower() for keyword in ['s01e01', 's1e1', 'season', 'episode']):
-                        metadata['type'] = 'tv_show'
-                        # Extract season and episode info
-                        season_episode = self.extract_season_episode(filename)
-                        if season_episode:
-                            metadata['season'] = season_episode.get('season')
-                            metadata['episode'] = season_episode.get('episode')
-                    else:
-                        metadata['type'] = 'movie'
-                
-                # Add placeholder artwork URLs (can be enhanced with TMDB integration later)
-                metadata['poster_url'] = f"/api/placeholder/poster/{metadata['type']}"
-                metadata['backdrop_url'] = f"/api/placeholder/backdrop/{metadata['type']}"
-                
         except Exception as e:
             logger.error(f"Error extracting metadata for {file_path}: {e}")
-            # Fallback metadata
-            filename = os.path.basename(file_path)
-            metadata['title'] = self.clean_filename_for_title(os.path.splitext(filename)[0])
-            metadata['type'] = 'movie'
-            metadata['poster_url'] = "/api/placeholder/poster/movie"
-            metadata['backdrop_url'] = "/api/placeholder/backdrop/movie"
         
         return metadata
     
     def clean_folder_name_for_title(self, folder_name):
         """Clean folder name to create a better title"""
-        import re
-        
         title = folder_name
         
         # Don't remove year patterns for movie titles - they're part of the title
         # Just clean up quality indicators and formatting
         
         # Remove quality indicators
-        quality_patterns = [
-            r'\.\d{3,4}p',  # Remove resolution like .1080p
-            r'\.\d{3,4}k',  # Remove resolution like .4k
-            r'\.HDRip',     # Remove quality indicators
-            r'\.BRRip',
-            r'\.WEBRip',
-            r'\.BluRay',
-            r'\.DVDRip',
-            r'\.x264',
-            r'\.x265',
-            r'\.H264',
-            r'\.H265',
-        ]
-        
-        for pattern in quality_patterns:
-            title = re.sub(pattern, '', title, flags=re.IGNORECASE)
+        for pattern in QUALITY_PATTERNS:
+            title = pattern.sub('', title)
         
         # Replace underscores and dots with spaces, but keep dashes and parentheses
-        title = re.sub(r'[._]', ' ', title)
+        title = FOLDER_SEPARATOR_PATTERN.sub(' ', title)
         
         # Remove file extensions that might have been included
-        title = re.sub(r'\s+(mkv|mp4|avi|mov|wmv|flv|webm)$', '', title, flags=re.IGNORECASE)
+        title = TRAILING_EXTENSION_PATTERN.sub('', title)
         
         # Clean up multiple spaces
-        title = re.sub(r'\s+', ' ', title).strip()
+        title = WHITESPACE_PATTERN.sub(' ', title).strip()
         
         return title
     
     def clean_filename_for_title(self, filename, file_path=None):
         """Clean filename to create a better title"""
-        import re
-        
         # Remove file extension
         title = os.path.splitext(filename)[0]
         
@@ -607,38 +1074,14 @@ class MediaManager:
                         return folder_title
         
         # Remove common video file patterns and metadata
-        patterns_to_remove = [
-            r'\[.*?\]',  # Remove brackets and content
-            r'\(.*?\)',  # Remove parentheses and content
-            r'_\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}_\d+',  # Remove timestamp patterns like _2025-05-20_14-44-59_784
-            r'_\d{4}-\d{2}-\d{2}',  # Remove date patterns like _2025-05-20
-            r'_\d{2}-\d{2}-\d{2}',  # Remove date patterns like _05-20-2025
-            r'_\d{4}',   # Remove year patterns like _2023
-            r'^\d+_',    # Remove numbers at the beginning
-            r'_\d+$',    # Remove trailing numbers
-            r'[Ss]\d{2}[Ee]\d{2}',  # Remove season/episode patterns
-            r'[Ss]\d{1}[Ee]\d{1}',  # Remove season/episode patterns
-            r'\.\d{3,4}p',  # Remove resolution like .1080p
-            r'\.\d{3,4}k',  # Remove resolution like .4k
-            r'\.HDRip',     # Remove quality indicators
-            r'\.BRRip',
-            r'\.WEBRip',
-            r'\.BluRay',
-            r'\.DVDRip',
-            r'\.x264',
-            r'\.x265',
-            r'\.H264',
-            r'\.H265',
-        ]
-        
-        for pattern in patterns_to_remove:
-            title = re.sub(pattern, '', title, flags=re.IGNORECASE)
+        for pattern in FILENAME_NOISE_PATTERNS:
+            title = pattern.sub('', title)
         
         # Replace underscores, dots, and dashes with spaces
-        title = re.sub(r'[._-]', ' ', title)
+        title = FILENAME_SEPARATOR_PATTERN.sub(' ', title)
         
         # Clean up multiple spaces
-        title = re.sub(r'\s+', ' ', title).strip()
+        title = WHITESPACE_PATTERN.sub(' ', title).strip()
         
         # If the title is just numbers or very short, try to make it more meaningful
         if len(title) < 3 or title.isdigit():
@@ -646,8 +1089,7 @@ class MediaManager:
             original = os.path.splitext(filename)[0]
             
             # Check if it's a timestamp-based filename (only for non-movie folders)
-            import re
-            timestamp_match = re.search(r'(\d{4}-\d{2}-\d{2})_(\d{2}-\d{2}-\d{2})', original)
+            timestamp_match = RECORDING_TIMESTAMP_PATTERN.search(original)
             if timestamp_match and file_path and not any(folder in file_path for folder in ['Movies', 'TV Shows', 'Kids', 'Classic Movies', 'Holiday Movies']):
                 date_part = timestamp_match.group(1)
                 time_part = timestamp_match.group(2)
@@ -666,7 +1108,7 @@ class MediaManager:
                 title = 'Video'
             else:
                 # Try to extract any meaningful words
-                words = re.findall(r'[a-zA-Z]+', original)
+                words = WORD_PATTERN.findall(original)
                 if words:
                     title = ' '.join(word.capitalize() for word in words[:3])
                 else:
@@ -679,11 +1121,8 @@ class MediaManager:
     
     def extract_season_episode(self, filename):
         """Extract season and episode numbers from filename"""
-        import re
-        
-        # Pattern for S01E01 or S1E1
-        pattern = r'[Ss](\d+)[Ee](\d+)'
-        match = re.search(pattern, filename)
+        # Pattern for S01E01, S1E1 or S01.E01
+        match = TV_EPISODE_PATTERN.search(filename)
         
         if match:
             return {
@@ -693,9 +1132,36 @@ class MediaManager:
         
         return None
     
+    def save_subtitles(self, media_id, subtitles):
+        """Replace the recorded subtitle files for a media item"""
+        try:
+            conn = self.pool.connect()
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM subtitles WHERE media_id = ?', (media_id,))
+            cursor.executemany(
+                'INSERT INTO subtitles (media_id, file_path, language, format) VALUES (?, ?, ?, ?)',
+                [(media_id, subtitle['file_path'], subtitle['language'], subtitle['format']) for subtitle in subtitles]
+            )
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error saving subtitles for media {media_id}: {e}")
+    
+    def find_subtitle_path(self, filename):
+        """Look up a recorded subtitle file by its file name"""
+        escaped = filename.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        conn = self.pool.connect()
+        cursor = conn.cursor()
+        cursor.execute("SELECT file_path FROM subtitles WHERE file_path LIKE ? ESCAPE '\\'", ('%/' + escaped,))
+        paths = [row[0] for row in cursor.fetchall()]
+        conn.close()
+        # LIKE is case-insensitive, so confirm the exact name
+        return next((path for path in paths if os.path.basename(path) == filename), None)
+    
     def get_media_files(self, media_type=None, limit=None, offset=0):
         """Get media files from database"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.pool.connect()
+        conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
         query = "SELECT * FROM media_files"
@@ -711,16 +1177,14 @@ class MediaManager:
             query += " LIMIT ? OFFSET ?"
             params.extend([limit, offset])
         
-        cursor.execute(query, params)
-        columns = [description[0] for description in cursor.description]
-        results = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        results = [dict(row) for row in cursor.execute(query, params).fetchall()]
         
         conn.close()
         return results
     
     def update_play_count(self, file_id):
         """Update play count and last played timestamp"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.pool.connect()
         cursor = conn.cursor()
         cursor.execute('''
             UPDATE media_files 
@@ -804,10 +1268,9 @@ def api_scan_library():
                 })
                 return
             
-            for root, dirs, files in os.walk(library_path):
-                for file in files:
-                    if any(file.lower().endswith(f'.{fmt}') for fmt in supported_formats):
-                        total_files += 1
+            # Walk the tree once; the collected DirEntry objects drive both the total and the scan
+            entries = list(iter_media_files(library_path, media_extensions(supported_formats)))
+            total_files = len(entries)
             
             socketio.emit('scan_status', {
                 'status': 'counting',
@@ -817,48 +1280,72 @@ def api_scan_library():
                 'scan_type': scan_type_name
             })
             
-            # Scan files with progress updates
-            for root, dirs, files in os.walk(library_path):
-                current_dir = os.path.relpath(root, library_path) if root != library_path else "."
-                
-                for file in files:
-                    if any(file.lower().endswith(f'.{fmt}') for fmt in supported_formats):
-                        file_path = os.path.join(root, file)
+            # Scan files, writing rows per batch and coalescing progress events
+            media_manager = get_media_manager()
+            pending = []
+            known = media_manager.get_known_files() if incremental else None
+            last_emit_time = 0.0
+            last_emit_seen = 0
+            
+            def emit_progress(current_dir):
+                nonlocal last_emit_time, last_emit_seen
+                seen = processed_files + skipped_files
+                progress = int(seen / total_files * 100) if total_files > 0 else 0
+                socketio.emit('scan_status', {
+                    'status': 'scanning',
+                    'message': f'Scanning {current_dir}',
+                    'progress': progress,
+                    'processed_files': processed_files,
+                    'total_files': total_files,
+                    'current_directory': current_dir,
+                    'scan_type': scan_type_name,
+                    'new_files': new_files,
+                    'modified_files': modified_files,
+                    'skipped_files': skipped_files
+                })
+                last_emit_time = time.monotonic()
+                last_emit_seen = seen
+            
+            current_dir, file = ".", ""
+            with ThreadPoolExecutor(max_workers=SCAN_WORKERS, thread_name_prefix='scan') as executor:
+                for entry in entries:
+                    file_path = entry.path
+                    file = entry.name
+                    root = os.path.dirname(file_path)
+                    current_dir = os.path.relpath(root, library_path) if root != library_path else "."
+                    
+                    if incremental:
+                        # Check if file is new or modified
+                        is_new_or_modified, status = media_manager.is_file_new_or_modified(file_path, entry, known)
                         
-                        if incremental:
-                            # Check if file is new or modified
-                            is_new_or_modified, status = get_media_manager().is_file_new_or_modified(file_path)
-                            
-                            if is_new_or_modified:
-                                get_media_manager().add_media_file(file_path)
-                                processed_files += 1
-                                if status == "new":
-                                    new_files += 1
-                                elif status == "modified":
-                                    modified_files += 1
-                            else:
-                                skipped_files += 1
-                        else:
-                            # Full scan - process all files
-                            get_media_manager().add_media_file(file_path)
+                        if is_new_or_modified:
+                            pending.append(entry)
                             processed_files += 1
-                            new_files += 1
-                        
-                        progress = int((processed_files + skipped_files) / total_files * 100) if total_files > 0 else 0
-                        socketio.emit('scan_status', {
-                            'status': 'scanning',
-                            'message': f'Scanning {current_dir}: {file}',
-                            'progress': progress,
-                            'processed_files': processed_files,
-                            'total_files': total_files,
-                            'current_file': file,
-                            'current_directory': current_dir,
-                            'scan_directory': library_path,
-                            'scan_type': scan_type_name,
-                            'new_files': new_files,
-                            'modified_files': modified_files,
-                            'skipped_files': skipped_files
-                        })
+                            if status == "new":
+                                new_files += 1
+                            elif status == "modified":
+                                modified_files += 1
+                        else:
+                            skipped_files += 1
+                    else:
+                        # Full scan - process all files
+                        pending.append(entry)
+                        processed_files += 1
+                        new_files += 1
+                    
+                    if len(pending) >= SCAN_BATCH_SIZE:
+                        media_manager.flush_rows(media_manager.build_rows(pending, executor))
+                        pending = []
+                        emit_progress(current_dir)
+                    elif (processed_files + skipped_files - last_emit_seen >= SCAN_PROGRESS_EVERY or
+                          time.monotonic() - last_emit_time >= SCAN_PROGRESS_INTERVAL):
+                        emit_progress(current_dir)
+                
+                media_manager.flush_rows(media_manager.build_rows(pending, executor))
+                emit_progress(current_dir)
+            
+            if processed_files:
+                media_manager.analyze_database()
             
             if incremental:
                 message = f'Incremental scan completed. {new_files} new, {modified_files} modified, {skipped_files} unchanged files.'
@@ -874,6 +1361,7 @@ def api_scan_library():
                 'new_files': new_files,
                 'modified_files': modified_files,
                 'skipped_files': skipped_files,
+                'last_file': file,
                 'scan_type': scan_type_name
             })
             
@@ -888,12 +1376,13 @@ def api_scan_library():
             SCAN_IN_PROGRESS = False
     
     if not SCAN_IN_PROGRESS:
-        threading.Thread(target=scan_thread, daemon=True).start()
+        socketio.start_background_task(scan_thread)
         return jsonify({'status': 'started'})
     else:
         return jsonify({'status': 'already_running'})
 
 @app.route('/api/settings')
+@library_cached
 def api_get_settings():
     """API endpoint to get settings"""
     settings = {}
@@ -901,6 +1390,8 @@ def api_get_settings():
         settings[key] = get_media_manager().get_setting(key)
     return jsonify(settings)
 
+SETTINGS_SAVED_RESPONSE = constant_json({'status': 'success'})
+
 @app.route('/api/settings', methods=['POST'])
 def api_update_settings():
     """API endpoint to update settings"""
@@ -908,6 +1399,9 @@ def api_update_settings():
     for key, value in data.items():
         get_media_manager().set_setting(key, str(value))
     
+    if 'scan_interval' in data or 'auto_scan' in data:
+        reschedule_auto_scan()
+    
     # If library path changed, trigger a rescan
     if 'library_path' in data:
         socketio.emit('library_path_changed', {
@@ -915,7 +1409,7 @@ def api_update_settings():
             'message': 'Library path updated. Consider running a new scan.'
         })
     
-    return jsonify({'status': 'success'})
+    return SETTINGS_SAVED_RESPONSE()
 
 @app.route('/api/version', methods=['GET'])
 def api_get_version():
@@ -1010,7 +1504,7 @@ def api_placeholder_backdrop(media_type):
 def api_media_poster(media_id):
     """Get poster image for specific media"""
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = db_pool.connect()
         cursor = conn.cursor()
         cursor.execute('SELECT file_path, poster_url, media_type FROM media_files WHERE id = ?', (media_id,))
         result = cursor.fetchone()
@@ -1068,7 +1562,7 @@ def api_media_poster(media_id):
 def api_media_backdrop(media_id):
     """Get backdrop image for specific media"""
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = db_pool.connect()
         cursor = conn.cursor()
         cursor.execute('SELECT file_path, backdrop_url, media_type FROM media_files WHERE id = ?', (media_id,))
         result = cursor.fetchone()
@@ -1148,7 +1642,7 @@ def api_cleanup_database():
 def api_cleanup_all_database():
     """API endpoint to completely clean the database"""
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = db_pool.connect()
         cursor = conn.cursor()
         
         # Clear all media files
@@ -1159,6 +1653,7 @@ def api_cleanup_all_database():
         
         conn.commit()
         conn.close()
+        invalidate_library_cache()
         
         logger.info("Database completely cleaned")
         return jsonify({'status': 'success', 'message': 'Database completely cleaned'})
@@ -1170,7 +1665,7 @@ def api_cleanup_all_database():
 def api_browse_database():
     """API endpoint to browse database contents"""
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = db_pool.connect()
         cursor = conn.cursor()
         
         # Get table info
@@ -1228,7 +1723,8 @@ def api_query_database():
         if not query.strip().upper().startswith('SELECT'):
             return jsonify({'status': 'error', 'message': 'Only SELECT queries are allowed'}), 400
         
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = db_pool.connect()
+        conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
         cursor.execute(query)
@@ -1238,7 +1734,7 @@ def api_query_database():
         column_names = [description[0] for description in cursor.description] if cursor.description else []
         
         # Convert to list of dictionaries
-        data_list = [dict(zip(column_names, row)) for row in results]
+        data_list = [dict(row) for row in results]
         
         conn.close()
         
@@ -1253,6 +1749,7 @@ def api_query_database():
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
 @app.route('/api/library/info')
+@library_cached
 def api_library_info():
     """API endpoint to get library information"""
     library_path = get_media_manager().get_setting('library_path', MEDIA_LIBRARY_PATH)
@@ -1263,13 +1760,12 @@ def api_library_info():
     total_size = 0
     
     try:
-        for root, dirs, files in os.walk(library_path):
-            for file in files:
-                if any(file.lower().endswith(f'.{fmt}') for fmt in supported_formats):
-                    file_path = os.path.join(root, file)
-                    if os.path.exists(file_path):
-                        total_files += 1
-                        total_size += os.path.getsize(file_path)
+        for entry in iter_media_files(library_path, media_extensions(supported_formats)):
+            try:
+                total_size += entry.stat().st_size
+                total_files += 1
+            except OSError:
+                continue
     except Exception as e:
         logger.error(f"Error getting library info: {e}")
     
@@ -1281,7 +1777,7 @@ def api_library_info():
     category_counts = {}
     
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = db_pool.connect()
         cursor = conn.cursor()
         
         # Count by media type
@@ -1321,17 +1817,13 @@ def api_library_info():
 @app.route('/api/play/<int:file_id>')
 def api_play_media(file_id):
     """API endpoint to play media file"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    cursor.execute('SELECT file_path FROM media_files WHERE id = ?', (file_id,))
-    result = cursor.fetchone()
-    conn.close()
+    file_path = get_media_file_path(file_id)
+    stat = file_stat(file_path) if file_path else None
     
-    if result:
-        file_path = result[0]
-        if os.path.exists(file_path):
+    if stat:
+        if is_first_range_request():
             get_media_manager().update_play_count(file_id)
-            return send_file(file_path)
+        return stream_file(file_path, stat=stat)
     
     return jsonify({'error': 'File not found'}), 404
 
@@ -1389,6 +1881,7 @@ def api_search_suggestions():
     return jsonify(suggestions)
 
 @app.route('/api/recently-added')
+@library_cached
 def api_recently_added():
     """Get recently added media"""
     days = int(request.args.get('days', 7))
@@ -1398,6 +1891,7 @@ def api_recently_added():
     return jsonify(results)
 
 @app.route('/api/trending')
+@library_cached
 def api_trending():
     """Get trending media"""
     days = int(request.args.get('days', 30))
@@ -1417,6 +1911,7 @@ def api_recommendations(media_id):
     return jsonify(results)
 
 @app.route('/api/search/filters')
+@library_cached
 def api_search_filters():
     """Get available search filters"""
     filters = search_service.get_search_filters()
@@ -1425,7 +1920,7 @@ def api_search_filters():
 @app.route('/api/subtitles/<int:media_id>')
 def api_get_subtitles(media_id):
     """Get subtitles for a media file"""
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = db_pool.connect()
     cursor = conn.cursor()
     cursor.execute('SELECT file_path FROM media_files WHERE id = ?', (media_id,))
     result = cursor.fetchone()
@@ -1436,17 +1931,20 @@ def api_get_subtitles(media_id):
     
     file_path = result[0]
     subtitles = subtitle_service.find_subtitles(file_path)
+    # Remember where they live so /api/subtitle/<filename> can skip a library walk
+    get_media_manager().save_subtitles(media_id, subtitles)
     return jsonify(subtitles)
 
 @app.route('/api/subtitle/<path:filename>')
 def api_get_subtitle(filename):
     """Get subtitle file content"""
-    # Find the subtitle file
-    subtitle_path = None
-    for root, dirs, files in os.walk(MEDIA_LIBRARY_PATH):
-        if filename in files:
-            subtitle_path = os.path.join(root, filename)
-            break
+    # Find the subtitle file, walking the library only if it was never recorded
+    subtitle_path = get_media_manager().find_subtitle_path(filename)
+    if not subtitle_path:
+        for entry in iter_files(MEDIA_LIBRARY_PATH):
+            if entry.name == filename:
+                subtitle_path = entry.path
+                break
     
     if not subtitle_path or not os.path.exists(subtitle_path):
         return jsonify({'error': 'Subtitle not found'}), 404
@@ -1462,7 +1960,8 @@ def api_get_subtitle(filename):
 @app.route('/api/metadata/<int:media_id>')
 def api_get_metadata(media_id):
     """Get or update metadata for a media file"""
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = db_pool.connect()
+    conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
     cursor.execute('SELECT * FROM media_files WHERE id = ?', (media_id,))
     result = cursor.fetchone()
@@ -1472,7 +1971,7 @@ def api_get_metadata(media_id):
         return jsonify({'error': 'Media not found'}), 404
     
     # Get current metadata
-    media_data = dict(zip([desc[0] for desc in cursor.description], result))
+    media_data = dict(result)
     
     # If requested, fetch fresh metadata from TMDB
     if request.args.get('refresh') == 'true':
@@ -1483,7 +1982,7 @@ def api_get_metadata(media_id):
         metadata = tmdb_service.get_media_metadata(file_path, media_type)
         
         # Update database
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = db_pool.connect()
         cursor = conn.cursor()
         cursor.execute("""
             UPDATE media_files SET 
@@ -1493,12 +1992,13 @@ def api_get_metadata(media_id):
             WHERE id = ?
         """, (
             metadata['title'], metadata['poster_url'], metadata['backdrop_url'],
-            metadata['overview'], metadata['rating'], json.dumps(metadata['genres']),
+            metadata['overview'], metadata['rating'], json_dumps(metadata['genres']),
             metadata['runtime'], metadata['release_date'], metadata['imdb_id'],
             metadata['tmdb_id'], media_id
         ))
         conn.commit()
         conn.close()
+        invalidate_library_cache()
         
         # Update media_data with new metadata
         media_data.update(metadata)
@@ -1514,41 +2014,59 @@ def api_bulk_update_metadata():
     if not media_ids:
         return jsonify({'error': 'No media IDs provided'}), 400
     
-    updated_count = 0
     errors = []
+    ids = parse_media_ids(media_ids, errors)
     
-    for media_id in media_ids:
+    try:
+        conn = db_pool.connect()
+        cursor = conn.cursor()
+        cursor.execute(f'SELECT id, file_path, media_type FROM media_files WHERE id IN ({sql_placeholders(ids)})', ids)
+        found = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+        conn.close()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    errors.extend(f"Media ID {media_id} not found" for media_id in ids if media_id not in found)
+    
+    def fetch_metadata(media_id):
+        file_path, media_type = found[media_id]
+        try:
+            return media_id, tmdb_service.get_media_metadata(file_path, media_type), None
+        except Exception as e:
+            return media_id, None, e
+    
+    # TMDB lookups are network-bound, so run them concurrently and write once
+    rows = []
+    with ThreadPoolExecutor(max_workers=BULK_METADATA_WORKERS) as executor:
+        for media_id, metadata, error in executor.map(fetch_metadata, found):
+            if error:
+                errors.append(f"Error updating media ID {media_id}: {str(error)}")
+                continue
+            rows.append((
+                metadata['title'], metadata['poster_url'], metadata['backdrop_url'],
+                metadata['overview'], metadata['rating'], json_dumps(metadata['genres']),
+                metadata['runtime'], metadata['release_date'], metadata['imdb_id'],
+                metadata['tmdb_id'], media_id
+            ))
+    
+    updated_count = 0
+    if rows:
         try:
-            conn = sqlite3.connect(DATABASE_PATH)
+            conn = db_pool.connect()
             cursor = conn.cursor()
-            cursor.execute('SELECT file_path, media_type FROM media_files WHERE id = ?', (media_id,))
-            result = cursor.fetchone()
-            
-            if result:
-                file_path, media_type = result
-                metadata = tmdb_service.get_media_metadata(file_path, media_type)
-                
-                cursor.execute("""
-                    UPDATE media_files SET 
-                        title = ?, poster_url = ?, backdrop_url = ?, overview = ?,
-                        rating = ?, genres = ?, runtime = ?, release_date = ?,
-                        imdb_id = ?, tmdb_id = ?
-                    WHERE id = ?
-                """, (
-                    metadata['title'], metadata['poster_url'], metadata['backdrop_url'],
-                    metadata['overview'], metadata['rating'], json.dumps(metadata['genres']),
-                    metadata['runtime'], metadata['release_date'], metadata['imdb_id'],
-                    metadata['tmdb_id'], media_id
-                ))
-                conn.commit()
-                updated_count += 1
-            else:
-                errors.append(f"Media ID {media_id} not found")
-            
+            cursor.executemany("""
+                UPDATE media_files SET 
+                    title = ?, poster_url = ?, backdrop_url = ?, overview = ?,
+                    rating = ?, genres = ?, runtime = ?, release_date = ?,
+                    imdb_id = ?, tmdb_id = ?
+                WHERE id = ?
+            """, rows)
+            conn.commit()
             conn.close()
-            
+            updated_count = len(rows)
+            invalidate_library_cache()
         except Exception as e:
-            errors.append(f"Error updating media ID {media_id}: {str(e)}")
+            errors.append(f"Error updating media: {str(e)}")
     
     return jsonify({
         'updated_count': updated_count,
@@ -1565,34 +2083,52 @@ def api_bulk_delete():
     if not media_ids:
         return jsonify({'error': 'No media IDs provided'}), 400
     
-    deleted_count = 0
     errors = []
+    ids = parse_media_ids(media_ids, errors)
     
-    for media_id in media_ids:
-        try:
-            conn = sqlite3.connect(DATABASE_PATH)
-            cursor = conn.cursor()
-            cursor.execute('SELECT file_path FROM media_files WHERE id = ?', (media_id,))
-            result = cursor.fetchone()
-            
-            if result:
-                file_path = result[0]
-                
-                # Delete file if requested
+    try:
+        conn = db_pool.connect()
+        cursor = conn.cursor()
+        
+        if not delete_files and SQLITE_SUPPORTS_RETURNING:
+            # Rows only: one DELETE reports which ids existed
+            cursor.execute(f'DELETE FROM media_files WHERE id IN ({sql_placeholders(ids)}) RETURNING id', ids)
+            deleted = {row[0] for row in cursor.fetchall()}
+            conn.commit()
+            conn.close()
+            if deleted:
+                invalidate_library_cache()
+            errors.extend(f"Media ID {media_id} not found" for media_id in ids if media_id not in deleted)
+            return jsonify({
+                'deleted_count': len(deleted),
+                'errors': errors
+            })
+        
+        cursor.execute(f'SELECT id, file_path FROM media_files WHERE id IN ({sql_placeholders(ids)})', ids)
+        found = dict(cursor.fetchall())
+        
+        errors.extend(f"Media ID {media_id} not found" for media_id in ids if media_id not in found)
+        
+        # Delete files if requested; rows whose file could not be removed are kept
+        removable = []
+        for media_id, file_path in found.items():
+            try:
                 if delete_files and os.path.exists(file_path):
                     os.remove(file_path)
-                
-                # Remove from database
-                cursor.execute('DELETE FROM media_files WHERE id = ?', (media_id,))
-                conn.commit()
-                deleted_count += 1
-            else:
-                errors.append(f"Media ID {media_id} not found")
-            
-            conn.close()
-            
-        except Exception as e:
-            errors.append(f"Error deleting media ID {media_id}: {str(e)}")
+                removable.append(media_id)
+            except Exception as e:
+                errors.append(f"Error deleting media ID {media_id}: {str(e)}")
+        
+        # Remove from database in one transaction
+        if removable:
+            cursor.execute(f'DELETE FROM media_files WHERE id IN ({sql_placeholders(removable)})', removable)
+            conn.commit()
+            invalidate_library_cache()
+        conn.close()
+        deleted_count = len(removable)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
     
     return jsonify({
         'deleted_count': deleted_count,
@@ -1690,6 +2226,7 @@ def api_register():
 @require_auth
 def api_logout():
     """User logout endpoint"""
+    auth_service.invalidate_user(request.current_user['user_id'])
     response = jsonify({'message': 'Logged out successfully'})
     response.set_cookie('access_token', '', expires=0)
     return response
@@ -1733,7 +2270,9 @@ def api_update_preferences():
 def api_get_watchlist():
     """Get user's watchlist"""
     user_id = request.current_user['user_id']
-    watchlist = auth_service.get_user_watchlist(user_id)
+    limit = request.args.get('limit', -1, type=int)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    watchlist = auth_service.get_user_watchlist(user_id, limit, offset)
     return jsonify(watchlist)
 
 @app.route('/api/watchlist/<int:media_id>', methods=['POST'])
@@ -1782,6 +2321,34 @@ def api_record_play():
     else:
         return jsonify({'error': 'Failed to record play'}), 500
 
+# Upper bound on play events accepted by one batch request
+PLAY_HISTORY_BATCH_LIMIT = 500
+
+@app.route('/api/play-history/batch', methods=['POST'])
+@require_auth
+def api_record_plays():
+    """Record a batch of play events, e.g. an offline history flush"""
+    user_id = request.current_user['user_id']
+    data = request.get_json() or {}
+    events = data.get('events') or []
+    
+    if not isinstance(events, list) or not events:
+        return jsonify({'error': 'Events required'}), 400
+    if len(events) > PLAY_HISTORY_BATCH_LIMIT:
+        return jsonify({'error': f'At most {PLAY_HISTORY_BATCH_LIMIT} events per request'}), 400
+    if not all(isinstance(event, dict) and event.get('media_id') for event in events):
+        return jsonify({'error': 'Media ID required for every event'}), 400
+    
+    success = auth_service.record_plays(
+        (user_id, event['media_id'], event.get('duration_watched', 0), event.get('completed', False))
+        for event in events
+    )
+    
+    if success:
+        return jsonify({'message': 'Plays recorded successfully', 'recorded': len(events)})
+    else:
+        return jsonify({'error': 'Failed to record plays'}), 500
+
 @app.route('/api/play-history')
 @require_auth
 def api_get_play_history():
@@ -1790,7 +2357,7 @@ def api_get_play_history():
     limit = int(request.args.get('limit', 50))
     
     history = auth_service.get_user_play_history(user_id, limit)
-    return jsonify(history)
+    return Response(dumps_bytes(history), mimetype='application/json')
 
 @app.route('/api/continue-watching')
 @require_auth
@@ -1813,29 +2380,45 @@ def api_get_recommendations():
     recommendations = auth_service.generate_recommendations(user_id, limit)
     return jsonify(recommendations)
 
+# Shared pool for the home screen's independent section queries
+HOME_SECTION_EXECUTOR = ThreadPoolExecutor(max_workers=6, thread_name_prefix='watch-home')
+
+@app.route('/api/home')
+@require_auth
+def api_get_home():
+    """Get watchlist, continue watching and recommendations for the home screen in one request"""
+    user_id = request.current_user['user_id']
+    limit = int(request.args.get('limit', 20))
+    
+    watchlist = HOME_SECTION_EXECUTOR.submit(auth_service.get_user_watchlist, user_id, limit)
+    continue_list = HOME_SECTION_EXECUTOR.submit(auth_service.get_continue_watching, user_id, limit)
+    recommendations = HOME_SECTION_EXECUTOR.submit(auth_service.generate_recommendations, user_id, limit)
+    
+    return Response(dumps_bytes({
+        'watchlist': watchlist.result(),
+        'continue': continue_list.result(),
+        'recommendations': recommendations.result()
+    }), mimetype='application/json')
+
 # PWA endpoints
+MANIFEST_PAYLOAD = build_static_payload(json.dumps(pwa_service.get_manifest()), 'application/json')
+SERVICE_WORKER_PAYLOAD = build_static_payload(pwa_service.service_worker_script, 'application/javascript')
+OFFLINE_PAGE_PAYLOAD = build_static_payload(pwa_service.offline_page, 'text/html')
+
 @app.route('/manifest.json')
 def api_manifest():
     """PWA manifest endpoint"""
-    return jsonify(pwa_service.get_manifest())
+    return static_payload_response(MANIFEST_PAYLOAD)
 
 @app.route('/sw.js')
 def api_service_worker():
     """Service worker endpoint"""
-    from flask import Response
-    return Response(
-        pwa_service.service_worker_script,
-        mimetype='application/javascript'
-    )
+    return static_payload_response(SERVICE_WORKER_PAYLOAD)
 
 @app.route('/offline')
 def api_offline_page():
     """Offline page endpoint"""
-    from flask import Response
-    return Response(
-        pwa_service.offline_page,
-        mimetype='text/html'
-    )
+    return static_payload_response(OFFLINE_PAGE_PAYLOAD)
 
 # Transcoding endpoints
 @app.route('/api/transcode/<int:media_id>')
@@ -1844,21 +2427,15 @@ def api_start_transcode(media_id):
     """Start transcoding for a media file"""
     quality = request.args.get('quality', '720p')
     
-    if quality not in transcoding_service.quality_presets:
+    if quality not in VALID_QUALITIES:
         return jsonify({'error': 'Invalid quality'}), 400
     
     # Get media file path
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    cursor.execute('SELECT file_path FROM media_files WHERE id = ?', (media_id,))
-    result = cursor.fetchone()
-    conn.close()
-    
-    if not result:
+    file_path = get_media_file_path(media_id)
+    if not file_path:
         return jsonify({'error': 'Media not found'}), 404
     
-    file_path = result[0]
-    if not os.path.exists(file_path):
+    if not file_stat(file_path):
         return jsonify({'error': 'Media file not found'}), 404
     
     # Check if already cached
@@ -1885,6 +2462,28 @@ def api_transcode_status(job_id):
     status = transcoding_service.get_transcode_status(job_id)
     return jsonify(status)
 
+# Upper bound on job ids accepted by one batch status request
+TRANSCODE_STATUS_BATCH_LIMIT = 100
+
+@app.route('/api/transcode/status')
+@require_auth
+def api_transcode_statuses():
+    """Get the status of several transcoding jobs in one request (?ids=1,2,3)"""
+    errors = []
+    raw_ids = [job_id.strip() for job_id in request.args.get('ids', '').split(',') if job_id.strip()]
+    if len(raw_ids) > TRANSCODE_STATUS_BATCH_LIMIT:
+        return jsonify({'error': f'At most {TRANSCODE_STATUS_BATCH_LIMIT} job ids per request'}), 400
+    
+    job_ids = parse_media_ids(raw_ids, errors, "Invalid transcode job id {!r}")
+    if not job_ids:
+        return jsonify({'error': 'No valid job ids provided', 'errors': errors}), 400
+    
+    statuses = transcoding_service.get_transcode_statuses(job_ids)
+    return jsonify({
+        'jobs': {str(job_id): statuses.get(job_id, {'error': 'Transcode job not found'}) for job_id in job_ids},
+        'errors': errors
+    })
+
 @app.route('/api/transcode/qualities/<int:media_id>')
 @require_auth
 def api_get_available_qualities(media_id):
@@ -1898,63 +2497,53 @@ def api_stream_media_enhanced(file_id):
     """Enhanced streaming endpoint with quality selection"""
     quality = request.args.get('quality', '720p')
     job_id = request.args.get('job_id')
+    job_id = int(job_id) if job_id and job_id.isdigit() else None
     
-    # Get media info
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    cursor.execute('SELECT file_path FROM media_files WHERE id = ?', (file_id,))
-    result = cursor.fetchone()
-    conn.close()
-    
-    if not result:
-        return jsonify({'error': 'File not found'}), 404
-    
-    file_path = result[0]
-    
-    # Check for transcoded version (if transcoding service is available)
-    if quality != 'original':
-        try:
-            if 'transcoding_service' in globals():
-                cached_path = transcoding_service.get_cached_transcode(file_id, quality)
-                if cached_path:
-                    file_path = cached_path
-                elif job_id:
-                    # Check if transcoding is complete
-                    status = transcoding_service.get_transcode_status(int(job_id))
-                    if status.get('status') == 'completed' and status.get('output_path'):
-                        file_path = status['output_path']
-                    else:
-                        return jsonify({
-                            'error': 'Transcoding in progress',
-                            'status': status.get('status'),
-                            'progress': status.get('progress', 0)
-                        }), 202
-        except:
-            # Continue with original file if transcoding service is not available
-            pass
-    
-    if os.path.exists(file_path):
-        # Record play (if authentication is available)
-        try:
-            if hasattr(request, 'current_user') and request.current_user:
-                user_id = request.current_user['user_id']
-                auth_service.record_play(user_id, file_id)
-        except:
-            # Continue without recording play if auth is not available
-            pass
-        
-        # Update play count in media manager
-        get_media_manager().update_play_count(file_id)
-        
-        # Optimize streaming with range support and caching headers
-        return send_file(
-            file_path, 
-            as_attachment=False,
-            mimetype='video/mp4',  # Set proper MIME type
-            conditional=True,      # Enable conditional requests
-            etag=True,            # Enable ETag support
-            last_modified=True    # Enable Last-Modified support
-        )
+    # Unknown qualities can never have a cached transcode, so without a job they stream the original
+    if quality == 'original' or (quality not in VALID_QUALITIES and job_id is None):
+        # Get media info
+        file_path = get_media_file_path(file_id)
+        if not file_path:
+            return jsonify({'error': 'File not found'}), 404
+    else:
+        # One query answers the source path, a cached transcode and the job's progress
+        context = transcoding_service.get_stream_context(file_id, quality, job_id)
+        if not context:
+            return jsonify({'error': 'File not found'}), 404
+        
+        file_path = context['file_path']
+        if context['cached_path']:
+            file_path = context['cached_path']
+            if is_first_range_request():
+                transcoding_service.touch_cached_transcode(file_id, quality)
+        elif job_id is not None:
+            # Check if transcoding is complete
+            if context['job_status'] == 'completed' and context['job_output_path']:
+                file_path = context['job_output_path']
+            else:
+                return jsonify({
+                    'error': 'Transcoding in progress',
+                    'status': context['job_status'],
+                    'progress': context['job_progress']
+                }), 202
+    
+    stat = file_stat(file_path)
+    if stat:
+        # Seeks arrive as further Range requests; only the opening request counts as a play
+        if is_first_range_request():
+            # Record play (if authentication is available) off the response path
+            try:
+                if hasattr(request, 'current_user') and request.current_user:
+                    record_play_async(request.current_user['user_id'], file_id)
+            except:
+                # Continue without recording play if auth is not available
+                pass
+            
+            # Update play count in media manager
+            get_media_manager().update_play_count(file_id)
+        
+        # Range-aware streaming with caching headers
+        return stream_file(file_path, 'video/mp4', stat)
     
     return jsonify({'error': 'File not found'}), 404
 
@@ -1963,28 +2552,18 @@ def api_stream_media_simple(file_id):
     """Simple streaming endpoint for faster loading"""
     try:
         # Get media info
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-        cursor.execute('SELECT file_path FROM media_files WHERE id = ?', (file_id,))
-        result = cursor.fetchone()
-        conn.close()
-        
-        if not result:
+        file_path = get_media_file_path(file_id)
+        if not file_path:
             return jsonify({'error': 'File not found'}), 404
         
-        file_path = result[0]
-        
-        if os.path.exists(file_path):
+        stat = file_stat(file_path)
+        if stat:
             # Update play count
-            get_media_manager().update_play_count(file_id)
+            if is_first_range_request():
+                get_media_manager().update_play_count(file_id)
             
             # Simple streaming with basic optimizations
-            return send_file(
-                file_path, 
-                as_attachment=False,
-                conditional=True,
-                etag=True
-            )
+            return stream_file(file_path, stat=stat)
         
         return jsonify({'error': 'File not found'}), 404
     except Exception as e:
@@ -1998,7 +2577,7 @@ def api_stream_media_simple(file_id):
 def api_get_all_users():
     """Get all users (admin only)"""
     admin_user_id = request.current_user['user_id']
-    users = auth_service.get_all_users(admin_user_id)
+    users = auth_service.get_all_users(admin_user_id, request.current_user.get('role'))
     return jsonify(users)
 
 @app.route('/api/admin/transcode/cleanup', methods=['POST'])
@@ -2041,8 +2620,7 @@ def api_detailed_metrics():
 @monitor_performance
 def api_prometheus_metrics():
     """Prometheus metrics endpoint"""
-    from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
-    return Response(generate_latest(), mimetype=CONTENT_TYPE_LATEST)
+    return prometheus_metrics_response()
 
 # Database management endpoints
 @app.route('/api/admin/database/stats')
@@ -2159,24 +2737,26 @@ def api_cache_clear_pattern():
     })
 
 # API documentation endpoints
+API_DOCS_PAYLOAD = build_static_payload(api_docs_service.get_api_docs_html(), 'text/html')
+OPENAPI_SPEC_PAYLOAD = build_static_payload(json.dumps(api_docs_service.get_openapi_spec()), 'application/json')
+
 @app.route('/api/docs')
 @monitor_performance
 def api_docs():
     """API documentation page"""
-    from flask import Response
-    return Response(api_docs_service.get_api_docs_html(), mimetype='text/html')
+    return static_payload_response(API_DOCS_PAYLOAD)
 
 @app.route('/api/docs/openapi.json')
 @monitor_performance
 def api_openapi_spec():
     """OpenAPI specification"""
-    return jsonify(api_docs_service.get_openapi_spec())
+    return static_payload_response(OPENAPI_SPEC_PAYLOAD)
 
 # Enhanced media endpoints with caching
 @app.route('/api/media')
 @monitor_performance
 @track_active_requests
-@cached(ttl=300, key_prefix=CacheKeys.MEDIA_LIST)  # Cache for 5 minutes
+@library_cached
 def api_get_media_cached():
     """Get media library with caching"""
     media_type = request.args.get('type')
@@ -2195,22 +2775,13 @@ def api_get_media_cached():
     params.extend([limit, offset])
     
     media_files = database_service.execute_query(query, tuple(params))
-    
-    # Parse JSON fields
-    for media in media_files:
-        if media.get('genres'):
-            try:
-                media['genres'] = json.loads(media['genres']) if isinstance(media['genres'], str) else media['genres']
-            except:
-                media['genres'] = []
-    
-    return jsonify(media_files)
+    return Response(dumps_bytes(decode_genres(media_files)), mimetype='application/json')
 
 # Enhanced search with caching
 @app.route('/api/search')
 @monitor_performance
 @track_active_requests
-@cached(ttl=600, key_prefix=CacheKeys.SEARCH_RESULTS)  # Cache for 10 minutes
+@library_cached
 def api_search_cached():
     """Enhanced search with caching"""
     search_term = request.args.get('q', '')
@@ -2232,22 +2803,30 @@ def api_search_cached():
     }
     
     results = search_service.search_media(filters)
-    return jsonify(results)
+    return Response(dumps_bytes(results), mimetype='application/json')
 
 # ===== UI/UX ENHANCEMENTS API ENDPOINTS =====
 
 # UI Components endpoints
+UI_COMPONENTS_CSS_PAYLOAD = build_static_payload(ui_components_service.get_all_css(), 'text/css')
+THEME_SWITCHER_PAYLOAD = build_static_payload(ui_components_service.get_theme_switcher_html(), 'text/html')
+
+@lru_cache(maxsize=64)
+def loading_spinner_payload(size, color):
+    """Build (and memoize) the loading spinner payload for a size/color pair"""
+    return build_static_payload(ui_components_service.get_loading_spinner_html(size, color), 'text/html')
+
 @app.route('/api/ui/components/css')
 @monitor_performance
 def api_ui_components_css():
     """Get UI components CSS"""
-    return Response(ui_components_service.get_all_css(), mimetype='text/css')
+    return static_payload_response(UI_COMPONENTS_CSS_PAYLOAD)
 
 @app.route('/api/ui/theme-switcher')
 @monitor_performance
 def api_theme_switcher():
     """Get theme switcher HTML"""
-    return Response(ui_components_service.get_theme_switcher_html(), mimetype='text/html')
+    return static_payload_response(THEME_SWITCHER_PAYLOAD)
 
 @app.route('/api/ui/loading-spinner')
 @monitor_performance
@@ -2255,7 +2834,7 @@ def api_loading_spinner():
     """Get loading spinner HTML"""
     size = request.args.get('size', 'medium')
     color = request.args.get('color', 'primary')
-    return Response(ui_components_service.get_loading_spinner_html(size, color), mimetype='text/html')
+    return static_payload_response(loading_spinner_payload(size, color))
 
 # Social features endpoints
 @app.route('/api/social/profile', methods=['GET', 'PUT'])
@@ -2466,6 +3045,10 @@ def api_mark_notification_read(notification_id):
         return jsonify({'error': 'Failed to mark notification as read'}), 500
 
 # Advanced player endpoints
+SESSION_UPDATED_RESPONSE = constant_json({'message': 'Session updated successfully'})
+SESSION_ENDED_RESPONSE = constant_json({'message': 'Session ended successfully'})
+PLAYER_SETTINGS_UPDATED_RESPONSE = constant_json({'message': 'Settings updated successfully'})
+
 @app.route('/api/player/playlists', methods=['GET', 'POST'])
 @require_auth
 @monitor_performance
@@ -2548,6 +3131,14 @@ def api_play_queue():
         else:
             return jsonify({'error': 'Failed to create queue'}), 500
 
+PLAYBACK_SESSION_START_SCHEMA = {
+    'media_id': Field((int, str), required=True),
+    'session_id': Field(str)
+}
+PLAYBACK_SESSION_UPDATE_SCHEMA = {
+    'session_id': Field(str, required=True)
+}
+
 @app.route('/api/player/session', methods=['POST', 'PUT'])
 @require_auth
 @monitor_performance
@@ -2556,32 +3147,30 @@ def api_playback_session():
     user_id = request.current_user['user_id']
     
     if request.method == 'POST':
-        data = request.get_json()
-        media_id = data.get('media_id')
-        session_id = data.get('session_id')
-        
-        if not media_id:
-            return jsonify({'error': 'Media ID required'}), 400
+        try:
+            payload = get_payload(PLAYBACK_SESSION_START_SCHEMA)
+        except PayloadError as e:
+            return jsonify({'error': str(e)}), 400
         
-        session_id = player_service.start_playback_session(user_id, media_id, session_id)
+        session_id = player_service.start_playback_session(user_id, payload['media_id'], payload['session_id'])
         if session_id:
             return jsonify({'message': 'Session started', 'session_id': session_id})
         else:
             return jsonify({'error': 'Failed to start session'}), 500
     
     elif request.method == 'PUT':
-        data = request.get_json()
-        session_id = data.get('session_id')
-        
-        if not session_id:
-            return jsonify({'error': 'Session ID required'}), 400
+        data = request.get_json(silent=True)
+        try:
+            session_id = validate_payload(data, PLAYBACK_SESSION_UPDATE_SCHEMA)['session_id']
+        except PayloadError as e:
+            return jsonify({'error': str(e)}), 400
         
         # Remove session_id from data before passing to update
         update_data = {k: v for k, v in data.items() if k != 'session_id'}
         
         success = player_service.update_playback_session(session_id, **update_data)
         if success:
-            return jsonify({'message': 'Session updated successfully'})
+            return SESSION_UPDATED_RESPONSE()
         else:
             return jsonify({'error': 'Failed to update session'}), 500
 
@@ -2592,7 +3181,7 @@ def api_end_playback_session(session_id):
     """End playback session"""
     success = player_service.end_playback_session(session_id)
     if success:
-        return jsonify({'message': 'Session ended successfully'})
+        return SESSION_ENDED_RESPONSE()
     else:
         return jsonify({'error': 'Failed to end session'}), 500
 
@@ -2622,6 +3211,36 @@ def api_media_bookmarks(media_id):
         else:
             return jsonify({'error': 'Failed to create bookmark'}), 500
 
+BOOKMARK_SCHEMA = {
+    'time_position': Field((int, float), required=True),
+    'bookmark_name': Field(str),
+    'notes': Field(str)
+}
+MAX_BULK_BOOKMARKS = 500
+
+@app.route('/api/player/bookmarks/<int:media_id>/bulk', methods=['POST'])
+@require_auth
+@monitor_performance
+def api_bulk_create_bookmarks(media_id):
+    """Create many bookmarks for a media item in one request"""
+    user_id = request.current_user['user_id']
+    data = request.get_json(silent=True)
+    
+    if not isinstance(data, list) or not data:
+        return jsonify({'error': 'Array of bookmarks required'}), 400
+    if len(data) > MAX_BULK_BOOKMARKS:
+        return jsonify({'error': f'At most {MAX_BULK_BOOKMARKS} bookmarks per request'}), 400
+    
+    try:
+        bookmarks = [validate_payload(item, BOOKMARK_SCHEMA) for item in data]
+    except PayloadError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    bookmark_ids = player_service.create_bookmarks(user_id, media_id, bookmarks)
+    if bookmark_ids is None:
+        return jsonify({'error': 'Failed to create bookmarks'}), 500
+    return jsonify({'message': 'Bookmarks created successfully', 'bookmark_ids': bookmark_ids}), 201
+
 @app.route('/api/player/settings', methods=['GET', 'PUT'])
 @require_auth
 @monitor_performance
@@ -2636,27 +3255,42 @@ def api_player_settings():
     elif request.method == 'PUT':
         data = request.get_json()
         
-        for setting_name, setting_value in data.items():
-            success = player_service.update_player_setting(user_id, setting_name, setting_value)
-            if not success:
-                return jsonify({'error': f'Failed to update setting: {setting_name}'}), 500
+        if not isinstance(data, dict) or not data:
+            return jsonify({'error': 'Settings object required'}), 400
         
-        return jsonify({'message': 'Settings updated successfully'})
+        invalid = [name for name in data if not name or len(name) > 64]
+        if invalid:
+            return jsonify({'error': f'Invalid setting name: {invalid[0]}'}), 400
+        
+        if not player_service.update_player_settings(user_id, data):
+            return jsonify({'error': 'Failed to update settings'}), 500
+        
+        return PLAYER_SETTINGS_UPDATED_RESPONSE()
 
 @app.route('/api/player/history')
 @require_auth
 @monitor_performance
+@conditional_get
 def api_playback_history():
     """Get user's playback history"""
     user_id = request.current_user['user_id']
     limit = int(request.args.get('limit', 50))
-    
-    history = player_service.get_playback_history(user_id, limit)
-    return jsonify(history)
+    try:
+        before = decode_cursor(request.args.get('cursor'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    history = player_service.get_playback_history(user_id, limit, before)
+    response = jsonify(history)
+    cursor = next_cursor(history, limit, 'start_time')
+    if cursor:
+        response.headers['X-Next-Cursor'] = cursor
+    return response
 
 @app.route('/api/player/continue-watching')
 @require_auth
 @monitor_performance
+@conditional_get
 def api_player_continue_watching():
     """Get continue watching list from player service"""
     user_id = request.current_user['user_id']
@@ -2675,7 +3309,7 @@ def api_player_continue_watching():
 def get_external_service_auth_url(service_name):
     """Get OAuth authorization URL for external service"""
     try:
-        user_id = get_jwt_identity()
+        user_id = request.current_user['user_id']
         redirect_uri = request.args.get('redirect_uri', f"{request.url_root}api/integrations/external-services/callback/{service_name}")
         
         auth_url = external_services_service.get_auth_url(user_id, service_name, redirect_uri)
@@ -2688,7 +3322,7 @@ def get_external_service_auth_url(service_name):
         else:
             return jsonify({'success': False, 'error': 'Service not supported'}), 400
     except Exception as e:
-        logger.error(f"Error getting auth URL: {e}")
+        logger.exception("Error getting auth URL")
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/integrations/external-services/callback/<service_name>', methods=['GET'])
@@ -2696,7 +3330,7 @@ def get_external_service_auth_url(service_name):
 def handle_external_service_callback(service_name):
     """Handle OAuth callback from external service"""
     try:
-        user_id = get_jwt_identity()
+        user_id = request.current_user['user_id']
         code = request.args.get('code')
         state = request.args.get('state')
         
@@ -2713,37 +3347,30 @@ def handle_external_service_callback(service_name):
         else:
             return jsonify({'success': False, 'error': 'Failed to connect service'}), 400
     except Exception as e:
-        logger.error(f"Error handling OAuth callback: {e}")
+        logger.exception("Error handling OAuth callback")
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/integrations/external-services/connections', methods=['GET'])
 @require_auth
+@conditional_get
 def get_external_service_connections():
     """Get user's external service connections"""
     try:
-        user_id = get_jwt_identity()
-        connections = []
-        
-        for service_name in ['trakt', 'letterboxd', 'imdb', 'dropbox', 'google_drive', 'twitter', 'facebook', 'telegram']:
-            connection = external_services_service.get_service_connection(user_id, service_name)
-            if connection:
-                connections.append({
-                    'service_name': service_name,
-                    'connected': True,
-                    'connected_at': connection['created_at']
-                })
-            else:
-                connections.append({
-                    'service_name': service_name,
-                    'connected': False
-                })
+        user_id = request.current_user['user_id']
+        found = external_services_service.get_service_connections(user_id, SUPPORTED_SERVICES)
+        connections = [
+            {'service_name': service_name, 'connected': True, 'connected_at': found[service_name]['created_at']}
+            if found[service_name] else
+            {'service_name': service_name, 'connected': False}
+            for service_name in SUPPORTED_SERVICES
+        ]
         
         return jsonify({
             'success': True,
             'connections': connections
         })
     except Exception as e:
-        logger.error(f"Error getting service connections: {e}")
+        logger.exception("Error getting service connections")
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/integrations/external-services/sync/<service_name>', methods=['POST'])
@@ -2751,22 +3378,22 @@ def get_external_service_connections():
 def sync_external_service(service_name):
     """Sync with external service"""
     try:
-        user_id = get_jwt_identity()
+        user_id = request.current_user['user_id']
         
         if service_name == 'trakt':
-            success = external_services_service.sync_with_trakt(user_id)
+            sync = external_services_service.sync_with_trakt
         else:
             return jsonify({'success': False, 'error': 'Service sync not implemented'}), 400
         
-        if success:
-            return jsonify({
-                'success': True,
-                'message': f'Successfully synced with {service_name}'
-            })
-        else:
-            return jsonify({'success': False, 'error': 'Sync failed'}), 400
+        def run_sync():
+            if not sync(user_id):
+                raise RuntimeError('Sync failed')
+            return f'Successfully synced with {service_name}'
+        
+        job_id = job_service.submit(f'sync:{service_name}', run_sync, user_id=user_id)
+        return accepted_job_response(job_id)
     except Exception as e:
-        logger.error(f"Error syncing with {service_name}: {e}")
+        logger.exception("Error syncing with %s", service_name)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/integrations/external-services/share/<service_name>', methods=['POST'])
@@ -2774,7 +3401,7 @@ def sync_external_service(service_name):
 def share_to_external_service(service_name):
     """Share media to external service"""
     try:
-        user_id = get_jwt_identity()
+        user_id = request.current_user['user_id']
         data = request.get_json()
         media_id = data.get('media_id')
         message = data.get('message')
@@ -2783,35 +3410,60 @@ def share_to_external_service(service_name):
             return jsonify({'success': False, 'error': 'Media ID required'}), 400
         
         if service_name == 'twitter':
-            success = external_services_service.share_to_twitter(user_id, media_id, message)
+            share = external_services_service.share_to_twitter
         else:
             return jsonify({'success': False, 'error': 'Service sharing not implemented'}), 400
         
-        if success:
-            return jsonify({
-                'success': True,
-                'message': f'Successfully shared to {service_name}'
-            })
-        else:
-            return jsonify({'success': False, 'error': 'Sharing failed'}), 400
+        def run_share():
+            if not share(user_id, media_id, message):
+                raise RuntimeError('Sharing failed')
+            return f'Successfully shared to {service_name}'
+        
+        job_id = job_service.submit(f'share:{service_name}', run_share, user_id=user_id)
+        return accepted_job_response(job_id)
     except Exception as e:
-        logger.error(f"Error sharing to {service_name}: {e}")
+        logger.exception("Error sharing to %s", service_name)
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def accepted_job_response(job_id):
+    """202 response pointing the client at a background job"""
+    response = jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': f'/api/jobs/{job_id}'
+    })
+    response.status_code = 202
+    response.headers['Location'] = f'/api/jobs/{job_id}'
+    return response
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+@require_auth
+def api_job_status(job_id):
+    """Get background job status"""
+    job = job_service.get_job(job_id)
+    current_user = request.current_user
+    if not job or (job['user_id'] != current_user['user_id'] and current_user.get('role') != 'admin'):
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    
+    return jsonify({'success': True, 'job': job})
+
+WEBHOOK_SUBSCRIPTION_SCHEMA = {
+    'webhook_url': Field(str, required=True),
+    'event_types': Field(list, required=True),
+    'secret_key': Field(str)
+}
+
 @app.route('/api/integrations/external-services/webhooks', methods=['POST'])
 @require_auth
 def create_webhook_subscription():
     """Create webhook subscription"""
     try:
-        user_id = get_jwt_identity()
-        data = request.get_json()
-        
-        webhook_url = data.get('webhook_url')
-        event_types = data.get('event_types', [])
-        secret_key = data.get('secret_key')
-        
-        if not webhook_url or not event_types:
-            return jsonify({'success': False, 'error': 'Webhook URL and event types required'}), 400
+        user_id = request.current_user['user_id']
+        payload = get_payload(WEBHOOK_SUBSCRIPTION_SCHEMA)
+        webhook_url = payload['webhook_url']
+        event_types = payload['event_types']
+        secret_key = payload['secret_key']
         
         webhook_id = external_services_service.create_webhook_subscription(user_id, webhook_url, event_types, secret_key)
         
@@ -2823,35 +3475,44 @@ def create_webhook_subscription():
             })
         else:
             return jsonify({'success': False, 'error': 'Failed to create webhook'}), 400
+    except PayloadError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
-        logger.error(f"Error creating webhook: {e}")
+        logger.exception("Error creating webhook")
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/integrations/external-services/logs', methods=['GET'])
 @require_auth
+@conditional_get
 def get_integration_logs():
     """Get integration logs"""
     try:
         service_name = request.args.get('service_name')
         limit = int(request.args.get('limit', 100))
+        try:
+            before = decode_cursor(request.args.get('cursor'))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         
-        logs = external_services_service.get_integration_logs(service_name, limit)
+        logs = external_services_service.get_integration_logs(service_name, limit, before)
         
         return jsonify({
             'success': True,
-            'logs': logs
+            'logs': logs,
+            'next_cursor': next_cursor(logs, limit, 'created_at')
         })
     except Exception as e:
-        logger.error(f"Error getting integration logs: {e}")
+        logger.exception("Error getting integration logs")
         return jsonify({'success': False, 'error': str(e)}), 500
 
 # Smart Home Integration
 @app.route('/api/integrations/smart-home/devices', methods=['GET'])
 @require_auth
+@conditional_get
 def get_smart_home_devices():
     """Get user's smart home devices"""
     try:
-        user_id = get_jwt_identity()
+        user_id = request.current_user['user_id']
         platform = request.args.get('platform')
         
         devices = smart_home_service.get_user_devices(user_id, platform)
@@ -2861,27 +3522,29 @@ def get_smart_home_devices():
             'devices': devices
         })
     except Exception as e:
-        logger.error(f"Error getting smart home devices: {e}")
+        logger.exception("Error getting smart home devices")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+SMART_HOME_DEVICE_SCHEMA = {
+    'device_name': Field(str, required=True),
+    'device_type': Field(str, required=True),
+    'device_id': Field((str, int), required=True),
+    'platform': Field(str, required=True),
+    'device_data': Field(dict, default={})
+}
+
 @app.route('/api/integrations/smart-home/devices', methods=['POST'])
 @require_auth
 def register_smart_home_device():
     """Register smart home device"""
     try:
-        user_id = get_jwt_identity()
-        data = request.get_json()
-        
-        device_name = data.get('device_name')
-        device_type = data.get('device_type')
-        device_id = data.get('device_id')
-        platform = data.get('platform')
-        device_data = data.get('device_data', {})
-        
-        if not all([device_name, device_type, device_id, platform]):
-            return jsonify({'success': False, 'error': 'Missing required fields'}), 400
+        user_id = request.current_user['user_id']
+        payload = get_payload(SMART_HOME_DEVICE_SCHEMA)
         
-        device_db_id = smart_home_service.register_device(user_id, device_name, device_type, device_id, platform, device_data)
+        device_db_id = smart_home_service.register_device(
+            user_id, payload['device_name'], payload['device_type'],
+            payload['device_id'], payload['platform'], payload['device_data']
+        )
         
         if device_db_id:
             return jsonify({
@@ -2891,48 +3554,53 @@ def register_smart_home_device():
             })
         else:
             return jsonify({'success': False, 'error': 'Failed to register device'}), 400
+    except PayloadError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
-        logger.error(f"Error registering device: {e}")
+        logger.exception("Error registering device")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+VOICE_COMMAND_SCHEMA = {
+    'command_text': Field(str, required=True),
+    'platform': Field(str, default='alexa')
+}
+
 @app.route('/api/integrations/smart-home/voice-command', methods=['POST'])
 @require_auth
 def handle_voice_command():
     """Handle voice command from smart home device"""
     try:
-        user_id = get_jwt_identity()
-        data = request.get_json()
-        
-        command_text = data.get('command_text')
-        platform = data.get('platform', 'alexa')
-        
-        if not command_text:
-            return jsonify({'success': False, 'error': 'Command text required'}), 400
+        user_id = request.current_user['user_id']
+        payload = get_payload(VOICE_COMMAND_SCHEMA)
         
-        result = smart_home_service.handle_voice_command(user_id, command_text, platform)
+        result = smart_home_service.handle_voice_command(user_id, payload['command_text'], payload['platform'])
         
         return jsonify({
             'success': True,
             'result': result
         })
+    except PayloadError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
-        logger.error(f"Error handling voice command: {e}")
+        logger.exception("Error handling voice command")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+HOME_ASSISTANT_CONTROL_SCHEMA = {
+    'entity_id': Field(str, required=True),
+    'action': Field(str, required=True),
+    'parameters': Field(dict, default={})
+}
+
 @app.route('/api/integrations/smart-home/home-assistant/control', methods=['POST'])
 @require_auth
 def control_home_assistant_entity():
     """Control Home Assistant entity"""
     try:
-        user_id = get_jwt_identity()
-        data = request.get_json()
-        
-        entity_id = data.get('entity_id')
-        action = data.get('action')
-        parameters = data.get('parameters', {})
-        
-        if not entity_id or not action:
-            return jsonify({'success': False, 'error': 'Entity ID and action required'}), 400
+        user_id = request.current_user['user_id']
+        payload = get_payload(HOME_ASSISTANT_CONTROL_SCHEMA)
+        entity_id = payload['entity_id']
+        action = payload['action']
+        parameters = payload['parameters']
         
         success = smart_home_service.control_home_assistant_entity(user_id, entity_id, action, parameters)
         
@@ -2943,22 +3611,23 @@ def control_home_assistant_entity():
             })
         else:
             return jsonify({'success': False, 'error': 'Failed to control entity'}), 400
+    except PayloadError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
-        logger.error(f"Error controlling Home Assistant entity: {e}")
+        logger.exception("Error controlling Home Assistant entity")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+HUE_SCENE_SCHEMA = {
+    'scene_name': Field(str, required=True)
+}
+
 @app.route('/api/integrations/smart-home/philips-hue/scene', methods=['POST'])
 @require_auth
 def set_philips_hue_scene():
     """Set Philips Hue scene"""
     try:
-        user_id = get_jwt_identity()
-        data = request.get_json()
-        
-        scene_name = data.get('scene_name')
-        
-        if not scene_name:
-            return jsonify({'success': False, 'error': 'Scene name required'}), 400
+        user_id = request.current_user['user_id']
+        scene_name = get_payload(HUE_SCENE_SCHEMA)['scene_name']
         
         success = smart_home_service.set_philips_hue_scene(user_id, scene_name)
         
@@ -2969,31 +3638,40 @@ def set_philips_hue_scene():
             })
         else:
             return jsonify({'success': False, 'error': 'Failed to set scene'}), 400
+    except PayloadError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
-        logger.error(f"Error setting Philips Hue scene: {e}")
+        logger.exception("Error setting Philips Hue scene")
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/integrations/smart-home/voice-history', methods=['GET'])
 @require_auth
+@conditional_get
 def get_voice_command_history():
     """Get voice command history"""
     try:
-        user_id = get_jwt_identity()
+        user_id = request.current_user['user_id']
         limit = int(request.args.get('limit', 50))
+        try:
+            before = decode_cursor(request.args.get('cursor'))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         
-        history = smart_home_service.get_voice_command_history(user_id, limit)
+        history = smart_home_service.get_voice_command_history(user_id, limit, before)
         
         return jsonify({
             'success': True,
-            'history': history
+            'history': history,
+            'next_cursor': next_cursor(history, limit, 'created_at')
         })
     except Exception as e:
-        logger.error(f"Error getting voice command history: {e}")
+        logger.exception("Error getting voice command history")
         return jsonify({'success': False, 'error': str(e)}), 500
 
 # Automation
 @app.route('/api/integrations/automation/tasks', methods=['GET'])
 @require_auth
+@conditional_get
 def get_automation_tasks():
     """Get automation tasks"""
     try:
@@ -3004,25 +3682,27 @@ def get_automation_tasks():
             'tasks': tasks
         })
     except Exception as e:
-        logger.error(f"Error getting automation tasks: {e}")
+        logger.exception("Error getting automation tasks")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+AUTOMATION_TASK_SCHEMA = {
+    'task_name': Field(str, required=True),
+    'task_type': Field(str, required=True),
+    'schedule_expression': Field(str, required=True),
+    'task_config': Field(dict, default={})
+}
+
 @app.route('/api/integrations/automation/tasks', methods=['POST'])
 @require_auth
 def create_automation_task():
     """Create automation task"""
     try:
-        data = request.get_json()
-        
-        task_name = data.get('task_name')
-        task_type = data.get('task_type')
-        schedule_expression = data.get('schedule_expression')
-        task_config = data.get('task_config', {})
+        payload = get_payload(AUTOMATION_TASK_SCHEMA)
         
-        if not all([task_name, task_type, schedule_expression]):
-            return jsonify({'success': False, 'error': 'Missing required fields'}), 400
-        
-        task_id = automation_service.create_automation_task(task_name, task_type, schedule_expression, task_config)
+        task_id = automation_service.create_automation_task(
+            payload['task_name'], payload['task_type'],
+            payload['schedule_expression'], payload['task_config']
+        )
         
         if task_id:
             return jsonify({
@@ -3032,8 +3712,10 @@ def create_automation_task():
             })
         else:
             return jsonify({'success': False, 'error': 'Failed to create task'}), 400
+    except PayloadError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
-        logger.error(f"Error creating automation task: {e}")
+        logger.exception("Error creating automation task")
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/integrations/automation/tasks/<int:task_id>/toggle', methods=['PUT'])
@@ -3054,7 +3736,7 @@ def toggle_automation_task(task_id):
         else:
             return jsonify({'success': False, 'error': 'Failed to toggle task'}), 400
     except Exception as e:
-        logger.error(f"Error toggling automation task: {e}")
+        logger.exception("Error toggling automation task")
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/integrations/automation/tasks/<int:task_id>', methods=['DELETE'])
@@ -3072,63 +3754,149 @@ def delete_automation_task(task_id):
         else:
             return jsonify({'success': False, 'error': 'Failed to delete task'}), 400
     except Exception as e:
-        logger.error(f"Error deleting automation task: {e}")
+        logger.exception("Error deleting automation task")
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/integrations/automation/tasks/<int:task_id>/logs', methods=['GET'])
 @require_auth
+@conditional_get
 def get_automation_task_logs(task_id):
     """Get automation task logs"""
     try:
         limit = int(request.args.get('limit', 50))
+        try:
+            before = decode_cursor(request.args.get('cursor'))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         
-        logs = automation_service.get_task_logs(task_id, limit)
+        logs = automation_service.get_task_logs(task_id, limit, before)
         
         return jsonify({
             'success': True,
-            'logs': logs
+            'logs': logs,
+            'next_cursor': next_cursor(logs, limit, 'execution_time')
         })
     except Exception as e:
-        logger.error(f"Error getting automation task logs: {e}")
+        logger.exception("Error getting automation task logs")
         return jsonify({'success': False, 'error': str(e)}), 500
 
-# Initialize services after database is ready
-search_service = SearchService(DATABASE_PATH)
-
-# Initialize integration services
-external_services_service = ExternalServicesService(DATABASE_PATH)
-smart_home_service = SmartHomeService(DATABASE_PATH)
-automation_service = AutomationService(DATABASE_PATH)
+# Services constructed on first use rather than at import, so importing the
+# module (e.g. a gunicorn master with preload) opens no DB handles or threads
+search_service = None
+external_services_service = None
+smart_home_service = None
+automation_service = None
+SERVICES_LOCK = threading.Lock()
+SERVICES_READY = False
+
+def init_services():
+    """Construct the search and integration services once per process"""
+    global search_service, external_services_service, smart_home_service, automation_service, SERVICES_READY
+    if SERVICES_READY:
+        return
+    
+    with SERVICES_LOCK:
+        if SERVICES_READY:
+            return
+        
+        search_service = SearchService(DATABASE_PATH)
+        
+        # Initialize integration services
+        external_services_service = ExternalServicesService(DATABASE_PATH)
+        if acquire_leader_lock(TOKEN_REFRESHER_LOCK_PATH):
+            external_services_service.start_token_refresher()
+        smart_home_service = SmartHomeService(DATABASE_PATH)
+        automation_service = AutomationService(DATABASE_PATH, tmdb_service=tmdb_service)
+        
+        # Update the global service instances in their modules
+        import src.services.external_services_service as ess_module
+        import src.services.smart_home_service as shs_module
+        import src.services.automation_service as as_module
+        
+        ess_module.external_services_service = external_services_service
+        shs_module.smart_home_service = smart_home_service
+        as_module.automation_service = automation_service
+        
+        SERVICES_READY = True
 
-# Update the global service instances in their modules
-import src.services.external_services_service as ess_module
-import src.services.smart_home_service as shs_module
-import src.services.automation_service as as_module
+@app.before_request
+def ensure_services():
+    """Make sure services exist for servers that import app without create_app()"""
+    init_services()
 
-ess_module.external_services_service = external_services_service
-shs_module.smart_home_service = smart_home_service
-as_module.automation_service = automation_service
+def create_app():
+    """Application factory for WSGI servers (e.g. gunicorn 'app:create_app()')"""
+    init_services()
+    start_auto_scan_scheduler()
+    return app
 
 @socketio.on('connect')
 def handle_connect():
     """Handle client connection"""
-    logger.info(f"Client connected: {request.sid}")
+    logger.info("Client connected: %s", request.sid)
     emit('status', {'scan_in_progress': SCAN_IN_PROGRESS})
 
 @socketio.on('disconnect')
 def handle_disconnect():
     """Handle client disconnection"""
-    logger.info(f"Client disconnected: {request.sid}")
+    logger.info("Client disconnected: %s", request.sid)
+
+# Set to wake the auto-scan thread early, e.g. after scan settings change
+AUTO_SCAN_RESCHEDULE = threading.Event()
+AUTO_SCAN_STARTED = False
+# Leader lock files held open for the life of the process; the OS drops the locks when it exits
+LEADER_LOCK_FILES = []
+# Shared by every worker process on the host so only one of them fires scans / redeems refresh tokens
+AUTO_SCAN_LOCK_PATH = os.environ.get('AUTO_SCAN_LOCK_PATH', DATABASE_PATH + '.autoscan.lock')
+TOKEN_REFRESHER_LOCK_PATH = os.environ.get('TOKEN_REFRESHER_LOCK_PATH', DATABASE_PATH + '.tokenrefresh.lock')
+
+def reschedule_auto_scan():
+    """Make the auto-scan thread pick up new scan settings immediately"""
+    AUTO_SCAN_RESCHEDULE.set()
 
 def start_auto_scan():
     """Start automatic library scanning"""
     while True:
-        if get_media_manager().get_setting('auto_scan') == 'true':
-            # Use incremental scanning by default for auto-scan
-            get_media_manager().scan_media_library(incremental=True)
-        
-        interval = int(get_media_manager().get_setting('scan_interval', '3600'))
-        time.sleep(interval)
+        if get_media_manager().get_setting('auto_scan') == 'true' and not SCAN_IN_PROGRESS:
+            # Use incremental scanning by default for auto-scan; the scan runs on a job worker
+            job_service.submit('auto_scan', get_media_manager().scan_media_library, incremental=True)
+        
+        # Sleep until the next run, or until the schedule is changed
+        while True:
+            interval = int(get_media_manager().get_setting('scan_interval', '3600'))
+            if not AUTO_SCAN_RESCHEDULE.wait(interval):
+                break
+            AUTO_SCAN_RESCHEDULE.clear()
+
+def acquire_leader_lock(lock_path):
+    """Take a host-wide lock file without blocking; only the holder runs the guarded background work"""
+    if not FCNTL_AVAILABLE:
+        return True
+    try:
+        lock_file = open(lock_path, 'a')
+    except OSError:
+        return False
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    LEADER_LOCK_FILES.append(lock_file)
+    return True
+
+def start_auto_scan_scheduler():
+    """Start the auto-scan thread once, in a single process per host"""
+    global AUTO_SCAN_STARTED
+    with SERVICES_LOCK:
+        if AUTO_SCAN_STARTED:
+            return
+        AUTO_SCAN_STARTED = True
+    
+    if not acquire_leader_lock(AUTO_SCAN_LOCK_PATH):
+        logger.info("Auto-scan is scheduled by another worker process")
+        return
+    
+    socketio.start_background_task(start_auto_scan)
 
 def main():
     """Main application entry point"""
@@ -3139,6 +3907,7 @@ def main():
     parser.add_argument('--console', action='store_true', help='Start console interface')
     
     args = parser.parse_args()
+    init_services()
     
     if args.console:
         # Start console interface
@@ -3147,11 +3916,10 @@ def main():
         console.run()
     else:
         # Start web interface
-        logger.info(f"Starting Watch Media Server on {args.host}:{args.port}")
+        logger.info("Starting Watch Media Server on %s:%s", args.host, args.port)
         
-        # Start auto-scan thread
-        scan_thread = threading.Thread(target=start_auto_scan, daemon=True)
-        scan_thread.start()
+        # Start auto-scan scheduling
+        start_auto_scan_scheduler()
         
         # Start web server
         if args.debug:
@@ -0,0 +1,16 @@
+# Gunicorn settings for Watch Media Server (gunicorn -c gunicorn.conf.py wsgi:application)
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+# One worker by default: Socket.IO sessions live in-process unless SOCKETIO_MESSAGE_QUEUE and sticky sessions are set up
+workers = int(os.environ.get('GUNICORN_WORKERS', '1'))
+# Match the Socket.IO async mode app.py picks; threading mode serves requests on a thread pool
+worker_class = 'eventlet' if os.environ.get('SOCKETIO_ASYNC_MODE') == 'eventlet' else 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', '32'))
+
+
+def child_exit(server, worker):
+    """Release the exited worker's Prometheus multiprocess state"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
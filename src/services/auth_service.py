@@ -1,106 +1,187 @@
 # Authentication Service for Watch Media Server
 import os
+import time
+import logging
+import hmac
+import hashlib
 import jwt
 import bcrypt
 from datetime import datetime, timedelta
-from typing import Dict, Optional, List
+from typing import Dict, Iterable, List, Optional, Tuple
 import sqlite3
 import json
-from functools import wraps
+from functools import lru_cache, wraps
 from flask import request, jsonify, current_app
+from src.services.cache_service import TTLCache
+from src.services.database_service import get_connection_pool
+from src.utils.json_provider import loads as json_loads
+
+logger = logging.getLogger(__name__)
+
+# Verified JWT payloads keyed by a token digest; entries never outlive the token's own exp
+TOKEN_CACHE = TTLCache(ttl=int(os.getenv('JWT_CACHE_TTL', '5')), maxsize=int(os.getenv('JWT_CACHE_MAX', '10000')))
+JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'watch-media-server-secret-key')
+# Signing key bytes, algorithm list and codec are built once instead of per token
+JWT_KEY = JWT_SECRET_KEY.encode('utf-8')
+JWT_ALGORITHM = 'HS256'
+JWT_ALGORITHMS = [JWT_ALGORITHM]
+JWT_CODEC = jwt.PyJWT()
+
+# Successful bcrypt checks keyed by HMAC(secret, password|hash), so repeat logins skip the full bcrypt cost
+PASSWORD_CACHE = TTLCache(ttl=int(os.getenv('PASSWORD_CACHE_TTL', '60')), maxsize=4096)
+
+def decode_token(token: str, secret_key: bytes = JWT_KEY) -> Optional[Dict]:
+    """Verify a JWT and return its payload; needs only the signing key, never the database"""
+    key = hashlib.sha256(token.encode('utf-8')).digest()[:16]
+    now = time.time()
+    payload = TOKEN_CACHE.get(key)
+    if payload is not None and payload.get('exp', 0) > now:
+        return dict(payload)
+    
+    try:
+        payload = JWT_CODEC.decode(token, secret_key, algorithms=JWT_ALGORITHMS)
+        remaining = payload.get('exp', now) - now
+        if remaining > 0:
+            TOKEN_CACHE.set(key, payload, ttl=min(remaining, TOKEN_CACHE.ttl))
+        return dict(payload)
+    except jwt.ExpiredSignatureError:
+        return None
+    except jwt.InvalidTokenError:
+        return None
+
+@lru_cache(maxsize=4096)
+def parse_genres(genres: str) -> tuple:
+    """Decode a stored genres JSON string; results are shared between rows, hence tuples"""
+    try:
+        value = json_loads(genres)
+    except ValueError:
+        return ()
+    return tuple(value) if isinstance(value, list) else ()
+
+def media_rows(cursor) -> List[Dict]:
+    """Fetch a cursor's media rows as dicts with genres decoded"""
+    columns = [column[0] for column in cursor.description]
+    results = []
+    for row in cursor.fetchall():
+        result = dict(zip(columns, row))
+        if result.get('genres') and isinstance(result['genres'], str):
+            result['genres'] = parse_genres(result['genres'])
+        results.append(result)
+    return results
+
+# Hot-path statements, shared so every call hits the pooled connections' statement cache
+SELECT_LOGIN_USER_SQL = (
+    'SELECT id, username, email, password_hash, role, preferences, is_active '
+    'FROM users WHERE username = ? OR email = ?'
+)
+SELECT_USER_BY_ID_SQL = (
+    'SELECT id, username, email, role, preferences, created_at, last_login, is_active, avatar_url '
+    'FROM users WHERE id = ?'
+)
+# List-view columns only; 'rating' is the user's own watchlist rating, as it was with m.*
+SELECT_WATCHLIST_SQL = '''
+    SELECT m.id, m.title, m.year, m.media_type, m.poster_url, m.genres,
+           m.rating AS media_rating, wl.added_at, wl.watched, wl.rating, wl.notes
+    FROM user_watchlists wl
+    JOIN media_files m ON wl.media_id = m.id
+    WHERE wl.user_id = ?
+    ORDER BY wl.added_at DESC
+    LIMIT ? OFFSET ?
+'''
+
+INSERT_PLAY_SQL = (
+    'INSERT INTO user_play_history (user_id, media_id, duration_watched, completed) '
+    'VALUES (?, ?, ?, ?)'
+)
+
+AUTH_TABLES_DDL = '''
+    -- Users table
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        role TEXT DEFAULT 'user',
+        preferences TEXT DEFAULT '{}',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_login TIMESTAMP,
+        is_active BOOLEAN DEFAULT 1,
+        avatar_url TEXT
+    );
+
+    -- User sessions table
+    CREATE TABLE IF NOT EXISTS user_sessions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        session_token TEXT UNIQUE NOT NULL,
+        expires_at TIMESTAMP NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        ip_address TEXT,
+        user_agent TEXT,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    );
+
+    -- User watchlists table
+    CREATE TABLE IF NOT EXISTS user_watchlists (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        media_id INTEGER,
+        added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        watched BOOLEAN DEFAULT 0,
+        rating INTEGER,
+        notes TEXT,
+        FOREIGN KEY (user_id) REFERENCES users (id),
+        FOREIGN KEY (media_id) REFERENCES media_files (id),
+        UNIQUE(user_id, media_id)
+    );
+
+    -- User play history table
+    CREATE TABLE IF NOT EXISTS user_play_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        media_id INTEGER,
+        played_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        duration_watched INTEGER DEFAULT 0,
+        completed BOOLEAN DEFAULT 0,
+        FOREIGN KEY (user_id) REFERENCES users (id),
+        FOREIGN KEY (media_id) REFERENCES media_files (id)
+    );
+
+    -- Per-user lookups ordered by recency: watchlist, history, continue watching
+    CREATE INDEX IF NOT EXISTS idx_ph_user_played ON user_play_history(user_id, played_at DESC);
+    CREATE INDEX IF NOT EXISTS idx_ph_user_completed ON user_play_history(user_id, completed, played_at DESC);
+    CREATE INDEX IF NOT EXISTS idx_wl_user_added ON user_watchlists(user_id, added_at DESC);
+
+    -- A completed play marks the title watched in the same statement that records it
+    CREATE TRIGGER IF NOT EXISTS play_history_mark_watched AFTER INSERT ON user_play_history
+    WHEN NEW.completed
+    BEGIN
+        UPDATE user_watchlists SET watched = 1 WHERE user_id = NEW.user_id AND media_id = NEW.media_id;
+    END;
+'''
 
 class AuthService:
     def __init__(self, db_path: str = 'watch.db'):
         self.db_path = db_path
-        self.secret_key = os.getenv('JWT_SECRET_KEY', 'watch-media-server-secret-key')
+        self.pool = get_connection_pool(db_path)
+        self.secret_key = JWT_SECRET_KEY
+        self.jwt_key = JWT_KEY
         self.jwt_expiration = int(os.getenv('JWT_EXPIRATION_HOURS', '24')) * 3600
+        self.bcrypt_rounds = int(os.getenv('BCRYPT_ROUNDS', '12'))
+        # Never matches a real password; checked against when the account doesn't exist
+        self.dummy_hash = bcrypt.hashpw(os.urandom(16).hex().encode('utf-8'), bcrypt.gensalt(self.bcrypt_rounds)).decode('utf-8')
+        self.user_cache = TTLCache(ttl=int(os.getenv('USER_CACHE_TTL', '300')))
         self.init_auth_tables()
     
     def init_auth_tables(self):
         """Initialize authentication-related database tables"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Users table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                role TEXT DEFAULT 'user',
-                preferences TEXT DEFAULT '{}',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                last_login TIMESTAMP,
-                is_active BOOLEAN DEFAULT 1,
-                avatar_url TEXT
-            )
-        ''')
-        
-        # User sessions table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_sessions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                session_token TEXT UNIQUE NOT NULL,
-                expires_at TIMESTAMP NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                ip_address TEXT,
-                user_agent TEXT,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-        
-        # User watchlists table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_watchlists (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                media_id INTEGER,
-                added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                watched BOOLEAN DEFAULT 0,
-                rating INTEGER,
-                notes TEXT,
-                FOREIGN KEY (user_id) REFERENCES users (id),
-                FOREIGN KEY (media_id) REFERENCES media_files (id),
-                UNIQUE(user_id, media_id)
-            )
-        ''')
-        
-        # User play history table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_play_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                media_id INTEGER,
-                played_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                duration_watched INTEGER DEFAULT 0,
-                completed BOOLEAN DEFAULT 0,
-                FOREIGN KEY (user_id) REFERENCES users (id),
-                FOREIGN KEY (media_id) REFERENCES media_files (id)
-            )
-        ''')
-        
-        # User recommendations table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_recommendations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                media_id INTEGER,
-                score REAL,
-                reason TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id),
-                FOREIGN KEY (media_id) REFERENCES media_files (id)
-            )
-        ''')
+        conn = self.pool.connect()
+        conn.executescript(AUTH_TABLES_DDL)
         
         # Create default admin user if no users exist
-        cursor.execute('SELECT COUNT(*) FROM users')
-        if cursor.fetchone()[0] == 0:
+        if not conn.execute('SELECT EXISTS (SELECT 1 FROM users)').fetchone()[0]:
             self.create_default_admin()
         
-        conn.commit()
         conn.close()
     
     def create_default_admin(self):
@@ -114,21 +195,39 @@ class AuthService:
             password=admin_password,
             role='admin'
         )
-        print(f"Created default admin user: admin / {admin_password}")
+        # Never log the credential itself, only where it came from
+        password_source = 'ADMIN_PASSWORD' if os.getenv('ADMIN_PASSWORD') else 'the built-in default (change it)'
+        logger.info(f"Created default admin user 'admin'; password taken from {password_source}")
     
     def hash_password(self, password: str) -> str:
         """Hash a password using bcrypt"""
-        salt = bcrypt.gensalt()
+        salt = bcrypt.gensalt(self.bcrypt_rounds)
         return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
     
+    def needs_rehash(self, hashed: str) -> bool:
+        """True when a stored hash ($2b$NN$...) uses fewer rounds than BCRYPT_ROUNDS"""
+        try:
+            return int(hashed.split('$')[2]) < self.bcrypt_rounds
+        except (IndexError, ValueError):
+            return False
+    
     def verify_password(self, password: str, hashed: str) -> bool:
         """Verify a password against its hash"""
-        return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+        key = hmac.new(self.secret_key.encode('utf-8'),
+                       password.encode('utf-8') + b'|' + hashed.encode('utf-8'), 'sha256').digest()
+        if PASSWORD_CACHE.get(key):
+            return True
+        
+        # Only successes are cached, so failed attempts always pay the full bcrypt cost
+        if bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8')):
+            PASSWORD_CACHE.set(key, True)
+            return True
+        return False
     
     def create_user(self, username: str, email: str, password: str, role: str = 'user') -> Optional[Dict]:
         """Create a new user"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.connect()
             cursor = conn.cursor()
             
             # Check if user already exists
@@ -150,41 +249,42 @@ class AuthService:
             
             return self.get_user_by_id(user_id)
         except Exception as e:
-            print(f"Error creating user: {e}")
+            logger.exception("Error creating user: %s", e)
             return None
     
     def authenticate_user(self, username: str, password: str) -> Optional[Dict]:
         """Authenticate a user and return user data"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.connect()
             cursor = conn.cursor()
             
-            cursor.execute('''
-                SELECT id, username, email, password_hash, role, preferences, is_active
-                FROM users WHERE username = ? OR email = ?
-            ''', (username, username))
+            cursor.execute(SELECT_LOGIN_USER_SQL, (username, username))
             
             result = cursor.fetchone()
-            if not result:
-                conn.close()
-                return None
-            
-            user_id, db_username, email, password_hash, role, preferences, is_active = result
-            
-            if not is_active:
-                conn.close()
-                return None
+            if result:
+                user_id, db_username, email, password_hash, role, preferences, is_active = result
+            else:
+                # Unknown accounts pay for a bcrypt check too, so timing doesn't reveal which names exist
+                password_hash, is_active = self.dummy_hash, False
             
-            if not self.verify_password(password, password_hash):
+            # Decide only after the bcrypt check has run for every outcome
+            password_ok = self.verify_password(password, password_hash)
+            if not (result and is_active and password_ok):
                 conn.close()
                 return None
             
-            # Update last login
-            cursor.execute('''
-                UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?
-            ''', (user_id,))
+            # Update last login, upgrading the hash if BCRYPT_ROUNDS has been raised since it was made
+            if self.needs_rehash(password_hash):
+                cursor.execute('''
+                    UPDATE users SET last_login = CURRENT_TIMESTAMP, password_hash = ? WHERE id = ?
+                ''', (self.hash_password(password), user_id))
+            else:
+                cursor.execute('''
+                    UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?
+                ''', (user_id,))
             conn.commit()
             conn.close()
+            self.invalidate_user(user_id)
             
             return {
                 'id': user_id,
@@ -195,40 +295,36 @@ class AuthService:
                 'is_active': bool(is_active)
             }
         except Exception as e:
-            print(f"Error authenticating user: {e}")
+            logger.exception("Error authenticating user: %s", e)
             return None
     
     def generate_token(self, user_id: int, username: str, role: str) -> str:
         """Generate JWT token for user"""
+        now = int(time.time())
         payload = {
             'user_id': user_id,
             'username': username,
             'role': role,
-            'exp': datetime.utcnow() + timedelta(seconds=self.jwt_expiration),
-            'iat': datetime.utcnow()
+            'exp': now + self.jwt_expiration,
+            'iat': now
         }
-        return jwt.encode(payload, self.secret_key, algorithm='HS256')
+        return JWT_CODEC.encode(payload, self.jwt_key, algorithm=JWT_ALGORITHM)
     
     def verify_token(self, token: str) -> Optional[Dict]:
         """Verify JWT token and return payload"""
-        try:
-            payload = jwt.decode(token, self.secret_key, algorithms=['HS256'])
-            return payload
-        except jwt.ExpiredSignatureError:
-            return None
-        except jwt.InvalidTokenError:
-            return None
+        return decode_token(token, self.jwt_key)
     
     def get_user_by_id(self, user_id: int) -> Optional[Dict]:
         """Get user by ID"""
+        user = self.user_cache.get(user_id)
+        if user is not None:
+            return dict(user)
+        
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.connect()
             cursor = conn.cursor()
             
-            cursor.execute('''
-                SELECT id, username, email, role, preferences, created_at, last_login, is_active, avatar_url
-                FROM users WHERE id = ?
-            ''', (user_id,))
+            cursor.execute(SELECT_USER_BY_ID_SQL, (user_id,))
             
             result = cursor.fetchone()
             if not result:
@@ -239,7 +335,7 @@ class AuthService:
             
             conn.close()
             
-            return {
+            user = {
                 'id': user_id,
                 'username': username,
                 'email': email,
@@ -250,14 +346,20 @@ class AuthService:
                 'is_active': bool(is_active),
                 'avatar_url': avatar_url
             }
+            self.user_cache.set(user_id, user)
+            return dict(user)
         except Exception as e:
-            print(f"Error getting user: {e}")
+            logger.exception("Error getting user: %s", e)
             return None
     
+    def invalidate_user(self, user_id: int):
+        """Forget a cached user row after it changes"""
+        self.user_cache.delete(user_id)
+    
     def update_user_preferences(self, user_id: int, preferences: Dict) -> bool:
         """Update user preferences"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.connect()
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -266,15 +368,16 @@ class AuthService:
             
             conn.commit()
             conn.close()
+            self.invalidate_user(user_id)
             return True
         except Exception as e:
-            print(f"Error updating preferences: {e}")
+            logger.exception("Error updating preferences: %s", e)
             return False
     
     def add_to_watchlist(self, user_id: int, media_id: int) -> bool:
         """Add media to user's watchlist"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.connect()
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -286,13 +389,13 @@ class AuthService:
             conn.close()
             return True
         except Exception as e:
-            print(f"Error adding to watchlist: {e}")
+            logger.exception("Error adding to watchlist: %s", e)
             return False
     
     def remove_from_watchlist(self, user_id: int, media_id: int) -> bool:
         """Remove media from user's watchlist"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.connect()
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -303,70 +406,59 @@ class AuthService:
             conn.close()
             return True
         except Exception as e:
-            print(f"Error removing from watchlist: {e}")
+            logger.exception("Error removing from watchlist: %s", e)
             return False
     
-    def get_user_watchlist(self, user_id: int) -> List[Dict]:
-        """Get user's watchlist"""
+    def get_user_watchlist(self, user_id: int, limit: int = -1, offset: int = 0) -> List[Dict]:
+        """Get a page of the user's watchlist (limit -1 returns every entry)"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
+            conn = self.pool.connect()
             cursor = conn.cursor()
             
-            cursor.execute('''
-                SELECT m.*, wl.added_at, wl.watched, wl.rating, wl.notes
-                FROM user_watchlists wl
-                JOIN media_files m ON wl.media_id = m.id
-                WHERE wl.user_id = ?
-                ORDER BY wl.added_at DESC
-            ''', (user_id,))
+            cursor.execute(SELECT_WATCHLIST_SQL, (user_id, limit, offset))
             
-            results = []
-            for row in cursor.fetchall():
-                result = dict(row)
-                # Parse JSON fields
-                if result.get('genres'):
-                    try:
-                        result['genres'] = json.loads(result['genres']) if isinstance(result['genres'], str) else result['genres']
-                    except:
-                        result['genres'] = []
-                results.append(result)
+            results = media_rows(cursor)
             
             conn.close()
             return results
         except Exception as e:
-            print(f"Error getting watchlist: {e}")
+            logger.exception("Error getting watchlist: %s", e)
             return []
     
     def record_play(self, user_id: int, media_id: int, duration_watched: int = 0, completed: bool = False):
         """Record a play event"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            conn = self.pool.connect()
             
-            cursor.execute('''
-                INSERT INTO user_play_history (user_id, media_id, duration_watched, completed)
-                VALUES (?, ?, ?, ?)
-            ''', (user_id, media_id, duration_watched, completed))
+            # One statement and one commit; the play_history_mark_watched trigger updates the watchlist
+            with conn:
+                conn.execute(INSERT_PLAY_SQL, (user_id, media_id, duration_watched, completed))
             
-            # Update watchlist if completed
-            if completed:
-                cursor.execute('''
-                    UPDATE user_watchlists SET watched = 1 WHERE user_id = ? AND media_id = ?
-                ''', (user_id, media_id))
+            conn.close()
+            return True
+        except Exception as e:
+            logger.exception("Error recording play: %s", e)
+            return False
+    
+    def record_plays(self, events: Iterable[Tuple[int, int, int, bool]]) -> bool:
+        """Record a batch of (user_id, media_id, duration_watched, completed) play events in one transaction"""
+        try:
+            conn = self.pool.connect()
+            
+            # Completed rows mark the watchlist through the play_history_mark_watched trigger
+            with conn:
+                conn.executemany(INSERT_PLAY_SQL, events)
             
-            conn.commit()
             conn.close()
             return True
         except Exception as e:
-            print(f"Error recording play: {e}")
+            logger.exception("Error recording plays: %s", e)
             return False
     
     def get_user_play_history(self, user_id: int, limit: int = 50) -> List[Dict]:
         """Get user's play history"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
+            conn = self.pool.connect()
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -378,27 +470,18 @@ class AuthService:
                 LIMIT ?
             ''', (user_id, limit))
             
-            results = []
-            for row in cursor.fetchall():
-                result = dict(row)
-                if result.get('genres'):
-                    try:
-                        result['genres'] = json.loads(result['genres']) if isinstance(result['genres'], str) else result['genres']
-                    except:
-                        result['genres'] = []
-                results.append(result)
+            results = media_rows(cursor)
             
             conn.close()
             return results
         except Exception as e:
-            print(f"Error getting play history: {e}")
+            logger.exception("Error getting play history: %s", e)
             return []
     
     def get_continue_watching(self, user_id: int, limit: int = 20) -> List[Dict]:
         """Get user's continue watching list"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
+            conn = self.pool.connect()
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -410,47 +493,33 @@ class AuthService:
                 LIMIT ?
             ''', (user_id, limit))
             
-            results = []
-            for row in cursor.fetchall():
-                result = dict(row)
-                if result.get('genres'):
-                    try:
-                        result['genres'] = json.loads(result['genres']) if isinstance(result['genres'], str) else result['genres']
-                    except:
-                        result['genres'] = []
-                results.append(result)
+            results = media_rows(cursor)
             
             conn.close()
             return results
         except Exception as e:
-            print(f"Error getting continue watching: {e}")
+            logger.exception("Error getting continue watching: %s", e)
             return []
     
     def generate_recommendations(self, user_id: int, limit: int = 20) -> List[Dict]:
         """Generate recommendations for user based on watch history"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
+            conn = self.pool.connect()
             cursor = conn.cursor()
             
-            # Get user's watched genres
+            # Top 5 genres across the user's completed plays, weighted by how often they were watched
             cursor.execute('''
-                SELECT DISTINCT m.genres
+                SELECT mg.genre, COUNT(*) AS weight
                 FROM user_play_history ph
-                JOIN media_files m ON ph.media_id = m.id
+                JOIN media_genres mg ON mg.media_id = ph.media_id
                 WHERE ph.user_id = ? AND ph.completed = 1
+                GROUP BY mg.genre
+                ORDER BY weight DESC
+                LIMIT 5
             ''', (user_id,))
+            genre_weights = cursor.fetchall()
             
-            watched_genres = set()
-            for row in cursor.fetchall():
-                if row['genres']:
-                    try:
-                        genres = json.loads(row['genres']) if isinstance(row['genres'], str) else row['genres']
-                        watched_genres.update(genres)
-                    except:
-                        pass
-            
-            if not watched_genres:
+            if not genre_weights:
                 # If no history, return popular media
                 cursor.execute('''
                     SELECT m.*, COUNT(ph.id) as play_count
@@ -464,53 +533,47 @@ class AuthService:
                     LIMIT ?
                 ''', (user_id, limit))
             else:
-                # Find similar content
-                genre_conditions = []
-                params = [user_id]
-                for genre in list(watched_genres)[:5]:  # Limit to top 5 genres
-                    genre_conditions.append("m.genres LIKE ?")
-                    params.append(f"%{genre}%")
-                
-                params.append(limit)
-                
+                # Score each candidate by the summed weight of the genres it shares with the user
                 cursor.execute(f'''
+                    WITH user_genres(genre, weight) AS (
+                        VALUES {','.join(['(?, ?)'] * len(genre_weights))}
+                    ), scores AS (
+                        SELECT mg.media_id, SUM(ug.weight) AS score
+                        FROM media_genres mg
+                        JOIN user_genres ug ON ug.genre = mg.genre
+                        GROUP BY mg.media_id
+                    )
                     SELECT m.*, COUNT(ph.id) as play_count
-                    FROM media_files m
+                    FROM scores s
+                    JOIN media_files m ON m.id = s.media_id
                     LEFT JOIN user_play_history ph ON m.id = ph.media_id
                     WHERE m.id NOT IN (
                         SELECT media_id FROM user_play_history WHERE user_id = ?
-                    ) AND ({' OR '.join(genre_conditions)})
+                    )
                     GROUP BY m.id
-                    ORDER BY play_count DESC, m.rating DESC
+                    ORDER BY s.score DESC, play_count DESC, m.rating DESC
                     LIMIT ?
-                ''', params)
-            
-            results = []
-            for row in cursor.fetchall():
-                result = dict(row)
-                if result.get('genres'):
-                    try:
-                        result['genres'] = json.loads(result['genres']) if isinstance(result['genres'], str) else result['genres']
-                    except:
-                        result['genres'] = []
-                results.append(result)
+                ''', (*(value for pair in genre_weights for value in pair), user_id, limit))
+            
+            results = media_rows(cursor)
             
             conn.close()
             return results
         except Exception as e:
-            print(f"Error generating recommendations: {e}")
+            logger.exception("Error generating recommendations: %s", e)
             return []
     
-    def get_all_users(self, admin_user_id: int) -> List[Dict]:
-        """Get all users (admin only)"""
+    def get_all_users(self, admin_user_id: int, role: str = None) -> List[Dict]:
+        """Get all users (admin only); pass the verified token's role to skip the user lookup"""
         try:
             # Verify admin
-            admin_user = self.get_user_by_id(admin_user_id)
-            if not admin_user or admin_user['role'] != 'admin':
+            if role is None:
+                admin_user = self.get_user_by_id(admin_user_id)
+                role = admin_user['role'] if admin_user else None
+            if role != 'admin':
                 return []
             
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
+            conn = self.pool.connect()
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -519,22 +582,35 @@ class AuthService:
                 ORDER BY created_at DESC
             ''')
             
-            results = []
-            for row in cursor.fetchall():
-                results.append(dict(row))
+            results = [
+                {
+                    'id': user_id,
+                    'username': username,
+                    'email': email,
+                    'role': user_role,
+                    'created_at': created_at,
+                    'last_login': last_login,
+                    'is_active': is_active
+                }
+                for user_id, username, email, user_role, created_at, last_login, is_active in cursor.fetchall()
+            ]
             
             conn.close()
             return results
         except Exception as e:
-            print(f"Error getting users: {e}")
+            logger.exception("Error getting users: %s", e)
             return []
 
 # Decorator for protected routes
 def require_auth(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
+        # An outer require_auth layer already verified this request's token
+        if getattr(request, 'current_user', None) is not None:
+            return f(*args, **kwargs)
+
         token = None
-        
+
         # Check for token in Authorization header
         auth_header = request.headers.get('Authorization')
         if auth_header:
@@ -551,8 +627,7 @@ def require_auth(f):
             return jsonify({'error': 'Token is missing'}), 401
         
         try:
-            auth_service = AuthService()
-            payload = auth_service.verify_token(token)
+            payload = decode_token(token)
             if not payload:
                 return jsonify({'error': 'Token is invalid or expired'}), 401
             
@@ -1,30 +1,112 @@
 # Automation Service for Watch Media Server
 import os
+import re
+import errno
+import gzip
 import json
 import sqlite3
 import schedule
 import threading
+import queue
+import atexit
 import time
-from typing import Dict, List, Optional, Any, Callable
+from typing import Dict, List, Optional, Any, Callable, Tuple
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import logging
 import subprocess
 import shutil
 from pathlib import Path
+from src.services.database_service import get_connection_pool
+from src.services.tmdb_service import TMDBService
 
 logger = logging.getLogger(__name__)
 
+# Backups are compressed in-process; level 1 favours speed over a few percent of size
+BACKUP_GZIP_LEVEL = int(os.getenv('BACKUP_GZIP_LEVEL', '1'))
+BACKUP_COPY_CHUNK_SIZE = 1024 * 1024
+BACKUP_PAGES_PER_STEP = 1024
+
+# Concurrent TMDB searches per metadata update run
+METADATA_LOOKUP_WORKERS = int(os.getenv('METADATA_LOOKUP_WORKERS', '8'))
+
+# Task results committed per writer transaction
+TASK_RESULT_BATCH_SIZE = 128
+
+UPDATE_TASK_STATS_SQL = '''
+    UPDATE automation_tasks 
+    SET run_count = run_count + 1, 
+        success_count = success_count + ?,
+        error_count = error_count + ?,
+        last_run = CURRENT_TIMESTAMP
+    WHERE id = ?
+'''
+
+UPDATE_MEDIA_METADATA_SQL = '''
+    UPDATE media_files 
+    SET tmdb_id = ?, poster_url = ?, backdrop_url = ?, 
+        overview = ?, genres = ?, rating = ?, runtime = ?, 
+        release_date = ?, imdb_id = ?
+    WHERE id = ?
+'''
+
+INSERT_TASK_LOG_SQL = '''
+    INSERT INTO automation_logs 
+    (task_id, task_name, execution_time, status, duration_ms, output, error_message)
+    VALUES (?, ?, CURRENT_TIMESTAMP, ?, ?, ?, ?)
+'''
+
+WEEKDAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+
+SCHEDULE_PATTERN = re.compile(
+    r'daily at\s*(?P<hour>\d{1,2}):(?P<minute>\d{2})'
+    r'|weekly on\s*(?P<day>[a-z]+)'
+    r'|every\s*(?P<count>\d+)\s*(?P<unit>minutes|hours)',
+    re.IGNORECASE
+)
+
+@lru_cache(maxsize=256)
+def parse_schedule(schedule_expression: str) -> Optional[Tuple]:
+    """Parse a schedule expression into ('daily', hour, minute), ('weekly', day) or ('every', count, unit)"""
+    match = SCHEDULE_PATTERN.search(schedule_expression)
+    if not match:
+        return None
+    if match.group('hour'):
+        return ('daily', int(match.group('hour')), int(match.group('minute')))
+    if match.group('day'):
+        day = match.group('day').lower()
+        return ('weekly', day) if day in WEEKDAYS else None
+    return ('every', int(match.group('count')), match.group('unit').lower())
+
+def iter_files(directory: str):
+    """Recursively yield os.DirEntry objects for the files under directory"""
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from iter_files(entry.path)
+            elif entry.is_file():
+                yield entry
+
 class AutomationService:
-    def __init__(self, db_path: str = 'watch.db'):
+    def __init__(self, db_path: str = 'watch.db', tmdb_service: TMDBService = None):
         self.db_path = db_path
+        self.tmdb_service = tmdb_service
+        self.pool = get_connection_pool(db_path)
         self.init_automation_tables()
         self.automation_tasks = {}
         self.scheduler_running = False
+        self._wake = threading.Event()
+        self._log_queue = queue.Queue()
+        self._result_writer = threading.Thread(target=self._task_result_writer, daemon=True)
+        self._result_writer.start()
+        # Daemon threads are killed at exit; drain queued results first
+        atexit.register(self.flush_task_results)
         self.start_scheduler()
     
     def init_automation_tables(self):
         """Initialize automation database tables"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.pool.connect()
         cursor = conn.cursor()
         
         # Automation tasks table
@@ -92,6 +174,12 @@ class AutomationService:
             )
         ''')
         
+        # Index task log lookups (newest first per task)
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_automation_logs_task_time ON automation_logs(task_id, execution_time DESC)')
+        
+        # Partial index covering only the scheduler's active tasks, ordered by next run
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_automation_tasks_active_next ON automation_tasks(is_active, next_run) WHERE is_active = 1')
+        
         conn.commit()
         conn.close()
     
@@ -104,12 +192,16 @@ class AutomationService:
         
         def run_scheduler():
             while self.scheduler_running:
+                # Clear before running jobs so a registration that lands meanwhile still cuts the next wait short
+                self._wake.clear()
                 try:
                     schedule.run_pending()
-                    time.sleep(60)  # Check every minute
+                    # Sleep until the next job is due (at most a minute)
+                    delay = schedule.idle_seconds()
+                    self._wake.wait(timeout=60 if delay is None else min(max(delay, 0), 60))
                 except Exception as e:
                     logger.error(f"Scheduler error: {e}")
-                    time.sleep(60)
+                    self._wake.wait(timeout=60)
         
         scheduler_thread = threading.Thread(target=run_scheduler, daemon=True)
         scheduler_thread.start()
@@ -119,27 +211,24 @@ class AutomationService:
         """Stop the automation scheduler"""
         self.scheduler_running = False
         schedule.clear()
+        self._wake.set()
+        self.flush_task_results()
         logger.info("Automation scheduler stopped")
     
     def create_automation_task(self, task_name: str, task_type: str, schedule_expression: str, 
                               task_config: Dict) -> int:
         """Create a new automation task"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
             # Calculate next run time
             next_run = self._calculate_next_run(schedule_expression)
             
-            cursor.execute('''
-                INSERT INTO automation_tasks 
-                (task_name, task_type, schedule_expression, task_config, next_run)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (task_name, task_type, schedule_expression, json.dumps(task_config), next_run))
-            
-            task_id = cursor.lastrowid
-            conn.commit()
-            conn.close()
+            with self.pool.transaction() as conn:
+                cursor = conn.execute('''
+                    INSERT INTO automation_tasks 
+                    (task_name, task_type, schedule_expression, task_config, next_run)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (task_name, task_type, schedule_expression, json.dumps(task_config), next_run))
+                task_id = cursor.lastrowid
             
             # Register task with scheduler
             self._register_scheduled_task(task_id, task_name, task_type, schedule_expression, task_config)
@@ -152,30 +241,24 @@ class AutomationService:
     def _calculate_next_run(self, schedule_expression: str) -> str:
         """Calculate next run time for schedule expression"""
         try:
-            # Parse schedule expression (e.g., "daily at 02:00", "weekly on monday", "every 30 minutes")
-            if "daily at" in schedule_expression:
-                time_str = schedule_expression.split("daily at")[1].strip()
-                hour, minute = map(int, time_str.split(":"))
-                next_run = datetime.now().replace(hour=hour, minute=minute, second=0, microsecond=0)
-                if next_run <= datetime.now():
+            # Schedule expressions look like "daily at 02:00", "weekly on monday", "every 30 minutes"
+            parsed = parse_schedule(schedule_expression)
+            now = datetime.now()
+            if parsed and parsed[0] == 'daily':
+                next_run = now.replace(hour=parsed[1], minute=parsed[2], second=0, microsecond=0)
+                if next_run <= now:
                     next_run += timedelta(days=1)
-            elif "weekly on" in schedule_expression:
-                day = schedule_expression.split("weekly on")[1].strip().lower()
-                days = {'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3, 
-                       'friday': 4, 'saturday': 5, 'sunday': 6}
-                if day in days:
-                    days_ahead = days[day] - datetime.now().weekday()
-                    if days_ahead <= 0:
-                        days_ahead += 7
-                    next_run = datetime.now() + timedelta(days=days_ahead)
-                    next_run = next_run.replace(hour=2, minute=0, second=0, microsecond=0)
-            elif "every" in schedule_expression and "minutes" in schedule_expression:
-                minutes = int(schedule_expression.split("every")[1].split("minutes")[0].strip())
-                next_run = datetime.now() + timedelta(minutes=minutes)
+            elif parsed and parsed[0] == 'weekly':
+                days_ahead = WEEKDAYS.index(parsed[1]) - now.weekday()
+                if days_ahead <= 0:
+                    days_ahead += 7
+                next_run = (now + timedelta(days=days_ahead)).replace(hour=2, minute=0, second=0, microsecond=0)
+            elif parsed:
+                next_run = now + timedelta(**{parsed[2]: parsed[1]})
             else:
                 # Default to daily at 2 AM
-                next_run = datetime.now().replace(hour=2, minute=0, second=0, microsecond=0)
-                if next_run <= datetime.now():
+                next_run = now.replace(hour=2, minute=0, second=0, microsecond=0)
+                if next_run <= now:
                     next_run += timedelta(days=1)
             
             return next_run.isoformat()
@@ -192,31 +275,13 @@ class AutomationService:
                 self._execute_automation_task(task_id, task_name, task_type, task_config)
             
             # Parse schedule and register
-            if "daily at" in schedule_expression:
-                time_str = schedule_expression.split("daily at")[1].strip()
-                schedule.every().day.at(time_str).do(task_wrapper)
-            elif "weekly on" in schedule_expression:
-                day = schedule_expression.split("weekly on")[1].strip().lower()
-                if day == 'monday':
-                    schedule.every().monday.do(task_wrapper)
-                elif day == 'tuesday':
-                    schedule.every().tuesday.do(task_wrapper)
-                elif day == 'wednesday':
-                    schedule.every().wednesday.do(task_wrapper)
-                elif day == 'thursday':
-                    schedule.every().thursday.do(task_wrapper)
-                elif day == 'friday':
-                    schedule.every().friday.do(task_wrapper)
-                elif day == 'saturday':
-                    schedule.every().saturday.do(task_wrapper)
-                elif day == 'sunday':
-                    schedule.every().sunday.do(task_wrapper)
-            elif "every" in schedule_expression and "minutes" in schedule_expression:
-                minutes = int(schedule_expression.split("every")[1].split("minutes")[0].strip())
-                schedule.every(minutes).minutes.do(task_wrapper)
-            elif "every" in schedule_expression and "hours" in schedule_expression:
-                hours = int(schedule_expression.split("every")[1].split("hours")[0].strip())
-                schedule.every(hours).hours.do(task_wrapper)
+            parsed = parse_schedule(schedule_expression)
+            if parsed and parsed[0] == 'daily':
+                schedule.every().day.at(f"{parsed[1]:02d}:{parsed[2]:02d}").do(task_wrapper)
+            elif parsed and parsed[0] == 'weekly':
+                getattr(schedule.every(), parsed[1]).do(task_wrapper)
+            elif parsed:
+                getattr(schedule.every(parsed[1]), parsed[2]).do(task_wrapper)
             
             self.automation_tasks[task_id] = {
                 'name': task_name,
@@ -225,6 +290,8 @@ class AutomationService:
                 'function': task_wrapper
             }
             
+            # Let the scheduler re-plan its sleep around the new job
+            self._wake.set()
             logger.info(f"Registered automation task: {task_name}")
         except Exception as e:
             logger.error(f"Error registering scheduled task: {e}")
@@ -256,20 +323,14 @@ class AutomationService:
             else:
                 raise ValueError(f"Unknown task type: {task_type}")
             
-            # Update task statistics
-            self._update_task_stats(task_id, True)
-            
         except Exception as e:
             status = 'error'
             error_message = str(e)
             logger.error(f"Error executing automation task {task_name}: {e}")
-            
-            # Update task statistics
-            self._update_task_stats(task_id, False)
         
-        # Log execution
+        # Stats update and execution log are written by the result writer thread
         duration_ms = int((time.time() - start_time) * 1000)
-        self._log_task_execution(task_id, task_name, status, duration_ms, output, error_message)
+        self._log_queue.put((task_id, status == 'success', task_name, status, duration_ms, output, error_message))
     
     def _execute_library_scan(self, config: Dict) -> str:
         """Execute library scan automation"""
@@ -315,22 +376,32 @@ class AutomationService:
                 raise ValueError(f"Source path does not exist: {source_pattern}")
             
             organized_count = 0
-            
-            for file_path in source_path.rglob('*'):
-                if file_path.is_file():
-                    # Check file type
-                    if file_types and file_path.suffix.lower() not in file_types:
-                        continue
-                    
-                    # Generate destination path
-                    dest_path = self._generate_destination_path(file_path, destination_pattern)
-                    
-                    # Create destination directory
+            wanted_types = {file_type.lower() for file_type in file_types}
+            created_dirs = set()
+            
+            # Snapshot the tree first so files moved under the source are not visited again
+            matching_files = [
+                entry.path for entry in iter_files(source_pattern)
+                if not wanted_types or os.path.splitext(entry.name)[1].lower() in wanted_types
+            ]
+            
+            for file_path in matching_files:
+                # Generate destination path
+                dest_path = self._generate_destination_path(Path(file_path), destination_pattern)
+                
+                # Create destination directory
+                if dest_path.parent not in created_dirs:
                     dest_path.parent.mkdir(parents=True, exist_ok=True)
-                    
-                    # Move file
-                    shutil.move(str(file_path), str(dest_path))
-                    organized_count += 1
+                    created_dirs.add(dest_path.parent)
+                
+                # Move file: a single rename on the same filesystem, copy + delete across devices
+                try:
+                    os.replace(file_path, dest_path)
+                except OSError as e:
+                    if e.errno != errno.EXDEV:
+                        raise
+                    shutil.move(file_path, str(dest_path))
+                organized_count += 1
             
             return f"File organization completed. Organized {organized_count} files."
         except Exception as e:
@@ -359,8 +430,6 @@ class AutomationService:
     def _execute_backup(self, config: Dict) -> str:
         """Execute backup automation"""
         try:
-            from database_service import database_service
-            
             backup_path = config.get('backup_path', './backups')
             compression = config.get('compression', True)
             
@@ -373,13 +442,22 @@ class AutomationService:
             backup_filename = f"watch_backup_{timestamp}.db"
             backup_file_path = backup_dir / backup_filename
             
-            # Create database backup
-            backup_path = database_service.backup_database(str(backup_file_path))
+            # Online backup from a pooled connection, copied in page batches so writers can interleave
+            backup_path = str(backup_file_path)
+            source_conn = self.pool.connect()
+            backup_conn = sqlite3.connect(backup_path)
+            try:
+                source_conn.backup(backup_conn, pages=BACKUP_PAGES_PER_STEP)
+            finally:
+                backup_conn.close()
+                source_conn.close()
             
             # Compress if requested
             if compression:
                 compressed_path = f"{backup_path}.gz"
-                subprocess.run(['gzip', backup_path], check=True)
+                with open(backup_path, 'rb') as src, gzip.open(compressed_path, 'wb', compresslevel=BACKUP_GZIP_LEVEL) as dst:
+                    shutil.copyfileobj(src, dst, BACKUP_COPY_CHUNK_SIZE)
+                os.unlink(backup_path)
                 backup_path = compressed_path
             
             return f"Backup completed: {backup_path}"
@@ -401,10 +479,11 @@ class AutomationService:
     def _execute_metadata_update(self, config: Dict) -> str:
         """Execute metadata update automation"""
         try:
-            from tmdb_service import tmdb_service
+            if self.tmdb_service is None:
+                self.tmdb_service = TMDBService()
             
             # Get media files without metadata
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.connect()
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT id, title, year FROM media_files 
@@ -415,44 +494,52 @@ class AutomationService:
             media_files = cursor.fetchall()
             conn.close()
             
-            updated_count = 0
+            updates = []
+            
+            # Run the TMDB searches concurrently; each one is network-latency bound
+            with ThreadPoolExecutor(max_workers=METADATA_LOOKUP_WORKERS) as executor:
+                lookups = {
+                    executor.submit(self._lookup_movie_metadata, title, year): media_id
+                    for media_id, title, year in media_files
+                }
             
-            for media_id, title, year in media_files:
+            for future, media_id in lookups.items():
                 try:
-                    # Search for metadata
-                    metadata = tmdb_service.search_media(title, 'movie', year)
+                    metadata = future.result()
                     if metadata:
-                        # Update database
-                        conn = sqlite3.connect(self.db_path)
-                        cursor = conn.cursor()
-                        cursor.execute('''
-                            UPDATE media_files 
-                            SET tmdb_id = ?, poster_url = ?, backdrop_url = ?, 
-                                overview = ?, genres = ?, rating = ?, runtime = ?, 
-                                release_date = ?, imdb_id = ?
-                            WHERE id = ?
-                        ''', (
-                            metadata.get('tmdb_id'),
-                            metadata.get('poster_url'),
-                            metadata.get('backdrop_url'),
-                            metadata.get('overview'),
-                            json.dumps(metadata.get('genres', [])),
-                            metadata.get('rating'),
-                            metadata.get('runtime'),
-                            metadata.get('release_date'),
-                            metadata.get('imdb_id'),
-                            media_id
-                        ))
-                        conn.commit()
-                        conn.close()
-                        updated_count += 1
+                        updates.append(metadata + (media_id,))
                 except Exception as e:
                     logger.error(f"Error updating metadata for media {media_id}: {e}")
             
+            # Apply every match in one write transaction, after the network lookups are done
+            if updates:
+                with self.pool.transaction() as conn:
+                    conn.executemany(UPDATE_MEDIA_METADATA_SQL, updates)
+            updated_count = len(updates)
+            
             return f"Metadata update completed. Updated {updated_count} files."
         except Exception as e:
             raise Exception(f"Metadata update failed: {e}")
     
+    def _lookup_movie_metadata(self, title: str, year: int) -> Optional[Tuple]:
+        """Look a movie up on TMDB and return its UPDATE_MEDIA_METADATA_SQL values (without the media id)"""
+        result = self.tmdb_service.search_movie(title, year)
+        if not result:
+            return None
+        
+        details = self.tmdb_service.get_movie_details(result['id']) or result
+        return (
+            details.get('id'),
+            self.tmdb_service.get_image_url(details.get('poster_path')),
+            self.tmdb_service.get_image_url(details.get('backdrop_path'), 'w1280'),
+            details.get('overview', ''),
+            json.dumps([genre['name'] for genre in details.get('genres', [])]),
+            details.get('vote_average', 0),
+            details.get('runtime', 0),
+            details.get('release_date', ''),
+            details.get('imdb_id', '')
+        )
+    
     def _execute_custom_script(self, config: Dict) -> str:
         """Execute custom script automation"""
         try:
@@ -477,56 +564,60 @@ class AutomationService:
         except Exception as e:
             raise Exception(f"Custom script execution failed: {e}")
     
-    def _update_task_stats(self, task_id: int, success: bool):
-        """Update task statistics"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            if success:
-                cursor.execute('''
-                    UPDATE automation_tasks 
-                    SET run_count = run_count + 1, 
-                        success_count = success_count + 1,
-                        last_run = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                ''', (task_id,))
-            else:
-                cursor.execute('''
-                    UPDATE automation_tasks 
-                    SET run_count = run_count + 1, 
-                        error_count = error_count + 1,
-                        last_run = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                ''', (task_id,))
-            
-            conn.commit()
-            conn.close()
-        except Exception as e:
-            logger.error(f"Error updating task stats: {e}")
+    def _task_result_writer(self):
+        """Drain queued task results and commit each batch in one transaction, until a None sentinel arrives"""
+        while True:
+            batch = [self._log_queue.get()]
+            try:
+                while batch[-1] is not None and len(batch) < TASK_RESULT_BATCH_SIZE:
+                    batch.append(self._log_queue.get_nowait())
+            except queue.Empty:
+                pass
+            
+            stopping = batch[-1] is None
+            if stopping:
+                batch.pop()
+            if batch:
+                self._write_task_results(batch)
+            if stopping:
+                return
     
-    def _log_task_execution(self, task_id: int, task_name: str, status: str, 
-                           duration_ms: int, output: str, error_message: str):
-        """Log task execution"""
+    def _write_task_results(self, batch: List[Tuple]):
+        """Write task stats and logs for a batch, falling back to one transaction per result"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT INTO automation_logs 
-                (task_id, task_name, execution_time, status, duration_ms, output, error_message)
-                VALUES (?, ?, CURRENT_TIMESTAMP, ?, ?, ?, ?)
-            ''', (task_id, task_name, status, duration_ms, output, error_message))
-            
-            conn.commit()
-            conn.close()
+            self._write_task_result_rows(batch)
+            return
         except Exception as e:
-            logger.error(f"Error logging task execution: {e}")
+            logger.warning(f"Error writing {len(batch)} task results ({e}); retrying one at a time")
+        
+        for result in batch:
+            try:
+                self._write_task_result_rows([result])
+            except Exception as e:
+                logger.error(f"Error writing result for task {result[0]}: {e}")
+    
+    def _write_task_result_rows(self, batch: List[Tuple]):
+        """Apply the stats UPDATEs and log INSERTs for a batch in one transaction"""
+        with self.pool.transaction() as conn:
+            conn.executemany(UPDATE_TASK_STATS_SQL, [
+                (int(success), int(not success), task_id)
+                for task_id, success, *_ in batch
+            ])
+            conn.executemany(INSERT_TASK_LOG_SQL, [
+                (task_id, task_name, status, duration_ms, output, error_message)
+                for task_id, _, task_name, status, duration_ms, output, error_message in batch
+            ])
+    
+    def flush_task_results(self, timeout: float = 10):
+        """Stop the result writer after it has committed everything queued so far"""
+        if self._result_writer.is_alive():
+            self._log_queue.put(None)
+            self._result_writer.join(timeout)
     
     def get_automation_tasks(self) -> List[Dict]:
         """Get all automation tasks"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.connect()
             conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
             
@@ -550,19 +641,24 @@ class AutomationService:
             logger.error(f"Error getting automation tasks: {e}")
             return []
     
-    def get_task_logs(self, task_id: int, limit: int = 50) -> List[Dict]:
-        """Get logs for a specific task"""
+    def get_task_logs(self, task_id: int, limit: int = 50, before: tuple = None) -> List[Dict]:
+        """Get logs for a specific task, optionally only entries older than an (execution_time, id) key"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.connect()
             conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
             
-            cursor.execute('''
-                SELECT * FROM automation_logs 
-                WHERE task_id = ? 
-                ORDER BY execution_time DESC 
-                LIMIT ?
-            ''', (task_id, limit))
+            query = 'SELECT * FROM automation_logs WHERE task_id = ?'
+            params = [task_id]
+            
+            if before:
+                query += ' AND (execution_time, id) < (?, ?)'
+                params.extend(before)
+            
+            query += ' ORDER BY execution_time DESC, id DESC LIMIT ?'
+            params.append(limit)
+            
+            cursor.execute(query, params)
             
             results = [dict(row) for row in cursor.fetchall()]
             conn.close()
@@ -574,17 +670,12 @@ class AutomationService:
     def toggle_task(self, task_id: int, is_active: bool) -> bool:
         """Toggle task active status"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                UPDATE automation_tasks 
-                SET is_active = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            ''', (is_active, task_id))
-            
-            conn.commit()
-            conn.close()
+            with self.pool.transaction() as conn:
+                conn.execute('''
+                    UPDATE automation_tasks 
+                    SET is_active = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                ''', (is_active, task_id))
             
             # Update scheduler
             if is_active:
@@ -608,7 +699,7 @@ class AutomationService:
     def _get_task_by_id(self, task_id: int) -> Optional[Dict]:
         """Get task by ID"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.connect()
             conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
             
@@ -632,17 +723,12 @@ class AutomationService:
     def delete_task(self, task_id: int) -> bool:
         """Delete automation task"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Delete task logs first
-            cursor.execute('DELETE FROM automation_logs WHERE task_id = ?', (task_id,))
-            
-            # Delete task
-            cursor.execute('DELETE FROM automation_tasks WHERE id = ?', (task_id,))
-            
-            conn.commit()
-            conn.close()
+            with self.pool.transaction() as conn:
+                # Delete task logs first
+                conn.execute('DELETE FROM automation_logs WHERE task_id = ?', (task_id,))
+                
+                # Delete task
+                conn.execute('DELETE FROM automation_tasks WHERE id = ?', (task_id,))
             
             # Remove from scheduler
             if task_id in self.automation_tasks:
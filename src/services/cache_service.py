@@ -3,6 +3,7 @@ import os
 import json
 import time
 import hashlib
+import threading
 from typing import Any, Optional, Dict, List
 from functools import wraps
 from flask import current_app, request
@@ -256,6 +257,50 @@ def cache_invalidate(pattern: str = None):
         return wrapper
     return decorator
 
+class TTLCache:
+    """Small thread-safe in-process cache with per-entry expiry"""
+    
+    def __init__(self, ttl: int = 30, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = {}
+        self._lock = threading.Lock()
+    
+    def get(self, key, default=None):
+        """Get a value if present and not expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return default
+            return value
+    
+    def set(self, key, value, ttl: int = None):
+        """Store a value, evicting the oldest entry when full"""
+        with self._lock:
+            if key not in self._entries and len(self._entries) >= self.maxsize:
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[key] = (time.monotonic() + (ttl or self.ttl), value)
+    
+    def delete(self, key):
+        """Remove a single key"""
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def delete_where(self, predicate):
+        """Remove every key matching predicate"""
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+    
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._entries.clear()
+
 # Specific cache keys for media server
 class CacheKeys:
     MEDIA_LIST = "media:list"
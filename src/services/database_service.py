@@ -11,6 +11,106 @@ import json
 
 logger = logging.getLogger(__name__)
 
+# Per-connection page cache (negative = KiB) and memory-mapped I/O window
+CONNECTION_CACHE_KIB = -int(os.getenv('DB_CACHE_SIZE_KIB', '65536'))
+CONNECTION_MMAP_BYTES = int(os.getenv('DB_MMAP_SIZE', str(256 * 1024 * 1024)))
+# Prepared statements kept per connection; pooled connections live long enough to reuse them
+CONNECTION_CACHED_STATEMENTS = int(os.getenv('DB_CACHED_STATEMENTS', '256'))
+
+class PooledConnection(sqlite3.Connection):
+    """SQLite connection whose close() hands it back to its pool"""
+    
+    pool = None
+    
+    def close(self):
+        if self.pool is None:
+            super().close()
+        else:
+            self.pool.release(self)
+    
+    def discard(self):
+        """Really close the underlying connection"""
+        self.pool = None
+        super().close()
+
+class ConnectionPool:
+    """Thread-safe pool of tuned SQLite connections for one database file"""
+    
+    def __init__(self, db_path: str, pool_size: int = None):
+        self.db_path = db_path
+        self.pool_size = pool_size or int(os.getenv('DB_POOL_SIZE', '10'))
+        self.idle_connections = []
+        self.lock = threading.Lock()
+        # WAL allows one writer at a time; queue writers here instead of on SQLITE_BUSY retries
+        self.write_lock = threading.Lock()
+    
+    def _create_connection(self) -> PooledConnection:
+        conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,
+            timeout=30.0,
+            factory=PooledConnection,
+            cached_statements=CONNECTION_CACHED_STATEMENTS
+        )
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA busy_timeout=30000')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute(f'PRAGMA cache_size={CONNECTION_CACHE_KIB}')
+        conn.execute(f'PRAGMA mmap_size={CONNECTION_MMAP_BYTES}')
+        conn.pool = self
+        return conn
+    
+    def connect(self) -> PooledConnection:
+        """Check out an idle connection, opening a new one if none are free"""
+        with self.lock:
+            if self.idle_connections:
+                return self.idle_connections.pop()
+        return self._create_connection()
+    
+    def release(self, conn: PooledConnection):
+        """Return a connection to the pool, discarding it if the pool is full"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = None
+        except sqlite3.Error:
+            conn.discard()
+            return
+        
+        with self.lock:
+            if conn not in self.idle_connections and len(self.idle_connections) < self.pool_size:
+                self.idle_connections.append(conn)
+                return
+        conn.discard()
+
+    @contextmanager
+    def transaction(self):
+        """Run a write transaction on a pooled connection, holding the pool's writer lock"""
+        conn = self.connect()
+        try:
+            with self.write_lock:
+                conn.execute('BEGIN IMMEDIATE')
+                try:
+                    yield conn
+                    conn.commit()
+                except BaseException:
+                    conn.rollback()
+                    raise
+        finally:
+            conn.close()
+
+_connection_pools = {}
+_connection_pools_lock = threading.Lock()
+
+def get_connection_pool(db_path: str) -> ConnectionPool:
+    """Get the shared connection pool for a database file"""
+    with _connection_pools_lock:
+        pool = _connection_pools.get(db_path)
+        if pool is None:
+            pool = _connection_pools[db_path] = ConnectionPool(db_path)
+        return pool
+
 class DatabaseService:
     def __init__(self, db_path: str = 'watch.db'):
         self.db_path = db_path
@@ -113,9 +213,6 @@ class DatabaseService:
             "CREATE INDEX IF NOT EXISTS idx_user_play_history_played_at ON user_play_history(played_at)",
             "CREATE INDEX IF NOT EXISTS idx_user_play_history_completed ON user_play_history(completed)",
             
-            "CREATE INDEX IF NOT EXISTS idx_user_recommendations_user_id ON user_recommendations(user_id)",
-            "CREATE INDEX IF NOT EXISTS idx_user_recommendations_score ON user_recommendations(score)",
-            
             # Transcoding indexes
             "CREATE INDEX IF NOT EXISTS idx_transcoding_jobs_media_id ON transcoding_jobs(media_id)",
             "CREATE INDEX IF NOT EXISTS idx_transcoding_jobs_status ON transcoding_jobs(status)",
@@ -151,8 +248,6 @@ class DatabaseService:
                         table_name = 'user_watchlists'
                     elif 'user_play_history' in index_sql:
                         table_name = 'user_play_history'
-                    elif 'user_recommendations' in index_sql:
-                        table_name = 'user_recommendations'
                     elif 'transcoding_jobs' in index_sql:
                         table_name = 'transcoding_jobs'
                     elif 'transcoding_cache' in index_sql:
@@ -437,4 +532,4 @@ class DatabaseService:
         logger.info("All database connections closed")
 
 # Database service instance
-database_service = DatabaseService()
+database_service = DatabaseService(os.getenv('DATABASE_PATH', 'watch.db'))
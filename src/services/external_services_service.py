@@ -1,12 +1,15 @@
 # External Services Integration Service for Watch Media Server
 import os
 import json
-import requests
 import sqlite3
 from typing import Dict, List, Optional, Any
 from datetime import datetime, timedelta
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlencode, parse_qs
+from src.services.database_service import get_connection_pool
+from src.utils.http_session import create_http_session
 
 # Optional imports for integrations
 try:
@@ -43,15 +46,28 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Services exposed on the connections endpoint, in display order
+SUPPORTED_SERVICES = ('trakt', 'letterboxd', 'imdb', 'dropbox', 'google_drive', 'twitter', 'facebook', 'telegram')
+
+# Trakt endpoints fetched by sync_with_trakt: watchlist, then history
+TRAKT_SYNC_ENDPOINTS = ('/users/me/watchlist/movies', '/users/me/history/movies')
+
+# Tokens expiring within this many seconds are renewed in the background
+TOKEN_REFRESH_WINDOW = 300
+
 class ExternalServicesService:
     def __init__(self, db_path: str = 'watch.db'):
         self.db_path = db_path
+        self.pool = get_connection_pool(db_path)
+        self.http = create_http_session()
         self.init_external_services_tables()
         self.service_configs = self._get_service_configs()
+        # The owner calls start_token_refresher() in exactly one process, since refresh tokens rotate
+        self.token_refresher_stop = threading.Event()
     
     def init_external_services_tables(self):
         """Initialize external services database tables"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.pool.connect()
         cursor = conn.cursor()
         
         # External service connections table
@@ -116,6 +132,10 @@ class ExternalServicesService:
             )
         ''')
         
+        # Index log listing, optionally filtered by service
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_integration_logs_service_created ON integration_logs(service_name, created_at DESC)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_integration_logs_created ON integration_logs(created_at DESC)')
+        
         conn.commit()
         conn.close()
     
@@ -215,7 +235,7 @@ class ExternalServicesService:
     def _store_auth_state(self, user_id: int, service_name: str, state: str):
         """Store OAuth state for verification"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.connect()
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -244,7 +264,7 @@ class ExternalServicesService:
                 return False
             
             # Store tokens
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.connect()
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -281,7 +301,7 @@ class ExternalServicesService:
     def _verify_auth_state(self, user_id: int, service_name: str, state: str) -> bool:
         """Verify OAuth state"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.connect()
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -319,7 +339,7 @@ class ExternalServicesService:
             elif service_name == 'google_drive':
                 data['redirect_uri'] = config.get('redirect_uri')
             
-            response = requests.post(token_url, data=data)
+            response = self.http.post(token_url, data=data)
             response.raise_for_status()
             
             token_data = response.json()
@@ -341,7 +361,7 @@ class ExternalServicesService:
     def get_service_connection(self, user_id: int, service_name: str) -> Optional[Dict]:
         """Get user's connection to external service"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.connect()
             conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
             
@@ -366,10 +386,145 @@ class ExternalServicesService:
             logger.error(f"Error getting service connection: {e}")
             return None
     
+    def get_service_connections(self, user_id: int, service_names) -> Dict[str, Optional[Dict]]:
+        """Get user's connections to several external services in one query"""
+        connections = {service_name: None for service_name in service_names}
+        if not connections:
+            return connections
+        
+        try:
+            conn = self.pool.connect()
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            
+            # The UNIQUE(user_id, service_name) index serves this IN lookup
+            placeholders = ','.join('?' * len(connections))
+            cursor.execute(f'''
+                SELECT * FROM external_service_connections 
+                WHERE user_id = ? AND service_name IN ({placeholders}) AND is_active = 1
+            ''', (user_id, *connections))
+            
+            rows = cursor.fetchall()
+            conn.close()
+            
+            for row in rows:
+                connection = dict(row)
+                try:
+                    connection['service_data'] = json.loads(connection['service_data'])
+                except:
+                    connection['service_data'] = {}
+                connections[connection['service_name']] = connection
+            
+            return connections
+        except Exception as e:
+            logger.error(f"Error getting service connections: {e}")
+            return connections
+    
+    def _token_expiring(self, connection: Dict, window: int = 0) -> bool:
+        """Check whether a connection's access token expires within window seconds"""
+        expires_at = connection.get('token_expires_at')
+        if not expires_at:
+            return False
+        try:
+            return datetime.fromisoformat(expires_at) <= datetime.now() + timedelta(seconds=window)
+        except (TypeError, ValueError):
+            return False
+    
+    def refresh_access_token(self, connection: Dict) -> Optional[Dict]:
+        """Renew a connection's access token using its refresh token"""
+        service_name = connection['service_name']
+        config = self.service_configs.get(service_name, {})
+        if not connection.get('refresh_token') or not config.get('token_url'):
+            return None
+        
+        try:
+            response = self.http.post(config['token_url'], data={
+                'client_id': config.get('client_id') or config.get('api_key') or config.get('app_id'),
+                'client_secret': config.get('client_secret') or config.get('api_secret'),
+                'refresh_token': connection['refresh_token'],
+                'grant_type': 'refresh_token'
+            }, timeout=10)
+            response.raise_for_status()
+            
+            token_data = response.json()
+            expires_in = token_data.get('expires_in', 3600)
+            connection['access_token'] = token_data.get('access_token')
+            connection['refresh_token'] = token_data.get('refresh_token') or connection['refresh_token']
+            connection['token_expires_at'] = (datetime.now() + timedelta(seconds=expires_in)).isoformat()
+            
+            conn = self.pool.connect()
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE external_service_connections 
+                SET access_token = ?, refresh_token = ?, token_expires_at = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (connection['access_token'], connection['refresh_token'], connection['token_expires_at'], connection['id']))
+            conn.commit()
+            conn.close()
+            
+            return connection
+        except Exception as e:
+            logger.error(f"Error refreshing {service_name} token: {e}")
+            self._log_integration_event(service_name, 'token_refresh_error', {
+                'user_id': connection['user_id'],
+                'error': str(e)
+            }, 'error', str(e))
+            return None
+    
+    def get_valid_connection(self, user_id: int, service_name: str) -> Optional[Dict]:
+        """Get a connection, refreshing its token inline only if the background refresher missed it"""
+        connection = self.get_service_connection(user_id, service_name)
+        if connection and self._token_expiring(connection):
+            connection = self.refresh_access_token(connection) or connection
+        return connection
+    
+    def refresh_expiring_tokens(self) -> int:
+        """Refresh every active token that expires within TOKEN_REFRESH_WINDOW"""
+        try:
+            cutoff = (datetime.now() + timedelta(seconds=TOKEN_REFRESH_WINDOW)).isoformat()
+            
+            conn = self.pool.connect()
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT id, user_id, service_name, refresh_token, token_expires_at 
+                FROM external_service_connections 
+                WHERE is_active = 1 AND refresh_token IS NOT NULL 
+                AND token_expires_at IS NOT NULL AND token_expires_at < ?
+            ''', (cutoff,))
+            connections = [dict(row) for row in cursor.fetchall()]
+            conn.close()
+            
+            if not connections:
+                return 0
+            
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                refreshed = [result for result in executor.map(self.refresh_access_token, connections) if result]
+            
+            return len(refreshed)
+        except Exception as e:
+            logger.error(f"Error refreshing expiring tokens: {e}")
+            return 0
+    
+    def start_token_refresher(self, interval: int = 60):
+        """Start background thread that renews tokens before they expire"""
+        def run_refresher():
+            while not self.token_refresher_stop.wait(interval):
+                self.refresh_expiring_tokens()
+        
+        refresher_thread = threading.Thread(target=run_refresher, daemon=True)
+        refresher_thread.start()
+    
+    def _fetch_json(self, url: str, headers: Dict) -> Any:
+        """GET a JSON document, raising on HTTP errors"""
+        response = self.http.get(url, headers=headers)
+        response.raise_for_status()
+        return response.json()
+    
     def sync_with_trakt(self, user_id: int) -> bool:
         """Sync watchlist and history with Trakt.tv"""
         try:
-            connection = self.get_service_connection(user_id, 'trakt')
+            connection = self.get_valid_connection(user_id, 'trakt')
             if not connection:
                 return False
             
@@ -381,28 +536,16 @@ class ExternalServicesService:
                 'trakt-api-key': self.service_configs['trakt']['client_id']
             }
             
-            # Get user's Trakt watchlist
-            response = requests.get(
-                f"{self.service_configs['trakt']['base_url']}/users/me/watchlist/movies",
-                headers=headers
-            )
-            response.raise_for_status()
+            # Fetch watchlist and history concurrently
+            base_url = self.service_configs['trakt']['base_url']
+            with ThreadPoolExecutor(max_workers=len(TRAKT_SYNC_ENDPOINTS)) as executor:
+                trakt_watchlist, trakt_history = executor.map(
+                    lambda path: self._fetch_json(f"{base_url}{path}", headers),
+                    TRAKT_SYNC_ENDPOINTS
+                )
             
-            trakt_watchlist = response.json()
-            
-            # Sync with local watchlist
+            # Sync with local watchlist and history
             self._sync_trakt_watchlist(user_id, trakt_watchlist)
-            
-            # Get user's Trakt history
-            response = requests.get(
-                f"{self.service_configs['trakt']['base_url']}/users/me/history/movies",
-                headers=headers
-            )
-            response.raise_for_status()
-            
-            trakt_history = response.json()
-            
-            # Sync with local history
             self._sync_trakt_history(user_id, trakt_history)
             
             self._log_integration_event('trakt', 'sync_success', {
@@ -423,7 +566,7 @@ class ExternalServicesService:
     def _sync_trakt_watchlist(self, user_id: int, trakt_watchlist: List[Dict]):
         """Sync Trakt watchlist with local watchlist"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.connect()
             cursor = conn.cursor()
             
             for item in trakt_watchlist:
@@ -456,7 +599,7 @@ class ExternalServicesService:
     def _sync_trakt_history(self, user_id: int, trakt_history: List[Dict]):
         """Sync Trakt history with local history"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.connect()
             cursor = conn.cursor()
             
             for item in trakt_history:
@@ -491,12 +634,12 @@ class ExternalServicesService:
     def share_to_twitter(self, user_id: int, media_id: int, message: str = None) -> bool:
         """Share media to Twitter"""
         try:
-            connection = self.get_service_connection(user_id, 'twitter')
+            connection = self.get_valid_connection(user_id, 'twitter')
             if not connection:
                 return False
             
             # Get media info
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.connect()
             cursor = conn.cursor()
             cursor.execute('SELECT title, year, poster_url FROM media_files WHERE id = ?', (media_id,))
             media = cursor.fetchone()
@@ -521,7 +664,7 @@ class ExternalServicesService:
                 'text': message
             }
             
-            response = requests.post(
+            response = self.http.post(
                 f"{self.service_configs['twitter']['base_url']}/tweets",
                 headers=headers,
                 json=tweet_data
@@ -552,7 +695,7 @@ class ExternalServicesService:
                 return False
             
             # Get user's Telegram chat ID (would be stored in user preferences)
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.connect()
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT preferences FROM users WHERE id = ?
@@ -579,7 +722,7 @@ class ExternalServicesService:
             
             if media_id:
                 # Get media info for rich message
-                conn = sqlite3.connect(self.db_path)
+                conn = self.pool.connect()
                 cursor = conn.cursor()
                 cursor.execute('SELECT title, year, poster_url FROM media_files WHERE id = ?', (media_id,))
                 media = cursor.fetchone()
@@ -589,7 +732,7 @@ class ExternalServicesService:
                     title, year, poster_url = media
                     data['text'] = f"🎬 <b>{title} ({year})</b>\n\n{message}"
             
-            response = requests.post(url, data=data)
+            response = self.http.post(url, data=data)
             response.raise_for_status()
             
             self._log_integration_event('telegram', 'notification_sent', {
@@ -610,7 +753,7 @@ class ExternalServicesService:
     def create_webhook_subscription(self, user_id: int, webhook_url: str, event_types: List[str], secret_key: str = None) -> int:
         """Create webhook subscription"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.connect()
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -631,7 +774,7 @@ class ExternalServicesService:
     def trigger_webhook(self, user_id: int, event_type: str, event_data: Dict):
         """Trigger webhook for user"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.connect()
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -663,10 +806,10 @@ class ExternalServicesService:
                     headers['X-Webhook-Secret'] = secret_key
                 
                 # Send webhook
-                response = requests.post(webhook_url, json=payload, headers=headers, timeout=10)
+                response = self.http.post(webhook_url, json=payload, headers=headers, timeout=10)
                 
                 # Update last triggered time
-                conn = sqlite3.connect(self.db_path)
+                conn = self.pool.connect()
                 cursor = conn.cursor()
                 cursor.execute('''
                     UPDATE webhook_subscriptions 
@@ -695,7 +838,7 @@ class ExternalServicesService:
     def _log_integration_event(self, service_name: str, event_type: str, event_data: Dict, status: str, error_message: str = None):
         """Log integration event"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.connect()
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -709,21 +852,29 @@ class ExternalServicesService:
         except Exception as e:
             logger.error(f"Error logging integration event: {e}")
     
-    def get_integration_logs(self, service_name: str = None, limit: int = 100) -> List[Dict]:
-        """Get integration logs"""
+    def get_integration_logs(self, service_name: str = None, limit: int = 100, before: tuple = None) -> List[Dict]:
+        """Get integration logs, optionally only entries older than a (created_at, id) key"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.connect()
             conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
             
-            query = 'SELECT * FROM integration_logs'
+            conditions = []
             params = []
             
             if service_name:
-                query += ' WHERE service_name = ?'
+                conditions.append('service_name = ?')
                 params.append(service_name)
             
-            query += ' ORDER BY created_at DESC LIMIT ?'
+            if before:
+                conditions.append('(created_at, id) < (?, ?)')
+                params.extend(before)
+            
+            query = 'SELECT * FROM integration_logs'
+            if conditions:
+                query += ' WHERE ' + ' AND '.join(conditions)
+            
+            query += ' ORDER BY created_at DESC, id DESC LIMIT ?'
             params.append(limit)
             
             cursor.execute(query, params)
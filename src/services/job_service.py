@@ -0,0 +1,126 @@
+# Background Job Service for Watch Media Server
+import os
+import json
+import uuid
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Any
+from datetime import datetime, timedelta
+from src.services.database_service import get_connection_pool
+
+logger = logging.getLogger(__name__)
+
+# Jobs live in sqlite so any worker process can report on them and they survive a restart
+JOB_TABLE_DDL = '''
+    CREATE TABLE IF NOT EXISTS background_jobs (
+        id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        user_id INTEGER,
+        status TEXT NOT NULL,
+        result TEXT,
+        error TEXT,
+        created_at TEXT NOT NULL,
+        finished_at TEXT
+    )
+'''
+# Unfinished jobs older than this are assumed lost and pruned
+JOB_STALE_AFTER = timedelta(hours=int(os.getenv('JOB_STALE_HOURS', '24')))
+JOB_COLUMNS = ('id', 'name', 'user_id', 'status', 'result', 'error', 'created_at', 'finished_at')
+
+class JobService:
+    def __init__(self, max_workers: int = None, retention_minutes: int = 60, db_path: str = None):
+        self.max_workers = max_workers or int(os.getenv('JOB_WORKERS', '4'))
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='watch-job')
+        self.retention = timedelta(minutes=retention_minutes)
+        self.db_path = db_path
+        self.pool = None
+        self.pool_lock = threading.Lock()
+
+    def _job_pool(self):
+        """Get the jobs database pool, creating the jobs table on first use"""
+        if self.pool is None:
+            with self.pool_lock:
+                if self.pool is None:
+                    # Resolved lazily: DATABASE_PATH may be set after this module is imported
+                    pool = get_connection_pool(self.db_path or os.getenv('DATABASE_PATH', 'watch.db'))
+                    with pool.transaction() as conn:
+                        conn.execute(JOB_TABLE_DDL)
+                        # Jobs a previous process never finished will not run again; resolve them so clients stop polling.
+                        # A job still running in a sibling worker overwrites this with its real outcome when it ends.
+                        conn.execute(
+                            "UPDATE background_jobs SET status = 'failed', error = 'interrupted', finished_at = ? "
+                            "WHERE status IN ('queued', 'running')",
+                            (datetime.now().isoformat(),)
+                        )
+                    self.pool = pool
+        return self.pool
+
+    def submit(self, name: str, func: Callable, *args, user_id: int = None, **kwargs) -> str:
+        """Queue a callable to run in the background and return its job id"""
+        job_id = uuid.uuid4().hex
+        with self._job_pool().transaction() as conn:
+            self._prune_finished_jobs(conn)
+            conn.execute(
+                'INSERT INTO background_jobs (id, name, user_id, status, created_at) VALUES (?, ?, ?, ?, ?)',
+                (job_id, name, user_id, 'queued', datetime.now().isoformat())
+            )
+
+        self.executor.submit(self._run_job, job_id, name, func, args, kwargs)
+        return job_id
+
+    def dispatch(self, name: str, func: Callable, *args, **kwargs):
+        """Run a fire-and-forget callable in the background without tracking it as a job"""
+        def run():
+            try:
+                func(*args, **kwargs)
+            except Exception as e:
+                logger.error(f"Background task {name} failed: {e}")
+        
+        self.executor.submit(run)
+    
+    def _run_job(self, job_id: str, name: str, func: Callable, args: tuple, kwargs: Dict):
+        """Run a job and record its outcome"""
+        self._update_job(job_id, status='running')
+        try:
+            result = func(*args, **kwargs)
+            self._update_job(job_id, status='completed', result=json.dumps(result, default=str),
+                             finished_at=datetime.now().isoformat())
+        except Exception as e:
+            logger.error(f"Background job {name} failed: {e}")
+            self._update_job(job_id, status='failed', error=str(e), finished_at=datetime.now().isoformat())
+
+    def _update_job(self, job_id: str, **fields):
+        """Write a job's changed columns"""
+        try:
+            with self.pool.transaction() as conn:
+                assignments = ', '.join(f'{column} = ?' for column in fields)
+                conn.execute(f'UPDATE background_jobs SET {assignments} WHERE id = ?', (*fields.values(), job_id))
+        except Exception as e:
+            logger.error(f"Error updating background job {job_id}: {e}")
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a snapshot of a job's state"""
+        conn = self._job_pool().connect()
+        try:
+            row = conn.execute(f'SELECT {", ".join(JOB_COLUMNS)} FROM background_jobs WHERE id = ?', (job_id,)).fetchone()
+        finally:
+            conn.close()
+        if not row:
+            return None
+        job = dict(zip(JOB_COLUMNS, row))
+        if job['result'] is not None:
+            job['result'] = json.loads(job['result'])
+        return job
+
+    def _prune_finished_jobs(self, conn):
+        """Forget finished jobs older than the retention period, and unfinished ones older than JOB_STALE_AFTER"""
+        now = datetime.now()
+        conn.execute(
+            'DELETE FROM background_jobs WHERE (finished_at IS NOT NULL AND finished_at < ?) '
+            'OR (finished_at IS NULL AND created_at < ?)',
+            ((now - self.retention).isoformat(), (now - JOB_STALE_AFTER).isoformat())
+        )
+
+# Job service instance
+job_service = JobService()
@@ -6,24 +6,42 @@ import logging
 from typing import Dict, List, Optional
 from datetime import datetime, timedelta
 from functools import wraps
-from prometheus_client import Counter, Histogram, Gauge, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client import Counter, Histogram, Gauge, CollectorRegistry, REGISTRY, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client import multiprocess
 from flask import request, Response, current_app
 import sqlite3
 import threading
 
 logger = logging.getLogger(__name__)
 
-# Prometheus metrics
+# Set (and emptied at deploy) for multi-worker servers so every worker writes to shared mmap files
+PROMETHEUS_MULTIPROC_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+
+# Prometheus metrics; per-process gauges are summed across live workers, host-wide ones take the max
 REQUEST_COUNT = Counter('watch_requests_total', 'Total requests', ['method', 'endpoint', 'status'])
 REQUEST_DURATION = Histogram('watch_request_duration_seconds', 'Request duration', ['method', 'endpoint'])
-ACTIVE_CONNECTIONS = Gauge('watch_active_connections', 'Active connections')
-MEDIA_FILES_COUNT = Gauge('watch_media_files_total', 'Total media files')
-USERS_COUNT = Gauge('watch_users_total', 'Total users')
-CACHE_HIT_RATE = Gauge('watch_cache_hit_rate', 'Cache hit rate percentage')
-DISK_USAGE = Gauge('watch_disk_usage_bytes', 'Disk usage in bytes', ['path'])
-MEMORY_USAGE = Gauge('watch_memory_usage_bytes', 'Memory usage in bytes')
-CPU_USAGE = Gauge('watch_cpu_usage_percent', 'CPU usage percentage')
-TRANSCODE_JOBS = Gauge('watch_transcode_jobs_total', 'Transcoding jobs', ['status'])
+ACTIVE_CONNECTIONS = Gauge('watch_active_connections', 'Active connections', multiprocess_mode='livesum')
+MEDIA_FILES_COUNT = Gauge('watch_media_files_total', 'Total media files', multiprocess_mode='max')
+USERS_COUNT = Gauge('watch_users_total', 'Total users', multiprocess_mode='max')
+CACHE_HIT_RATE = Gauge('watch_cache_hit_rate', 'Cache hit rate percentage', multiprocess_mode='max')
+DISK_USAGE = Gauge('watch_disk_usage_bytes', 'Disk usage in bytes', ['path'], multiprocess_mode='max')
+MEMORY_USAGE = Gauge('watch_memory_usage_bytes', 'Memory usage in bytes', multiprocess_mode='max')
+CPU_USAGE = Gauge('watch_cpu_usage_percent', 'CPU usage percentage', multiprocess_mode='max')
+TRANSCODE_JOBS = Gauge('watch_transcode_jobs_total', 'Transcoding jobs', ['status'], multiprocess_mode='max')
+
+def build_metrics_registry():
+    """Registry to expose: one aggregating all workers' files in multiprocess mode, else the default"""
+    if not PROMETHEUS_MULTIPROC_DIR:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+METRICS_REGISTRY = build_metrics_registry()
+
+def prometheus_metrics_response():
+    """Render the current metrics in the Prometheus text format"""
+    return Response(generate_latest(METRICS_REGISTRY), mimetype=CONTENT_TYPE_LATEST)
 
 class PerformanceMonitor:
     def __init__(self, db_path: str = 'watch.db'):
@@ -5,12 +5,17 @@ import sqlite3
 from typing import Dict, List, Optional, Any
 from datetime import datetime, timedelta
 import logging
+from src.services.cache_service import TTLCache
 
 logger = logging.getLogger(__name__)
 
 class PlayerService:
     def __init__(self, db_path: str = 'watch.db'):
         self.db_path = db_path
+        # Settings and continue-watching tolerate a few seconds of staleness
+        cache_ttl = int(os.getenv('PLAYER_CACHE_TTL', '30'))
+        self.settings_cache = TTLCache(ttl=cache_ttl)
+        self.continue_watching_cache = TTLCache(ttl=cache_ttl)
         self.init_player_tables()
     
     def init_player_tables(self):
@@ -136,6 +141,9 @@ class PlayerService:
             )
         ''')
         
+        # Index per-user history, newest first
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_playback_history_user_start ON playback_history(user_id, start_time DESC)')
+        
         conn.commit()
         conn.close()
     
@@ -363,6 +371,7 @@ class PlayerService:
             
             conn.commit()
             conn.close()
+            self.invalidate_continue_watching(user_id)
             return session_id
         except Exception as e:
             logger.error(f"Error starting playback session: {e}")
@@ -441,6 +450,7 @@ class PlayerService:
             
             conn.commit()
             conn.close()
+            self.invalidate_continue_watching(session[1])
             return True
         except Exception as e:
             logger.error(f"Error ending playback session: {e}")
@@ -495,6 +505,30 @@ class PlayerService:
             logger.error(f"Error creating bookmark: {e}")
             return None
     
+    def create_bookmarks(self, user_id: int, media_id: int, bookmarks: List[Dict]) -> Optional[List[int]]:
+        """Create several bookmarks in one transaction and return their ids, or None on failure"""
+        if not bookmarks:
+            return []
+        
+        try:
+            conn = sqlite3.connect(self.db_path)
+            
+            with conn:
+                conn.executemany('''
+                    INSERT INTO media_bookmarks 
+                    (user_id, media_id, bookmark_name, time_position, notes)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', [(user_id, media_id, bookmark.get('bookmark_name'), bookmark['time_position'], bookmark.get('notes'))
+                      for bookmark in bookmarks])
+                # The write transaction holds the lock, so the new ids are contiguous
+                last_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+            
+            conn.close()
+            return list(range(last_id - len(bookmarks) + 1, last_id + 1))
+        except Exception as e:
+            logger.error(f"Error creating bookmarks: {e}")
+            return None
+    
     def get_media_bookmarks(self, media_id: int, user_id: int = None) -> List[Dict]:
         """Get bookmarks for media"""
         try:
@@ -527,6 +561,10 @@ class PlayerService:
     
     def get_player_settings(self, user_id: int) -> Dict:
         """Get player settings for user"""
+        settings = self.settings_cache.get(user_id)
+        if settings is not None:
+            return settings
+        
         try:
             conn = sqlite3.connect(self.db_path)
             conn.row_factory = sqlite3.Row
@@ -546,6 +584,7 @@ class PlayerService:
                     settings[row['setting_name']] = row['setting_value']
             
             conn.close()
+            self.settings_cache.set(user_id, settings)
             return settings
         except Exception as e:
             logger.error(f"Error getting player settings: {e}")
@@ -565,26 +604,56 @@ class PlayerService:
             
             conn.commit()
             conn.close()
+            self.settings_cache.delete(user_id)
             return True
         except Exception as e:
             logger.error(f"Error updating player setting: {e}")
             return False
     
-    def get_playback_history(self, user_id: int, limit: int = 50) -> List[Dict]:
-        """Get user's playback history"""
+    def update_player_settings(self, user_id: int, settings: Dict[str, Any]) -> bool:
+        """Update several player settings in a single transaction"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            
+            with conn:
+                conn.executemany('''
+                    INSERT INTO player_settings 
+                    (user_id, setting_name, setting_value, updated_at)
+                    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                    ON CONFLICT(user_id, setting_name) DO UPDATE SET 
+                    setting_value = excluded.setting_value, updated_at = excluded.updated_at
+                ''', [(user_id, name, json.dumps(value)) for name, value in settings.items()])
+            
+            conn.close()
+            self.settings_cache.delete(user_id)
+            return True
+        except Exception as e:
+            logger.error(f"Error updating player settings: {e}")
+            return False
+    
+    def get_playback_history(self, user_id: int, limit: int = 50, before: tuple = None) -> List[Dict]:
+        """Get user's playback history, optionally only entries older than a (start_time, id) key"""
         try:
             conn = sqlite3.connect(self.db_path)
             conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
             
-            cursor.execute('''
+            query = '''
                 SELECT ph.*, mf.filename, mf.title, mf.poster_url
                 FROM playback_history ph
                 JOIN media_files mf ON ph.media_id = mf.id
                 WHERE ph.user_id = ?
-                ORDER BY ph.start_time DESC
-                LIMIT ?
-            ''', (user_id, limit))
+            '''
+            params = [user_id]
+            
+            if before:
+                query += ' AND (ph.start_time, ph.id) < (?, ?)'
+                params.extend(before)
+            
+            query += ' ORDER BY ph.start_time DESC, ph.id DESC LIMIT ?'
+            params.append(limit)
+            
+            cursor.execute(query, params)
             
             results = []
             for row in cursor.fetchall():
@@ -603,6 +672,10 @@ class PlayerService:
     
     def get_continue_watching(self, user_id: int, limit: int = 20) -> List[Dict]:
         """Get continue watching list"""
+        results = self.continue_watching_cache.get((user_id, limit))
+        if results is not None:
+            return results
+        
         try:
             conn = sqlite3.connect(self.db_path)
             conn.row_factory = sqlite3.Row
@@ -621,10 +694,15 @@ class PlayerService:
             
             results = [dict(row) for row in cursor.fetchall()]
             conn.close()
+            self.continue_watching_cache.set((user_id, limit), results)
             return results
         except Exception as e:
             logger.error(f"Error getting continue watching: {e}")
             return []
+    
+    def invalidate_continue_watching(self, user_id: int):
+        """Drop cached continue watching lists for a user"""
+        self.continue_watching_cache.delete_where(lambda key: key[0] == user_id)
 
 # Player service instance
 player_service = PlayerService()
@@ -2,11 +2,64 @@
 import re
 from typing import List, Dict, Optional, Any
 from datetime import datetime, timedelta
+from functools import lru_cache
 import sqlite3
+from src.services.database_service import get_connection_pool
+from src.utils.json_provider import dumps as json_dumps, loads as json_loads
+
+SEARCH_BASE_SQL = """
+        SELECT m.*, 
+               CASE WHEN m.poster_url IS NOT NULL AND m.poster_url != '' THEN 1 ELSE 0 END as has_poster,
+               (SELECT COUNT(*) FROM subtitles s WHERE s.media_id = m.id) as subtitle_count
+        FROM media m
+        WHERE 1=1
+        """
+
+SEARCH_CLAUSES = {
+    'search_term': " AND (m.title LIKE ? OR m.file_name LIKE ? OR m.overview LIKE ?)",
+    'year_start': " AND CAST(SUBSTR(m.release_date, 1, 4) AS INTEGER) >= ?",
+    'year_end': " AND CAST(SUBSTR(m.release_date, 1, 4) AS INTEGER) <= ?",
+    'rating_min': " AND m.rating >= ?",
+    'rating_max': " AND m.rating <= ?",
+    'duration_min': " AND m.duration >= ?",
+    'duration_max': " AND m.duration <= ?",
+    'file_size_min': " AND m.file_size >= ?",
+    'file_size_max': " AND m.file_size <= ?",
+    'added_start': " AND m.created_at >= ?",
+    'added_end': " AND m.created_at <= ?",
+    'play_count_min': " AND m.play_count >= ?",
+    'play_count_max': " AND m.play_count <= ?",
+    'media_type': " AND m.media_type = ?",
+    'has_subtitles': " AND subtitle_count > 0",
+    'no_subtitles': " AND subtitle_count = 0",
+    'has_poster': " AND has_poster = 1",
+    'no_poster': " AND has_poster = 0",
+}
+
+SEARCH_SORT_FIELDS = frozenset(['title', 'rating', 'duration', 'file_size', 'created_at', 'play_count', 'release_date'])
+
+@lru_cache(maxsize=256)
+def compose_search_sql(clauses: tuple, sort_by: str, sort_order: str) -> str:
+    """Assemble the search SQL for one combination of active filters.
+
+    Filter values are always bound, so the text is identical for every request with the
+    same filters and sqlite3's per-connection statement cache reuses the prepared plan.
+    """
+    parts = [SEARCH_BASE_SQL]
+    for clause in clauses:
+        if isinstance(clause, tuple):
+            # ('genres', n): any of n genre patterns
+            parts.append(f" AND ({' OR '.join(['m.genres LIKE ?'] * clause[1])})")
+        else:
+            parts.append(SEARCH_CLAUSES[clause])
+    parts.append(f" ORDER BY m.{sort_by} {sort_order}")
+    parts.append(" LIMIT ? OFFSET ?")
+    return ''.join(parts)
 
 class SearchService:
     def __init__(self, db_path: str = 'watch_media.db'):
         self.db_path = db_path
+        self.pool = get_connection_pool(db_path)
         self.search_filters = {
             'year_range': None,
             'genres': [],
@@ -29,127 +82,93 @@ class SearchService:
                           limit: int = 50, offset: int = 0) -> tuple:
         """Build SQL query for advanced search"""
         filters = filters or {}
-        
-        # Base query
-        query = """
-        SELECT m.*, 
-               CASE WHEN m.poster_url IS NOT NULL AND m.poster_url != '' THEN 1 ELSE 0 END as has_poster,
-               (SELECT COUNT(*) FROM subtitles s WHERE s.media_id = m.id) as subtitle_count
-        FROM media m
-        WHERE 1=1
-        """
-        
+        clauses = []
         params = []
         
+        def add(clause, *values):
+            clauses.append(clause)
+            params.extend(values)
+        
         # Text search
         if search_term:
-            query += " AND (m.title LIKE ? OR m.file_name LIKE ? OR m.overview LIKE ?)"
             search_param = f"%{search_term}%"
-            params.extend([search_param, search_param, search_param])
+            add('search_term', search_param, search_param, search_param)
         
         # Year range filter
         if filters.get('year_range'):
             year_start, year_end = filters['year_range']
             if year_start:
-                query += " AND CAST(SUBSTR(m.release_date, 1, 4) AS INTEGER) >= ?"
-                params.append(year_start)
+                add('year_start', year_start)
             if year_end:
-                query += " AND CAST(SUBSTR(m.release_date, 1, 4) AS INTEGER) <= ?"
-                params.append(year_end)
+                add('year_end', year_end)
         
-        # Genre filter
+        # Genre filter; the clause key carries the placeholder count
         if filters.get('genres'):
-            genre_conditions = []
-            for genre in filters['genres']:
-                genre_conditions.append("m.genres LIKE ?")
-                params.append(f"%{genre}%")
-            if genre_conditions:
-                query += f" AND ({' OR '.join(genre_conditions)})"
+            add(('genres', len(filters['genres'])), *(f"%{genre}%" for genre in filters['genres']))
         
         # Rating filter
         if filters.get('rating_min', 0) > 0:
-            query += " AND m.rating >= ?"
-            params.append(filters['rating_min'])
+            add('rating_min', filters['rating_min'])
         
         if filters.get('rating_max', 10) < 10:
-            query += " AND m.rating <= ?"
-            params.append(filters['rating_max'])
+            add('rating_max', filters['rating_max'])
         
         # Duration filter
         if filters.get('duration_min', 0) > 0:
-            query += " AND m.duration >= ?"
-            params.append(filters['duration_min'])
+            add('duration_min', filters['duration_min'])
         
         if filters.get('duration_max'):
-            query += " AND m.duration <= ?"
-            params.append(filters['duration_max'])
+            add('duration_max', filters['duration_max'])
         
         # File size filter
         if filters.get('file_size_min', 0) > 0:
-            query += " AND m.file_size >= ?"
-            params.append(filters['file_size_min'])
+            add('file_size_min', filters['file_size_min'])
         
         if filters.get('file_size_max'):
-            query += " AND m.file_size <= ?"
-            params.append(filters['file_size_max'])
+            add('file_size_max', filters['file_size_max'])
         
         # Added date filter
         if filters.get('added_date_range'):
             date_start, date_end = filters['added_date_range']
             if date_start:
-                query += " AND m.created_at >= ?"
-                params.append(date_start)
+                add('added_start', date_start)
             if date_end:
-                query += " AND m.created_at <= ?"
-                params.append(date_end)
+                add('added_end', date_end)
         
         # Play count filter
         if filters.get('play_count_min', 0) > 0:
-            query += " AND m.play_count >= ?"
-            params.append(filters['play_count_min'])
+            add('play_count_min', filters['play_count_min'])
         
         if filters.get('play_count_max'):
-            query += " AND m.play_count <= ?"
-            params.append(filters['play_count_max'])
+            add('play_count_max', filters['play_count_max'])
         
         # Media type filter
         if filters.get('media_type'):
-            query += " AND m.media_type = ?"
-            params.append(filters['media_type'])
+            add('media_type', filters['media_type'])
         
-        # Has subtitles filter
+        # Has subtitles / has poster filters
         if filters.get('has_subtitles') is not None:
-            if filters['has_subtitles']:
-                query += " AND subtitle_count > 0"
-            else:
-                query += " AND subtitle_count = 0"
+            add('has_subtitles' if filters['has_subtitles'] else 'no_subtitles')
         
-        # Has poster filter
         if filters.get('has_poster') is not None:
-            if filters['has_poster']:
-                query += " AND has_poster = 1"
-            else:
-                query += " AND has_poster = 0"
+            add('has_poster' if filters['has_poster'] else 'no_poster')
         
         # Sorting
-        valid_sort_fields = ['title', 'rating', 'duration', 'file_size', 'created_at', 'play_count', 'release_date']
-        if sort_by in valid_sort_fields:
-            query += f" ORDER BY m.{sort_by} {sort_order.upper()}"
-        else:
-            query += " ORDER BY m.title ASC"
+        if sort_by not in SEARCH_SORT_FIELDS:
+            sort_by, sort_order = 'title', 'ASC'
+        sort_order = 'DESC' if str(sort_order).upper() == 'DESC' else 'ASC'
         
         # Pagination
-        query += " LIMIT ? OFFSET ?"
         params.extend([limit, offset])
         
-        return query, params
+        return compose_search_sql(tuple(clauses), sort_by, sort_order), params
     
     def search_media(self, search_term: str = '', filters: Dict = None, 
                     sort_by: str = 'title', sort_order: str = 'ASC',
                     limit: int = 50, offset: int = 0) -> List[Dict]:
         """Perform advanced search on media library"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.connect()
             conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
             
@@ -162,7 +181,7 @@ class SearchService:
                 # Parse JSON fields
                 if result.get('genres'):
                     try:
-                        result['genres'] = json.loads(result['genres']) if isinstance(result['genres'], str) else result['genres']
+                        result['genres'] = json_loads(result['genres']) if isinstance(result['genres'], str) else result['genres']
                     except:
                         result['genres'] = []
                 else:
@@ -180,7 +199,7 @@ class SearchService:
     def get_search_suggestions(self, query: str, limit: int = 10) -> List[str]:
         """Get search suggestions based on partial query"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.connect()
             cursor = conn.cursor()
             
             # Get title suggestions
@@ -202,7 +221,7 @@ class SearchService:
             
             for row in cursor.fetchall():
                 try:
-                    genres = json.loads(row[0]) if isinstance(row[0], str) else row[0]
+                    genres = json_loads(row[0]) if isinstance(row[0], str) else row[0]
                     for genre in genres:
                         if query.lower() in genre.lower() and genre not in suggestions:
                             suggestions.append(genre)
@@ -231,7 +250,7 @@ class SearchService:
     def get_continue_watching(self, limit: int = 20) -> List[Dict]:
         """Get media that was partially watched (has resume position)"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.connect()
             conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
             
@@ -251,7 +270,7 @@ class SearchService:
                 result = dict(row)
                 if result.get('genres'):
                     try:
-                        result['genres'] = json.loads(result['genres']) if isinstance(result['genres'], str) else result['genres']
+                        result['genres'] = json_loads(result['genres']) if isinstance(result['genres'], str) else result['genres']
                     except:
                         result['genres'] = []
                 else:
@@ -268,7 +287,7 @@ class SearchService:
     def get_recommendations(self, media_id: int, limit: int = 10) -> List[Dict]:
         """Get recommendations based on similar media"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.connect()
             conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
             
@@ -280,7 +299,7 @@ class SearchService:
                 return []
             
             source_media = dict(source_media)
-            source_genres = json.loads(source_media.get('genres', '[]')) if source_media.get('genres') else []
+            source_genres = json_loads(source_media.get('genres', '[]')) if source_media.get('genres') else []
             
             # Find similar media based on genres and rating
             recommendations = []
@@ -300,7 +319,7 @@ class SearchService:
                     result = dict(row)
                     if result.get('genres'):
                         try:
-                            result['genres'] = json.loads(result['genres']) if isinstance(result['genres'], str) else result['genres']
+                            result['genres'] = json_loads(result['genres']) if isinstance(result['genres'], str) else result['genres']
                         except:
                             result['genres'] = []
                     else:
@@ -320,7 +339,7 @@ class SearchService:
     def get_search_filters(self) -> Dict:
         """Get available search filters and their options"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.connect()
             cursor = conn.cursor()
             
             filters = {
@@ -346,7 +365,7 @@ class SearchService:
             all_genres = set()
             for row in cursor.fetchall():
                 try:
-                    genres = json.loads(row[0]) if isinstance(row[0], str) else row[0]
+                    genres = json_loads(row[0]) if isinstance(row[0], str) else row[0]
                     all_genres.update(genres)
                 except:
                     pass
@@ -366,7 +385,7 @@ class SearchService:
     def save_search(self, name: str, search_term: str, filters: Dict) -> bool:
         """Save a search for later use"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.connect()
             cursor = conn.cursor()
             
             # Create saved_searches table if it doesn't exist
@@ -383,7 +402,7 @@ class SearchService:
             cursor.execute("""
                 INSERT OR REPLACE INTO saved_searches (name, search_term, filters)
                 VALUES (?, ?, ?)
-            """, (name, search_term, json.dumps(filters)))
+            """, (name, search_term, json_dumps(filters)))
             
             conn.commit()
             conn.close()
@@ -396,7 +415,7 @@ class SearchService:
     def get_saved_searches(self) -> List[Dict]:
         """Get all saved searches"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.connect()
             conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
             
@@ -405,7 +424,7 @@ class SearchService:
             for row in cursor.fetchall():
                 result = dict(row)
                 try:
-                    result['filters'] = json.loads(result['filters']) if result['filters'] else {}
+                    result['filters'] = json_loads(result['filters']) if result['filters'] else {}
                 except:
                     result['filters'] = {}
                 results.append(result)
@@ -1,11 +1,13 @@
 # Smart Home Integration Service for Watch Media Server
 import os
 import json
-import requests
+import re
 import sqlite3
 from typing import Dict, List, Optional, Any
 from datetime import datetime, timedelta
 import logging
+from src.services.database_service import get_connection_pool
+from src.utils.http_session import create_http_session
 
 # Optional async imports
 try:
@@ -17,15 +19,49 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Voice command intents in priority order; the first pattern found in the utterance wins
+VOICE_INTENT_PATTERNS = (
+    ('play', re.compile(r'play|start|watch')),
+    ('pause_media', re.compile(r'pause|stop')),
+    ('resume_media', re.compile(r'resume|continue')),
+    ('search_media', re.compile(r'search')),
+    ('add_to_watchlist', re.compile(r'add to watchlist|save')),
+    ('get_recommendations', re.compile(r'recommend|suggest|what should i watch')),
+    ('volume', re.compile(r'volume')),
+)
+MOVIE_PATTERN = re.compile(r'movie|film')
+TV_SHOW_PATTERN = re.compile(r'tv show|series')
+VOLUME_UP_PATTERN = re.compile(r'up|increase')
+VOLUME_DOWN_PATTERN = re.compile(r'down|decrease')
+
+# Words stripped from an utterance to leave the media title or search query
+PLAY_MOVIE_FILLER_WORDS = frozenset(['play', 'start', 'watch', 'movie', 'film'])
+PLAY_TV_FILLER_WORDS = frozenset(['play', 'start', 'watch', 'tv', 'show', 'series'])
+SEARCH_FILLER_WORDS = frozenset(['search', 'for'])
+WATCHLIST_FILLER_WORDS = frozenset(['add', 'to', 'watchlist', 'save'])
+
 class SmartHomeService:
     def __init__(self, db_path: str = 'watch.db'):
         self.db_path = db_path
+        self.pool = get_connection_pool(db_path)
+        self.http = create_http_session()
         self.init_smart_home_tables()
         self.device_configs = self._get_device_configs()
+        self.voice_command_handlers = {
+            'play_movie': self._handle_play_movie_command,
+            'play_tv_show': self._handle_play_tv_show_command,
+            'pause_media': lambda user_id, parameters: self._handle_pause_media_command(user_id),
+            'resume_media': lambda user_id, parameters: self._handle_resume_media_command(user_id),
+            'search_media': self._handle_search_media_command,
+            'add_to_watchlist': self._handle_add_to_watchlist_command,
+            'get_recommendations': lambda user_id, parameters: self._handle_get_recommendations_command(user_id),
+            'volume_up': lambda user_id, parameters: self._handle_volume_up_command(user_id),
+            'volume_down': lambda user_id, parameters: self._handle_volume_down_command(user_id)
+        }
     
     def init_smart_home_tables(self):
         """Initialize smart home database tables"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.pool.connect()
         cursor = conn.cursor()
         
         # Smart home devices table
@@ -85,6 +121,10 @@ class SmartHomeService:
             )
         ''')
         
+        # Index device and voice command lookups by user
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_smart_home_devices_user_platform ON smart_home_devices(user_id, platform)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_voice_commands_user_created ON voice_commands(user_id, created_at DESC)')
+        
         conn.commit()
         conn.close()
     
@@ -134,7 +174,7 @@ class SmartHomeService:
                        device_id: str, platform: str, device_data: Dict = None) -> int:
         """Register a smart home device"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.connect()
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -155,7 +195,7 @@ class SmartHomeService:
     def get_user_devices(self, user_id: int, platform: str = None) -> List[Dict]:
         """Get user's smart home devices"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.connect()
             conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
             
@@ -189,7 +229,7 @@ class SmartHomeService:
                               trigger_conditions: Dict, actions: List[Dict]) -> int:
         """Create automation rule"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.connect()
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -240,116 +280,54 @@ class SmartHomeService:
         """Parse voice command text into structured data"""
         command_text = command_text.lower().strip()
         
-        # Play media commands
-        if any(word in command_text for word in ['play', 'start', 'watch']):
-            if 'movie' in command_text or 'film' in command_text:
-                # Extract movie title
-                title = self._extract_title_from_command(command_text, ['play', 'start', 'watch', 'movie', 'film'])
-                return {
-                    'type': 'play_movie',
-                    'parameters': {'title': title},
-                    'platform': platform
-                }
-            elif 'tv show' in command_text or 'series' in command_text:
-                title = self._extract_title_from_command(command_text, ['play', 'start', 'watch', 'tv', 'show', 'series'])
-                return {
-                    'type': 'play_tv_show',
-                    'parameters': {'title': title},
-                    'platform': platform
-                }
-        
-        # Control commands
-        elif any(word in command_text for word in ['pause', 'stop']):
-            return {
-                'type': 'pause_media',
-                'parameters': {},
-                'platform': platform
-            }
-        elif any(word in command_text for word in ['resume', 'continue']):
-            return {
-                'type': 'resume_media',
-                'parameters': {},
-                'platform': platform
-            }
-        
-        # Search commands
-        elif 'search' in command_text:
-            query = self._extract_title_from_command(command_text, ['search', 'for'])
-            return {
-                'type': 'search_media',
-                'parameters': {'query': query},
-                'platform': platform
-            }
-        
-        # Watchlist commands
-        elif 'add to watchlist' in command_text or 'save' in command_text:
-            title = self._extract_title_from_command(command_text, ['add', 'to', 'watchlist', 'save'])
-            return {
-                'type': 'add_to_watchlist',
-                'parameters': {'title': title},
-                'platform': platform
-            }
-        
-        # Recommendation commands
-        elif any(word in command_text for word in ['recommend', 'suggest', 'what should i watch']):
-            return {
-                'type': 'get_recommendations',
-                'parameters': {},
-                'platform': platform
-            }
+        intent = next((name for name, pattern in VOICE_INTENT_PATTERNS if pattern.search(command_text)), None)
+        command_type = None
+        parameters = {}
+        
+        if intent == 'play':
+            if MOVIE_PATTERN.search(command_text):
+                command_type = 'play_movie'
+                parameters = {'title': self._extract_title_from_command(command_text, PLAY_MOVIE_FILLER_WORDS)}
+            elif TV_SHOW_PATTERN.search(command_text):
+                command_type = 'play_tv_show'
+                parameters = {'title': self._extract_title_from_command(command_text, PLAY_TV_FILLER_WORDS)}
+        elif intent == 'volume':
+            if VOLUME_UP_PATTERN.search(command_text):
+                command_type = 'volume_up'
+            elif VOLUME_DOWN_PATTERN.search(command_text):
+                command_type = 'volume_down'
+        elif intent == 'search_media':
+            command_type = intent
+            parameters = {'query': self._extract_title_from_command(command_text, SEARCH_FILLER_WORDS)}
+        elif intent == 'add_to_watchlist':
+            command_type = intent
+            parameters = {'title': self._extract_title_from_command(command_text, WATCHLIST_FILLER_WORDS)}
+        else:
+            command_type = intent
         
-        # Volume commands
-        elif 'volume' in command_text:
-            if 'up' in command_text or 'increase' in command_text:
-                return {
-                    'type': 'volume_up',
-                    'parameters': {},
-                    'platform': platform
-                }
-            elif 'down' in command_text or 'decrease' in command_text:
-                return {
-                    'type': 'volume_down',
-                    'parameters': {},
-                    'platform': platform
-                }
+        if not command_type:
+            return None
         
-        return None
+        return {
+            'type': command_type,
+            'parameters': parameters,
+            'platform': platform
+        }
     
-    def _extract_title_from_command(self, command_text: str, exclude_words: List[str]) -> str:
+    def _extract_title_from_command(self, command_text: str, exclude_words: frozenset) -> str:
         """Extract media title from voice command"""
-        words = command_text.split()
-        title_words = []
-        
-        for word in words:
-            if word not in exclude_words:
-                title_words.append(word)
-        
-        return ' '.join(title_words).strip()
+        return ' '.join(word for word in command_text.split() if word not in exclude_words).strip()
     
     def _execute_voice_command(self, user_id: int, command_data: Dict) -> Dict:
         """Execute parsed voice command"""
         command_type = command_data['type']
         parameters = command_data.get('parameters', {})
         
+        handler = self.voice_command_handlers.get(command_type)
+        
         try:
-            if command_type == 'play_movie':
-                return self._handle_play_movie_command(user_id, parameters)
-            elif command_type == 'play_tv_show':
-                return self._handle_play_tv_show_command(user_id, parameters)
-            elif command_type == 'pause_media':
-                return self._handle_pause_media_command(user_id)
-            elif command_type == 'resume_media':
-                return self._handle_resume_media_command(user_id)
-            elif command_type == 'search_media':
-                return self._handle_search_media_command(user_id, parameters)
-            elif command_type == 'add_to_watchlist':
-                return self._handle_add_to_watchlist_command(user_id, parameters)
-            elif command_type == 'get_recommendations':
-                return self._handle_get_recommendations_command(user_id)
-            elif command_type == 'volume_up':
-                return self._handle_volume_up_command(user_id)
-            elif command_type == 'volume_down':
-                return self._handle_volume_down_command(user_id)
+            if handler:
+                return handler(user_id, parameters)
             else:
                 return {
                     'success': False,
@@ -376,7 +354,7 @@ class SmartHomeService:
             }
         
         # Search for movie in database
-        conn = sqlite3.connect(self.db_path)
+        conn = self.pool.connect()
         cursor = conn.cursor()
         cursor.execute('''
             SELECT id, title, year FROM media_files 
@@ -415,7 +393,7 @@ class SmartHomeService:
             }
         
         # Search for TV show in database
-        conn = sqlite3.connect(self.db_path)
+        conn = self.pool.connect()
         cursor = conn.cursor()
         cursor.execute('''
             SELECT id, title, year FROM media_files 
@@ -472,7 +450,7 @@ class SmartHomeService:
             }
         
         # Search in database
-        conn = sqlite3.connect(self.db_path)
+        conn = self.pool.connect()
         cursor = conn.cursor()
         cursor.execute('''
             SELECT id, title, year, media_type FROM media_files 
@@ -514,7 +492,7 @@ class SmartHomeService:
             }
         
         # Find media and add to watchlist
-        conn = sqlite3.connect(self.db_path)
+        conn = self.pool.connect()
         cursor = conn.cursor()
         cursor.execute('''
             SELECT id, title FROM media_files 
@@ -553,7 +531,7 @@ class SmartHomeService:
     def _handle_get_recommendations_command(self, user_id: int) -> Dict:
         """Handle get recommendations voice command"""
         # Get recent recommendations (simplified)
-        conn = sqlite3.connect(self.db_path)
+        conn = self.pool.connect()
         cursor = conn.cursor()
         cursor.execute('''
             SELECT id, title, year FROM media_files 
@@ -603,7 +581,7 @@ class SmartHomeService:
                           parameters: Dict, response: str):
         """Log voice command"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.connect()
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -652,7 +630,7 @@ class SmartHomeService:
                 service = f'homeassistant.{action}'
             
             # Call Home Assistant service
-            response = requests.post(
+            response = self.http.post(
                 f'{base_url}/api/services/{service.replace(".", "/")}',
                 headers=headers,
                 json=service_data
@@ -688,7 +666,7 @@ class SmartHomeService:
                 return False
             
             # Get scenes
-            response = requests.get(f'{base_url}/api/{username}/scenes')
+            response = self.http.get(f'{base_url}/api/{username}/scenes')
             response.raise_for_status()
             
             scenes = response.json()
@@ -704,7 +682,7 @@ class SmartHomeService:
                 return False
             
             # Activate scene
-            response = requests.put(
+            response = self.http.put(
                 f'{base_url}/api/{username}/groups/0/action',
                 json={'scene': scene_id}
             )
@@ -730,7 +708,7 @@ class SmartHomeService:
     def _log_smart_home_event(self, device_id: str, event_type: str, event_data: Dict, status: str):
         """Log smart home event"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.connect()
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -744,19 +722,24 @@ class SmartHomeService:
         except Exception as e:
             logger.error(f"Error logging smart home event: {e}")
     
-    def get_voice_command_history(self, user_id: int, limit: int = 50) -> List[Dict]:
-        """Get voice command history"""
+    def get_voice_command_history(self, user_id: int, limit: int = 50, before: tuple = None) -> List[Dict]:
+        """Get voice command history, optionally only entries older than a (created_at, id) key"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.connect()
             conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
             
-            cursor.execute('''
-                SELECT * FROM voice_commands 
-                WHERE user_id = ? 
-                ORDER BY created_at DESC 
-                LIMIT ?
-            ''', (user_id, limit))
+            query = 'SELECT * FROM voice_commands WHERE user_id = ?'
+            params = [user_id]
+            
+            if before:
+                query += ' AND (created_at, id) < (?, ?)'
+                params.extend(before)
+            
+            query += ' ORDER BY created_at DESC, id DESC LIMIT ?'
+            params.append(limit)
+            
+            cursor.execute(query, params)
             
             results = []
             for row in cursor.fetchall():
@@ -2,6 +2,7 @@
 import requests
 import os
 import json
+import threading
 from typing import Dict, List, Optional, Tuple
 import re
 from pathlib import Path
@@ -17,6 +18,8 @@ class TMDBService:
         # Cache for API responses
         self.cache = {}
         self.cache_file = 'tmdb_cache.json'
+        # Guards cache inserts and the cache file rewrite against concurrent lookups
+        self.cache_lock = threading.Lock()
         self.load_cache()
     
     def load_cache(self):
@@ -59,8 +62,9 @@ class TMDBService:
             response.raise_for_status()
             
             data = response.json()
-            self.cache[cache_key] = data
-            self.save_cache()
+            with self.cache_lock:
+                self.cache[cache_key] = data
+                self.save_cache()
             
             return data
         except Exception as e:
@@ -10,10 +10,12 @@ import tempfile
 import shutil
 from datetime import datetime, timedelta
 import sqlite3
+from src.services.database_service import get_connection_pool
 
 class TranscodingService:
     def __init__(self, db_path: str = 'watch.db'):
         self.db_path = db_path
+        self.pool = get_connection_pool(db_path)
         self.temp_dir = tempfile.mkdtemp(prefix='watch_transcode_')
         self.active_transcodes = {}
         self.transcode_queue = []
@@ -89,7 +91,7 @@ class TranscodingService:
     
     def init_transcoding_tables(self):
         """Initialize transcoding-related database tables"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.pool.connect()
         cursor = conn.cursor()
         
         # Transcoding jobs table
@@ -125,6 +127,8 @@ class TranscodingService:
             )
         ''')
         
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_transcoding_cache_media_quality ON transcoding_cache(media_id, quality)')
+        
         conn.commit()
         conn.close()
     
@@ -206,7 +210,7 @@ class TranscodingService:
     
     def get_cached_transcode(self, media_id: int, quality: str) -> Optional[str]:
         """Check if transcoded version already exists"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.pool.connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -228,9 +232,51 @@ class TranscodingService:
         conn.close()
         return None
     
+    def get_stream_context(self, media_id: int, quality: str, job_id: int = None) -> Optional[Dict]:
+        """Resolve a media file, its cached transcode and an optional job's state in one query"""
+        conn = self.pool.connect()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT m.file_path, c.file_path, j.status, j.progress, j.output_path
+            FROM media_files m
+            LEFT JOIN transcoding_cache c
+                ON c.media_id = m.id AND c.quality = ? AND c.file_path IS NOT NULL
+            LEFT JOIN transcoding_jobs j ON j.id = ?
+            WHERE m.id = ?
+            LIMIT 1
+        ''', (quality, job_id, media_id))
+        
+        result = cursor.fetchone()
+        conn.close()
+        
+        if not result:
+            return None
+        
+        file_path, cached_path, job_status, job_progress, job_output_path = result
+        
+        return {
+            'file_path': file_path,
+            'cached_path': cached_path if cached_path and os.path.exists(cached_path) else None,
+            'job_status': job_status,
+            'job_progress': job_progress or 0,
+            'job_output_path': job_output_path
+        }
+    
+    def touch_cached_transcode(self, media_id: int, quality: str):
+        """Mark a cached transcode as recently used"""
+        conn = self.pool.connect()
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE transcoding_cache SET last_accessed = CURRENT_TIMESTAMP
+            WHERE media_id = ? AND quality = ?
+        ''', (media_id, quality))
+        conn.commit()
+        conn.close()
+    
     def queue_transcode(self, media_id: int, input_path: str, quality: str) -> int:
         """Queue a transcoding job"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.pool.connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -268,7 +314,7 @@ class TranscodingService:
     
     def process_transcode_job(self, job_id: int):
         """Process a transcoding job"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.pool.connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -434,7 +480,7 @@ class TranscodingService:
                 time.sleep(2)
                 
                 # Update progress in database
-                conn = sqlite3.connect(self.db_path)
+                conn = self.pool.connect()
                 cursor = conn.cursor()
                 
                 # Simple progress estimation based on elapsed time
@@ -453,37 +499,43 @@ class TranscodingService:
     
     def get_transcode_status(self, job_id: int) -> Dict:
         """Get transcoding job status"""
-        conn = sqlite3.connect(self.db_path)
+        return self.get_transcode_statuses([job_id]).get(job_id, {'error': 'Job not found'})
+    
+    def get_transcode_statuses(self, job_ids: List[int]) -> Dict[int, Dict]:
+        """Get the status of several transcoding jobs with one query, keyed by job id"""
+        job_ids = list(dict.fromkeys(job_ids))
+        if not job_ids:
+            return {}
+        
+        conn = self.pool.connect()
         cursor = conn.cursor()
         
-        cursor.execute('''
-            SELECT status, progress, error_message, output_path, started_at, completed_at
-            FROM transcoding_jobs WHERE id = ?
-        ''', (job_id,))
+        cursor.execute(f'''
+            SELECT id, status, progress, error_message, output_path, started_at, completed_at
+            FROM transcoding_jobs WHERE id IN ({','.join('?' * len(job_ids))})
+        ''', job_ids)
         
-        result = cursor.fetchone()
+        rows = cursor.fetchall()
         conn.close()
         
-        if not result:
-            return {'error': 'Job not found'}
-        
-        status, progress, error_message, output_path, started_at, completed_at = result
-        
-        return {
-            'job_id': job_id,
-            'status': status,
-            'progress': progress,
-            'error_message': error_message,
-            'output_path': output_path,
-            'started_at': started_at,
-            'completed_at': completed_at
-        }
+        statuses = {}
+        for job_id, status, progress, error_message, output_path, started_at, completed_at in rows:
+            statuses[job_id] = {
+                'job_id': job_id,
+                'status': status,
+                'progress': progress,
+                'error_message': error_message,
+                'output_path': output_path,
+                'started_at': started_at,
+                'completed_at': completed_at
+            }
+        return statuses
     
     def cleanup_old_transcodes(self, max_age_hours: int = 24):
         """Clean up old transcoded files"""
         cutoff_time = datetime.now() - timedelta(hours=max_age_hours)
         
-        conn = sqlite3.connect(self.db_path)
+        conn = self.pool.connect()
         cursor = conn.cursor()
         
         # Find old cache entries
@@ -508,7 +560,7 @@ class TranscodingService:
     
     def get_available_qualities(self, media_id: int) -> List[str]:
         """Get available transcoded qualities for a media file"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.pool.connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -529,7 +581,7 @@ class TranscodingService:
             return f"/api/stream/{media_id}?quality={quality}"
         
         # Check if original quality is suitable
-        conn = sqlite3.connect(self.db_path)
+        conn = self.pool.connect()
         cursor = conn.cursor()
         
         cursor.execute('SELECT file_path FROM media_files WHERE id = ?', (media_id,))
@@ -0,0 +1,16 @@
+# Release-year parsing for media file names
+import re
+from typing import Optional
+
+# Bare 19xx/20xx tokens, not part of a longer number, a resolution (1920x1080) or a "2160p" tag
+YEAR_PATTERN = re.compile(r'(?<![\dxX])(19\d{2}|20\d{2})(?![\dxXpP])')
+# "(2017)" / "[2017]" is the usual release-year convention and wins over bare numbers in the title
+BRACKETED_YEAR_PATTERN = re.compile(r'[(\[](19\d{2}|20\d{2})[)\]]')
+
+def parse_year(name: str) -> Optional[int]:
+    """Release year in a file name: a bracketed year first, else the last bare year-like token"""
+    match = BRACKETED_YEAR_PATTERN.search(name)
+    if match:
+        return int(match.group(1))
+    years = YEAR_PATTERN.findall(name)
+    return int(years[-1]) if years else None
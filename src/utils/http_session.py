@@ -0,0 +1,14 @@
+# Shared HTTP session factory for outbound API calls
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+def create_http_session(pool_connections: int = 32, pool_maxsize: int = 64) -> requests.Session:
+    """Create a requests session that keeps connections alive and retries idempotent calls"""
+    session = requests.Session()
+    # Retry only idempotent methods (urllib3 default), so POSTs are never replayed
+    retries = Retry(total=2, backoff_factor=0.1, status_forcelist=(502, 503, 504))
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retries)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
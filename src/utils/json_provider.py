@@ -0,0 +1,39 @@
+# Fast JSON encoding for Watch Media Server
+import json
+from flask.json.provider import DefaultJSONProvider
+
+# Optional orjson import
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+    orjson = None
+
+def dumps_bytes(obj) -> bytes:
+    """Serialize obj to UTF-8 JSON bytes, using orjson when installed"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, default=DefaultJSONProvider.default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=DefaultJSONProvider.default).encode('utf-8')
+
+def dumps(obj) -> str:
+    """Serialize obj to a JSON str, using orjson when installed"""
+    return dumps_bytes(obj).decode('utf-8')
+
+def loads(data):
+    """Parse JSON from str or bytes, using orjson when installed"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+class ORJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson"""
+    
+    def dumps(self, obj, **kwargs) -> str:
+        # Pretty-printing requests (indent) fall back to the stdlib encoder
+        if 'indent' in kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps_bytes(obj).decode('utf-8')
+    
+    def loads(self, s, **kwargs):
+        return loads(s)
@@ -0,0 +1,26 @@
+# Keyset pagination helpers for newest-first list endpoints
+import base64
+import json
+from typing import Dict, List, Optional, Tuple
+
+def encode_cursor(sort_value, row_id: int) -> str:
+    """Encode the (sort value, id) of the last row returned as an opaque cursor"""
+    raw = json.dumps([sort_value, row_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple]:
+    """Decode a cursor back into (sort value, id); raises ValueError if malformed"""
+    if not cursor:
+        return None
+    try:
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return sort_value, int(row_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+def next_cursor(rows: List[Dict], limit: int, sort_key: str) -> Optional[str]:
+    """Cursor for the page after rows, or None when this was the last page"""
+    if len(rows) < limit or not rows:
+        return None
+    last = rows[-1]
+    return encode_cursor(last[sort_key], last['id'])
@@ -0,0 +1,35 @@
+# Request payload validation for JSON API endpoints
+import copy
+from collections import namedtuple
+from typing import Any, Dict
+
+# Expected type(s) of a payload field, whether it must be present, and its default
+Field = namedtuple('Field', ['types', 'required', 'default'], defaults=(False, None))
+
+class PayloadError(ValueError):
+    """Raised when a request payload does not match its schema"""
+
+def _type_name(types) -> str:
+    if isinstance(types, tuple):
+        return ' or '.join(t.__name__ for t in types)
+    return types.__name__
+
+def validate_payload(data: Any, schema: Dict[str, Field]) -> Dict[str, Any]:
+    """Check a decoded JSON body against a schema and return the declared fields"""
+    if not isinstance(data, dict):
+        raise PayloadError('JSON object body required')
+    
+    payload = {}
+    for name, field in schema.items():
+        value = data.get(name)
+        if value is None or value == '' or value == []:
+            if field.required:
+                raise PayloadError(f"'{name}' is required")
+            payload[name] = copy.copy(field.default)
+            continue
+        
+        if not isinstance(value, field.types):
+            raise PayloadError(f"'{name}' must be {_type_name(field.types)}")
+        payload[name] = value
+    
+    return payload
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared SQLite connection pool
+"""
+
+import unittest
+import sys
+import os
+import tempfile
+import shutil
+
+# Add the parent directory to the path so we can import our modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.database_service import ConnectionPool
+
+class TestConnectionPoolTransaction(unittest.TestCase):
+    """ConnectionPool.transaction semantics"""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.pool = ConnectionPool(os.path.join(self.temp_dir, 'test.db'), pool_size=2)
+        with self.pool.transaction() as conn:
+            conn.execute('CREATE TABLE items (name TEXT NOT NULL)')
+    
+    def tearDown(self):
+        for conn in self.pool.idle_connections:
+            conn.discard()
+        shutil.rmtree(self.temp_dir)
+    
+    def count_items(self):
+        conn = self.pool.connect()
+        try:
+            return conn.execute('SELECT COUNT(*) FROM items').fetchone()[0]
+        finally:
+            conn.close()
+    
+    def test_commit(self):
+        """Statements are committed when the block exits normally"""
+        with self.pool.transaction() as conn:
+            conn.execute("INSERT INTO items VALUES ('a')")
+        self.assertEqual(self.count_items(), 1)
+    
+    def test_rollback_on_error(self):
+        """An exception rolls back every statement in the block and propagates"""
+        with self.assertRaises(RuntimeError):
+            with self.pool.transaction() as conn:
+                conn.execute("INSERT INTO items VALUES ('a')")
+                raise RuntimeError('boom')
+        self.assertEqual(self.count_items(), 0)
+    
+    def test_connection_returned_to_pool(self):
+        """The connection goes back to the pool with no open transaction"""
+        with self.assertRaises(Exception):
+            with self.pool.transaction() as conn:
+                conn.execute('INSERT INTO items VALUES (NULL)')
+        self.assertEqual(len(self.pool.idle_connections), 1)
+        self.assertFalse(self.pool.idle_connections[0].in_transaction)
+        self.assertFalse(self.pool.write_lock.locked())
+
+if __name__ == '__main__':
+    unittest.main()
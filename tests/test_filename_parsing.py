@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Tests for media file name year parsing
+"""
+
+import unittest
+import sys
+import os
+
+# Add the parent directory to the path so we can import our modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.filename_parsing import parse_year
+
+class TestParseYear(unittest.TestCase):
+    """Release year extraction"""
+    
+    def test_bracketed_year_beats_title_number(self):
+        """A parenthesised or bracketed year wins over numbers in the title"""
+        self.assertEqual(parse_year('Blade Runner 2049 (2017)'), 2017)
+        self.assertEqual(parse_year('1917 (2019)'), 2019)
+        self.assertEqual(parse_year('2001 A Space Odyssey [1968]'), 1968)
+    
+    def test_last_bare_year_is_used(self):
+        """Without brackets the last year-like token is the release year"""
+        self.assertEqual(parse_year('Blade.Runner.2049.2017.1080p.BluRay'), 2017)
+        self.assertEqual(parse_year('The.Matrix.1999.720p'), 1999)
+    
+    def test_resolutions_and_tags_are_ignored(self):
+        """Resolution and quality tokens are not mistaken for years"""
+        self.assertIsNone(parse_year('Movie.1920x1080'))
+        self.assertIsNone(parse_year('Movie.2160p.HDR'))
+        self.assertIsNone(parse_year('Show S01E02'))
+
+if __name__ == '__main__':
+    unittest.main()
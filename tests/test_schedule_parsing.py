@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Tests for automation schedule expression parsing
+"""
+
+import unittest
+import sys
+import os
+
+# Add the parent directory to the path so we can import our modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.automation_service import parse_schedule
+
+class TestParseSchedule(unittest.TestCase):
+    """Schedule expression parsing"""
+    
+    def test_daily(self):
+        """Daily expressions yield hour and minute"""
+        self.assertEqual(parse_schedule('daily at 02:00'), ('daily', 2, 0))
+        self.assertEqual(parse_schedule('daily at 7:05'), ('daily', 7, 5))
+    
+    def test_weekly(self):
+        """Weekly expressions yield a lowercase weekday, rejecting unknown days"""
+        self.assertEqual(parse_schedule('weekly on Monday'), ('weekly', 'monday'))
+        self.assertIsNone(parse_schedule('weekly on funday'))
+    
+    def test_every(self):
+        """Interval expressions yield a count and unit"""
+        self.assertEqual(parse_schedule('every 30 minutes'), ('every', 30, 'minutes'))
+        self.assertEqual(parse_schedule('every 2 hours'), ('every', 2, 'hours'))
+    
+    def test_unrecognised(self):
+        """Anything else is not parsed"""
+        self.assertIsNone(parse_schedule('whenever'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,7 @@
 # WSGI Application for Watch Media Server
 import os
 import sys
-from app import app, socketio
+from app import create_app, socketio
 
 # Add the current directory to Python path
 sys.path.insert(0, os.path.dirname(__file__))
@@ -10,6 +10,7 @@ sys.path.insert(0, os.path.dirname(__file__))
 os.environ.setdefault('FLASK_ENV', 'production')
 
 # Create WSGI application
+app = create_app()
 application = app
 
 if __name__ == '__main__':